@@ -1,9 +1,60 @@
-"""This package provides ..."""
-from loadwright.io import read_loadwright_file
-from loadwright.runner import LoadTestRunner
-from loadwright.user import User
-from loadwright.viewer import LoadTestViewer
+"""This package provides ...
+
+The public API is imported lazily on first access, such that for example
+`from loadwright import LoadTestRunner, User` does not import Panel or HoloViews.
+"""
+from __future__ import annotations
+
+import importlib
+from typing import TYPE_CHECKING, Any, List
 
 VERSION = "0.2.0"
 
-__all__ = ["read_loadwright_file", "LoadTestRunner", "User", "LoadTestViewer"]
+_MODULES = {
+    "CapacitySearch": "loadwright.capacity",
+    "compare_runs": "loadwright.compare",
+    "Coordinator": "loadwright.distributed",
+    "read_loadwright_file": "loadwright.io",
+    "GeneratorMonitor": "loadwright.monitor",
+    "LoadTestRunner": "loadwright.runner",
+    "MetricsCollector": "loadwright.metrics",
+    "ProtocolUser": "loadwright.protocol",
+    "Recorder": "loadwright.recorder",
+    "Recording": "loadwright.recorder",
+    "RegressionGate": "loadwright.compare",
+    "ReplayUser": "loadwright.recorder",
+    "ResourceSampler": "loadwright.resources",
+    "RunCatalog": "loadwright.catalog",
+    "User": "loadwright.user",
+    "Worker": "loadwright.distributed",
+    "LoadTestViewer": "loadwright.viewer",
+}
+
+__all__ = list(_MODULES)
+
+if TYPE_CHECKING:
+    from loadwright.capacity import CapacitySearch
+    from loadwright.catalog import RunCatalog
+    from loadwright.compare import RegressionGate, compare_runs
+    from loadwright.distributed import Coordinator, Worker
+    from loadwright.io import read_loadwright_file
+    from loadwright.metrics import MetricsCollector
+    from loadwright.monitor import GeneratorMonitor
+    from loadwright.protocol import ProtocolUser
+    from loadwright.recorder import Recorder, Recording, ReplayUser
+    from loadwright.resources import ResourceSampler
+    from loadwright.runner import LoadTestRunner
+    from loadwright.user import User
+    from loadwright.viewer import LoadTestViewer
+
+
+def __getattr__(name: str) -> Any:
+    if name not in _MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_MODULES[name]), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted([*globals(), *__all__])
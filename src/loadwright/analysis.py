@@ -0,0 +1,112 @@
+"""Vectorized analysis of Loadwright results"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from .events import INTERNAL_EVENTS
+
+TIME_COLUMN = "start_seconds"
+
+
+def user_events(data: pd.DataFrame) -> pd.DataFrame:
+    """Returns the events of the users, i.e. the results without the resource and generator
+    samples and the websocket traces"""
+    is_internal = data["event"].isin(INTERNAL_EVENTS)
+    return data[~is_internal] if is_internal.any() else data
+
+
+def _grid(times: np.ndarray, resample: Optional[float]) -> np.ndarray:
+    """Returns the sorted unique times or a regular grid of resample seconds spanning them"""
+    if not len(times):  # pylint: disable=use-implicit-booleaness-not-len
+        return np.empty(0, dtype="float64")
+    if resample is None:
+        return np.unique(times)
+    if resample <= 0:
+        raise ValueError(f"resample should be a positive number of seconds. Got {resample}")
+    start, stop = times.min(), times.max()
+    return start + np.arange(int(np.floor((stop - start) / resample)) + 1) * resample
+
+
+def sweep(
+    starts: np.ndarray, stops: np.ndarray, times: np.ndarray, inclusive: bool = False
+) -> np.ndarray:
+    """Returns the number of intervals containing each of the times
+
+    This is a sweep line. The number of intervals started minus the number of intervals
+    stopped is the cumulative sum of the +1/-1 deltas at the sorted starts and stops. It is
+    evaluated at all times at once by binary search in O((N + T) log N) instead of comparing
+    every time with every interval.
+
+    Args:
+        starts (np.ndarray): The starts of the intervals
+        stops (np.ndarray): The stops of the intervals
+        times (np.ndarray): The times to count the intervals at
+        inclusive (bool, optional): If True an interval stopping at a time contains it.
+            Defaults to False.
+
+    Returns:
+        np.ndarray: The number of intervals containing each time
+    """
+    starts = np.sort(np.asarray(starts, dtype="float64"))
+    stops = np.sort(np.asarray(stops, dtype="float64"))
+    started = np.searchsorted(starts, times, side="right")
+    stopped = np.searchsorted(stops, times, side="left" if inclusive else "right")
+    return (started - stopped).astype("int64")
+
+
+def active_users(data: pd.DataFrame, resample: Optional[float] = None) -> pd.DataFrame:
+    """Returns the number of active users over time
+
+    A user is active from the start of its first event to the stop of its last event.
+
+    Args:
+        data (pd.DataFrame): The results with the `user`, `start_seconds` and `stop_seconds`
+            columns
+        resample (Optional[float], optional): If provided the number is given on a regular grid
+            of `resample` seconds. Defaults to every start and stop time.
+
+    Returns:
+        pd.DataFrame: A DataFrame with the `start_seconds` and `active_users` columns
+    """
+    users = data.groupby("user", observed=True).agg(
+        start=("start_seconds", "min"), stop=("stop_seconds", "max")
+    )
+    times = _grid(
+        np.concatenate([data["start_seconds"].to_numpy(), data["stop_seconds"].to_numpy()]),
+        resample,
+    )
+    return pd.DataFrame(
+        {
+            TIME_COLUMN: times,
+            "active_users": sweep(users["start"], users["stop"], times, inclusive=True),
+        }
+    )
+
+
+def concurrency(
+    data: pd.DataFrame, by: str = "event", resample: Optional[float] = None
+) -> pd.DataFrame:
+    """Returns the number of events in flight over time per value of the `by` column
+
+    For example the number of `load` and `interact` events being processed at the same time.
+
+    Args:
+        data (pd.DataFrame): The results with the `start_seconds`, `stop_seconds` and `by`
+            columns
+        by (str, optional): The column to group the events by. Defaults to "event".
+        resample (Optional[float], optional): If provided the number is given on a regular grid
+            of `resample` seconds. Defaults to every start and stop time.
+
+    Returns:
+        pd.DataFrame: A DataFrame with a `start_seconds` column and a column per group
+    """
+    starts = data["start_seconds"].to_numpy()
+    stops = data["stop_seconds"].to_numpy()
+    times = _grid(np.concatenate([starts, stops]), resample)
+    columns = {TIME_COLUMN: times}
+    for name, indices in data.groupby(by, observed=True, sort=True).indices.items():
+        columns[str(name)] = sweep(starts[indices], stops[indices], times)
+    return pd.DataFrame(columns)
@@ -0,0 +1,225 @@
+"""A compact, columnar in-memory buffer for LoadTestRunner events"""
+from __future__ import annotations
+
+from numbers import Integral, Number
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ["event", "user", "start", "stop", "start_seconds", "stop_seconds", "duration"]
+
+
+class _Categories:  # pylint: disable=too-few-public-methods
+    """Maps values to integer codes"""
+
+    def __init__(self):
+        self.codes: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def code(self, value: str) -> int:
+        """Returns the code of the value. Adds the value if it is new"""
+        code = self.codes.get(value, None)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+
+class ResultBuffer:
+    """Stores events in preallocated, growable typed arrays
+
+    The start and stop times are stored as float64 seconds since the epoch. The event and user
+    names are stored as categorical codes. Extra columns are added the first time they are
+    used. Integers are stored as int64, other numbers as float64 and anything else as objects.
+    A column is widened to float64 or object when a value does not fit its type.
+
+    The conversion to a DataFrame including datetimes is done once, in bulk, when the data is
+    read.
+
+    The oldest events can be discarded to bound the memory used. Positions, for example the
+    index of the DataFrame, keep counting from the first event appended.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self._capacity = max(int(capacity), 1)
+        self._size = 0
+        self._start = np.empty(self._capacity, dtype="float64")
+        self._stop = np.empty(self._capacity, dtype="float64")
+        self._event = np.empty(self._capacity, dtype="int32")
+        self._user = np.empty(self._capacity, dtype="int32")
+        self._events = _Categories()
+        self._users = _Categories()
+        self._extra: Dict[str, np.ndarray] = {}
+        self._present: Dict[str, np.ndarray] = {}
+        self._discarded = 0
+
+    def __len__(self) -> int:
+        """Returns the number of events in the buffer, i.e. not discarded"""
+        return self._size
+
+    @property
+    def discarded(self) -> int:
+        """Returns the number of events discarded, i.e. the position of the oldest event"""
+        return self._discarded
+
+    @property
+    def columns(self) -> List[str]:
+        """Returns the names of the columns"""
+        return COLUMNS + list(self._extra)
+
+    @property
+    def nbytes(self) -> int:
+        """Returns the number of bytes allocated by the arrays"""
+        return sum(array.nbytes for array in self._arrays())
+
+    def _arrays(self) -> List[np.ndarray]:
+        return [
+            self._start,
+            self._stop,
+            self._event,
+            self._user,
+            *self._extra.values(),
+            *self._present.values(),
+        ]
+
+    def append(self, event: str, user: str, start: float, stop: float, **kwargs):
+        """Appends an event
+
+        Args:
+            event (str): The name of the event
+            user (str): The name of the user triggering the event
+            start (float): The start time in seconds since the epoch
+            stop (float): The stop time in seconds since the epoch
+        """
+        index = self._size
+        if index == self._capacity:
+            self._grow()
+        self._start[index] = start
+        self._stop[index] = stop
+        self._event[index] = self._events.code(event)
+        self._user[index] = self._users.code(user)
+        for column, value in kwargs.items():
+            self._set(column, index, value)
+        self._size = index + 1
+
+    def _grow(self):
+        self._capacity *= 2
+        for name in ["_start", "_stop", "_event", "_user"]:
+            setattr(self, name, _resize(getattr(self, name), self._capacity))
+        for column, array in self._extra.items():
+            self._extra[column] = _resize(array, self._capacity)
+        for column, array in self._present.items():
+            self._present[column] = _resize(array, self._capacity)
+
+    def _set(self, column: str, index: int, value):
+        array = self._extra.get(column, None)
+        kind = _kind(value)
+        if array is None:
+            array = self._extra[column] = _resize(np.empty(0, dtype=kind), self._capacity)
+            if kind == "int64":
+                self._present[column] = np.zeros(self._capacity, dtype="bool")
+        elif array.dtype != object and kind != "int64" and kind != array.dtype:
+            array = self._widen(column, kind)
+        array[index] = value
+        present = self._present.get(column, None)
+        if present is not None:
+            present[index] = True
+
+    def _widen(self, column: str, dtype: str) -> np.ndarray:
+        """Converts an int64 or float64 column to a float64 or object column"""
+        array = self._extra[column]
+        present = self._present.pop(column, None)
+        missing = np.isnan(array) if present is None else ~present
+        array = self._extra[column] = array.astype(dtype)
+        array[missing] = np.nan if dtype == "float64" else None
+        return array
+
+    def discard(self, count: int):
+        """Removes the oldest events. The allocated memory is kept
+
+        Args:
+            count (int): The number of events to remove
+        """
+        count = min(max(count, 0), self._size)
+        size = self._size - count
+        for array in self._arrays():
+            array[:size] = array[count : self._size]
+            # The freed slots are reused by the next events, which may not set every column
+            array[size : self._size] = _missing(array)
+        self._size = size
+        self._discarded += count
+
+    def clear(self):
+        """Removes all events. The allocated memory is kept"""
+        self._size = 0
+        self._discarded = 0
+        self._events = _Categories()
+        self._users = _Categories()
+        self._extra = {}
+        self._present = {}
+
+    def to_frame(self, origin: float | None = None, since: int = 0) -> pd.DataFrame:
+        """Returns the events as a DataFrame
+
+        Args:
+            origin (float | None, optional): The time in seconds since the epoch that
+                `start_seconds` and `stop_seconds` are relative to. Defaults to the first start.
+            since (int, optional): The position of the first event to return. The index of the
+                DataFrame is the position of the events. Discarded events are not returned.
+                Defaults to 0.
+
+        Returns:
+            pd.DataFrame: A DataFrame with the columns `event`, `user`, `start`, `stop`,
+                `start_seconds`, `stop_seconds`, `duration` and any extra columns. An integer
+                column with missing values is returned as float64 with NaN, like pandas does.
+        """
+        size = self._size
+        since = min(max(since - self._discarded, 0), size)
+        start = self._start[since:size]
+        stop = self._stop[since:size]
+        if origin is None:
+            origin = self._start[0] if size else 0.0
+        columns = {
+            "event": np.asarray(self._events.values, dtype=object)[self._event[since:size]],
+            "user": np.asarray(self._users.values, dtype=object)[self._user[since:size]],
+            "start": pd.to_datetime(start, unit="s"),
+            "stop": pd.to_datetime(stop, unit="s"),
+            "start_seconds": start - origin,
+            "stop_seconds": stop - origin,
+            "duration": stop - start,
+        }
+        for column, array in self._extra.items():
+            values = array[since:size]
+            present = self._present.get(column, None)
+            if present is not None and not present[since:size].all():
+                values = np.where(present[since:size], values, np.nan)
+            columns[column] = values
+        index = pd.RangeIndex(self._discarded + since, self._discarded + size)
+        return pd.DataFrame(columns, index=index)
+
+
+def _missing(array: np.ndarray):
+    """Returns the value of the array's empty slots, i.e. None, NaN, False or 0"""
+    if array.dtype == object:
+        return None
+    if array.dtype.kind == "f":
+        return np.nan
+    return array.dtype.type(0)
+
+
+def _resize(array: np.ndarray, capacity: int) -> np.ndarray:
+    resized = np.full(capacity, _missing(array), dtype=array.dtype)
+    resized[: len(array)] = array
+    return resized
+
+
+def _kind(value) -> str:
+    """Returns the dtype of the column to store the value in"""
+    if isinstance(value, (bool, np.bool_)):
+        return "object"
+    if isinstance(value, Integral) and -(2**63) <= value < 2**63:
+        return "int64"
+    if isinstance(value, Number) and not isinstance(value, complex):
+        return "float64"
+    return "object"
@@ -0,0 +1,233 @@
+"""Searching the capacity of an app, i.e. the maximum load meeting the SLA"""
+from __future__ import annotations
+
+import math
+from typing import Dict, List, Optional
+
+import pandas as pd
+import param
+
+from .monitor import corrected_durations
+from .runner import LoadTestRunner
+from .scheduler import ConstantRate
+
+SLA_EVENTS = ["load", "interact"]
+
+
+class CapacitySearch(param.Parameterized):
+    """Finds the maximum number of users, or arrival rate, for which an app meets its SLA
+
+    The SLA is met if the `percentile` of the `load` and `interact` durations are below
+    `max_load_duration` and `max_interaction_duration`, like in the LoadTestViewer.
+
+    The search runs successive trials with the runner. The load is multiplied by `growth` until
+    a trial breaks the SLA, then the capacity is found by a binary search between the last
+    passing and the first failing load. The trials run against the same server and reuse the
+    browsers.
+
+    Use it as
+
+    ```python
+    search = CapacitySearch(runner=LoadTestRunner(host=host, user=MyUser()))
+    await search.run()
+    search.capacity, search.breaking_point, search.curve
+    ```
+    """
+
+    runner: LoadTestRunner = param.ClassSelector(
+        class_=LoadTestRunner, doc="The runner running the trials"
+    )
+    mode: str = param.Selector(
+        objects=["n_users", "rate"],
+        doc="""Whether to search the number of users `n_users` of the runner, or the number of
+        new users per second `rate` of a ConstantRate profile""",
+    )
+    start: float = param.Number(
+        1, bounds=(0, None), inclusive_bounds=(False, True), doc="The load of the first trial"
+    )
+    growth: float = param.Number(
+        2.0,
+        bounds=(1, None),
+        inclusive_bounds=(False, True),
+        doc="The factor the load is multiplied by until the SLA is broken",
+    )
+    max_value: float = param.Number(
+        1000, bounds=(0, None), doc="The maximum load to try. The search stops there"
+    )
+    resolution: float = param.Number(
+        1,
+        bounds=(0, None),
+        inclusive_bounds=(False, True),
+        doc="The binary search stops when the breaking point is within resolution of the capacity",
+    )
+    trial_duration: float = param.Number(
+        30.0,
+        bounds=(0, None),
+        doc="The duration in seconds of a trial when searching the arrival rate",
+    )
+    percentile: float = param.Number(
+        0.95, bounds=(0, 1), doc="The percentile of the durations compared to the SLA"
+    )
+    max_load_duration: float = param.Number(
+        2.0, bounds=(0, None), doc="The maximum allowable duration of the load event"
+    )
+    max_interaction_duration: float = param.Number(
+        1.0, bounds=(0, None), doc="The maximum allowable duration of the interact event"
+    )
+    corrected: bool = param.Boolean(
+        True,
+        doc="""Whether or not to compare the durations corrected for coordinated omission to
+        the SLA""",
+    )
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._trials: List[Dict] = []
+
+    @property
+    def curve(self) -> pd.DataFrame:
+        """Returns the capacity curve, i.e. the percentile durations per load tried. The load
+        is in the `n_users` or `rate` column depending on the mode"""
+        columns = ["value", "passed", "generator_bound", *SLA_EVENTS]
+        return (
+            pd.DataFrame(self._trials, columns=columns)
+            .sort_values("value", kind="stable")
+            .reset_index(drop=True)
+            .rename(columns={"value": self.mode})
+        )
+
+    @property
+    def capacity(self) -> Optional[float]:
+        """Returns the maximum load meeting the SLA or None if no load tried did"""
+        passed = [trial["value"] for trial in self._trials if trial["passed"]]
+        return max(passed) if passed else None
+
+    @property
+    def breaking_point(self) -> Optional[float]:
+        """Returns the minimum load breaking the SLA or None if no load tried did"""
+        failed = [trial["value"] for trial in self._trials if not trial["passed"]]
+        return min(failed) if failed else None
+
+    def _round(self, value: float) -> float:
+        return math.ceil(value) if self.mode == "n_users" else value
+
+    def evaluate(self, data: pd.DataFrame) -> Dict[str, float]:
+        """Returns the percentile duration of the `load` and `interact` events of a trial
+
+        Args:
+            data (pd.DataFrame): The results of the trial
+
+        Returns:
+            Dict[str, float]: The percentile duration per event. nan if it did not occur
+        """
+        durations = corrected_durations(data) if self.corrected else data["duration"]
+        return {
+            event: durations[data["event"] == event].quantile(self.percentile)
+            for event in SLA_EVENTS
+        }
+
+    def meets_sla(self, durations: Dict[str, float]) -> bool:
+        """Returns True if the percentile durations of a trial meet the SLA"""
+        limits = {"load": self.max_load_duration, "interact": self.max_interaction_duration}
+        # nan compares False, i.e. events that did not occur do not break the SLA
+        return not any(durations[event] > limits[event] for event in SLA_EVENTS)
+
+    async def trial(self, value: float) -> Dict:
+        """Runs a trial with the given load and returns its result
+
+        Args:
+            value (float): The number of users or the arrival rate
+
+        Returns:
+            Dict: The `value`, whether it `passed` and was `generator_bound` and the
+                percentile duration per event
+        """
+        if self.mode == "n_users":
+            self.runner.n_users = int(value)
+        else:
+            self.runner.profile = ConstantRate(rate=value, duration=self.trial_duration)
+        await self.runner.run()
+        durations = self.evaluate(self.runner.logger.data)
+        return {
+            "value": value,
+            "passed": self.meets_sla(durations),
+            "generator_bound": self.runner.generator_bound,
+            **durations,
+        }
+
+    async def _try(self, value: float) -> bool:
+        result = await self.trial(value)
+        self._trials.append(result)
+        if result["generator_bound"]:
+            self.param.warning(
+                f"The load generator was the bottleneck at {self.mode}={value}. The search "
+                "stops here. Consider more workers"
+            )
+        return result["passed"]
+
+    async def run(self) -> pd.DataFrame:
+        """Runs the search
+
+        Returns:
+            pd.DataFrame: The capacity curve
+        """
+        self._trials = []
+        runner = self.runner
+        n_users, profile = runner.n_users, runner.profile
+        try:
+            async with runner.reuse_browsers():
+                await self._search()
+        finally:
+            runner.n_users, runner.profile = n_users, profile
+        return self.curve
+
+    async def _search(self):
+        passed, failed = None, None
+        value = self._round(min(self.start, self.max_value))
+        # Grow the load exponentially until the SLA is broken
+        while True:
+            if await self._try(value):
+                passed = value
+            else:
+                failed = value
+                break
+            if self._trials[-1]["generator_bound"] or value >= self.max_value:
+                return
+            value = self._round(min(value * self.growth, self.max_value))
+        if self._trials[-1]["generator_bound"]:
+            return
+
+        # Then bisect between the last passing and the first failing load
+        low = passed if passed is not None else 0
+        while failed - low > self.resolution:
+            value = self._round((low + failed) / 2)
+            if value in (low, failed):
+                break
+            if await self._try(value):
+                low = value
+            else:
+                failed = value
+            if self._trials[-1]["generator_bound"]:
+                return
+
+    def plot(self):
+        """Returns a plot of the capacity curve with the SLA and the capacity"""
+        import holoviews as hv  # pylint: disable=import-outside-toplevel
+        import hvplot.pandas  # pylint: disable=import-outside-toplevel,unused-import
+
+        curve = self.curve
+        plot = curve.hvplot.line(
+            x=self.mode,
+            y=SLA_EVENTS,
+            xlabel=self.mode,
+            ylabel=f"p{self.percentile * 100:g} duration in seconds",
+            ylim=(0, None),
+            height=400,
+            responsive=True,
+        ) * curve.hvplot.scatter(x=self.mode, y=SLA_EVENTS)
+        plot *= hv.HLine(self.max_load_duration).opts(color="#BC3C29", line_dash="dashed")
+        plot *= hv.HLine(self.max_interaction_duration).opts(color="#E18727", line_dash="dashed")
+        if self.capacity is not None:
+            plot *= hv.VLine(self.capacity).opts(color="#20854E")
+        return plot
@@ -0,0 +1,190 @@
+"""An index of the archived runs and their summary statistics"""
+from __future__ import annotations
+
+import json
+import sqlite3
+from contextlib import closing
+from pathlib import Path
+from typing import Dict, List
+
+import pandas as pd
+import param
+
+from . import analysis, quantiles
+from .io import read_loadwright_file
+from .sinks import SINKS
+
+CATALOG_FILE = "catalog.sqlite"
+RUN_COLUMNS = ["host", "user", "n_users", "profile"]
+STATISTICS = ["count", "mean", "min", *quantiles.QUANTILES, "max"]
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    file TEXT UNIQUE NOT NULL,
+    started TEXT,
+    duration REAL,
+    n_events INTEGER,
+    peak_users INTEGER,
+    host TEXT,
+    user TEXT,
+    n_users INTEGER,
+    profile TEXT,
+    metadata TEXT
+);
+CREATE INDEX IF NOT EXISTS runs_started ON runs (started);
+CREATE TABLE IF NOT EXISTS events (
+    run_id INTEGER NOT NULL REFERENCES runs (id),
+    event TEXT NOT NULL,
+    {", ".join(f'"{statistic}" REAL' for statistic in STATISTICS)},
+    peak_concurrency INTEGER,
+    PRIMARY KEY (run_id, event)
+);
+"""
+
+
+class RunCatalog(param.Parameterized):
+    """A SQLite index of the archived runs
+
+    For each run it records the metadata, like the host, the User class and the number of
+    users, and precomputed summary statistics, i.e. the count, percentile durations and peak
+    concurrency per event. Trends across many runs can then be shown without reading the
+    archived files.
+
+    The Logger records every archived run in the catalog of its archive. Use it as
+
+    ```python
+    catalog = RunCatalog(file="test_results/catalog.sqlite")
+    catalog.runs()
+    catalog.trend("p95")
+    ```
+    """
+
+    file: str = param.String(
+        str(Path("test_results") / CATALOG_FILE),
+        doc="The SQLite file. The archived files are expected in the 'archive' folder next to it",
+    )
+
+    def _connect(self) -> sqlite3.Connection:
+        Path(self.file).parent.mkdir(parents=True, exist_ok=True)
+        connection = sqlite3.connect(self.file)
+        connection.executescript(SCHEMA)
+        return connection
+
+    def _query(self, query: str, params: tuple = ()) -> pd.DataFrame:
+        with closing(self._connect()) as connection:
+            return pd.read_sql_query(query, connection, params=params, parse_dates=["started"])
+
+    def record(self, file: str | Path, data: pd.DataFrame, **metadata) -> int:
+        """Records a run in the catalog. A run already recorded for the file is replaced
+
+        Args:
+            file (str | Path): The archived Loadwright file of the run
+            data (pd.DataFrame): The results of the run
+            metadata: The `host`, `user`, `n_users` and `profile` of the run and any other
+                json serializable values
+
+        Returns:
+            int: The id of the run
+        """
+        events = analysis.user_events(data)
+        statistics = quantiles.summary(events)
+        peaks = analysis.concurrency(events).drop(columns=analysis.TIME_COLUMN).max()
+        peak_users = analysis.active_users(events)["active_users"].max() if len(events) else 0
+        run = {
+            "file": str(file),
+            "started": data["start"].min().isoformat() if len(data) else None,
+            "duration": float(data["stop_seconds"].max() - data["start_seconds"].min())
+            if len(data)
+            else 0.0,
+            "n_events": len(events),
+            "peak_users": int(peak_users),
+            **{column: metadata.pop(column, None) for column in RUN_COLUMNS},
+            "metadata": json.dumps(metadata, default=str),
+        }
+        with closing(self._connect()) as connection:
+            with connection:
+                connection.execute(
+                    "DELETE FROM events WHERE run_id IN (SELECT id FROM runs WHERE file = ?)",
+                    (run["file"],),
+                )
+                connection.execute("DELETE FROM runs WHERE file = ?", (run["file"],))
+                cursor = connection.execute(
+                    f"INSERT INTO runs ({', '.join(run)}) VALUES ({', '.join('?' * len(run))})",
+                    tuple(run.values()),
+                )
+                run_id = cursor.lastrowid
+                connection.executemany(
+                    f"""INSERT INTO events VALUES ({', '.join('?' * (len(STATISTICS) + 3))})""",
+                    [
+                        (
+                            run_id,
+                            str(event),
+                            *(float(row[statistic]) for statistic in STATISTICS),
+                            int(peaks.get(str(event), 0)),
+                        )
+                        for event, row in statistics.iterrows()
+                    ],
+                )
+        return run_id
+
+    def sync(self, archive: str | Path | None = None, pattern: str | None = None) -> List[int]:
+        """Records the archived files not yet in the catalog, for example those archived
+        before the catalog existed
+
+        Args:
+            archive (str | Path | None, optional): The folder of the archived files. Defaults to
+                the 'archive' folder next to the catalog.
+            pattern (str | None, optional): The glob pattern of the archived files. Defaults to
+                the files of every format a Sink can write, i.e. csv, jsonl, parquet and arrow.
+
+        Returns:
+            List[int]: The ids of the runs recorded
+        """
+        archive = Path(self.file).parent / "archive" if archive is None else Path(archive)
+        recorded = set(self.runs()["file"])
+        return [
+            self.record(file, read_loadwright_file(file))
+            for file in sorted(archive.glob(pattern or "*"))
+            if str(file) not in recorded and (pattern or file.suffix.lower() in SINKS)
+        ]
+
+    def runs(self) -> pd.DataFrame:
+        """Returns the recorded runs, oldest first"""
+        return self._query("SELECT * FROM runs ORDER BY started, id")
+
+    def events(self, event: str | None = None) -> pd.DataFrame:
+        """Returns the summary statistics per event of the recorded runs, oldest first
+
+        Args:
+            event (str | None, optional): The event to return. Defaults to all events.
+        """
+        query = (
+            "SELECT events.*, runs.started, runs.file "
+            "FROM events JOIN runs ON events.run_id = runs.id"
+        )
+        params: tuple = ()
+        if event is not None:
+            query += " WHERE events.event = ?"
+            params = (event,)
+        return self._query(query + " ORDER BY runs.started, runs.id", params)
+
+    def trend(self, statistic: str = "p95") -> pd.DataFrame:
+        """Returns a statistic, for example `p95` or `peak_concurrency`, of each event over the
+        recorded runs
+
+        Returns:
+            pd.DataFrame: A row per run indexed by its start and a column per event
+        """
+        if statistic not in [*STATISTICS, "peak_concurrency"]:
+            raise ValueError(
+                f"statistic should be one of {STATISTICS + ['peak_concurrency']}. Got {statistic}"
+            )
+        return self.events().pivot_table(
+            index="started", columns="event", values=statistic, aggfunc="first"
+        )
+
+    def metadata(self, run_id: int) -> Dict:
+        """Returns the extra metadata recorded with a run"""
+        runs = self._query("SELECT metadata FROM runs WHERE id = ?", (run_id,))
+        return json.loads(runs["metadata"].iloc[0]) if len(runs) else {}
@@ -0,0 +1,280 @@
+"""Comparison of load test runs, for example to catch performance regressions in CI"""
+from __future__ import annotations
+
+import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import param
+
+from .analysis import user_events
+from .io import read_loadwright_file
+from .logger import TEST_RESULTS_FILE, TEST_RESULTS_PATH
+
+ARCHIVE_TIMESTAMP_FORMAT = "%Y%m%d_%H%M%S"
+# The maximum number of values drawn at once when bootstrapping
+MAX_BOOTSTRAP_VALUES = 10_000_000
+
+
+class PerformanceRegression(AssertionError):
+    """Raised when a run breaks a latency budget or regresses compared to its baseline"""
+
+
+def archived_runs(path: str | Path = TEST_RESULTS_PATH, file: str = TEST_RESULTS_FILE) -> List:
+    """Returns the (timestamp, file) of the runs archived by `Logger.archive`, oldest first
+
+    Args:
+        path (str | Path, optional): The path the Logger logs to. Defaults to "test_results".
+        file (str, optional): The file the Logger logs to. Defaults to "loadwright.csv".
+
+    Returns:
+        List[Tuple[datetime.datetime, Path]]: The archived runs
+    """
+    filename, extension = file.split(".")
+    runs = []
+    for archived in (Path(path) / "archive").glob(f"{filename}_*.{extension}"):
+        timestamp = archived.stem[len(filename) + 1 :]
+        try:
+            runs.append((datetime.datetime.strptime(timestamp, ARCHIVE_TIMESTAMP_FORMAT), archived))
+        except ValueError:
+            continue
+    return sorted(runs)
+
+
+def latest_run(
+    path: str | Path = TEST_RESULTS_PATH,
+    file: str = TEST_RESULTS_FILE,
+    before: datetime.datetime | None = None,
+) -> Optional[Path]:
+    """Returns the file of the latest archived run or None if there is none
+
+    Args:
+        path (str | Path, optional): The path the Logger logs to. Defaults to "test_results".
+        file (str, optional): The file the Logger logs to. Defaults to "loadwright.csv".
+        before (datetime.datetime | None, optional): If provided only runs started before this
+            second are considered, for example to exclude the current run. Defaults to None.
+    """
+    runs = archived_runs(path, file)
+    if before is not None:
+        before = pd.Timestamp(before).floor("s").to_pydatetime()
+        runs = [(timestamp, archived) for timestamp, archived in runs if timestamp < before]
+    return runs[-1][1] if runs else None
+
+
+def bootstrap_delta(
+    baseline: np.ndarray,
+    current: np.ndarray,
+    q: float,
+    *,
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: int | None = None,
+) -> Tuple[float, float]:
+    """Returns the bootstrap confidence interval of the difference in the q'th quantile of the
+    current and the baseline values
+
+    Args:
+        baseline (np.ndarray): The baseline values, for example durations
+        current (np.ndarray): The current values
+        q (float): The quantile, for example 0.95
+        n_resamples (int, optional): The number of bootstrap resamples. Defaults to 1000.
+        confidence (float, optional): The confidence level. Defaults to 0.95.
+        seed (int | None, optional): The seed of the random resampling. Defaults to None.
+
+    Returns:
+        Tuple[float, float]: The low and high bounds. nan if a run has no values
+    """
+    baseline = np.asarray(baseline, dtype="float64")
+    current = np.asarray(current, dtype="float64")
+    if not baseline.size or not current.size:
+        return (np.nan, np.nan)
+    generator = np.random.default_rng(seed)
+    deltas = np.empty(n_resamples)
+    chunk = max(MAX_BOOTSTRAP_VALUES // max(len(baseline), len(current)), 1)
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        deltas[start : start + size] = np.quantile(
+            generator.choice(current, size=(size, len(current))), q, axis=1
+        ) - np.quantile(generator.choice(baseline, size=(size, len(baseline))), q, axis=1)
+    low, high = np.quantile(deltas, [(1 - confidence) / 2, (1 + confidence) / 2])
+    return (float(low), float(high))
+
+
+def _compare(before: np.ndarray, after: np.ndarray, q: float, **kwargs) -> Dict[str, float]:
+    before_q = np.quantile(before, q) if before.size else np.nan
+    after_q = np.quantile(after, q) if after.size else np.nan
+    low, high = bootstrap_delta(before, after, q, **kwargs)
+    return {
+        "baseline_count": before.size,
+        "current_count": after.size,
+        "baseline": before_q,
+        "current": after_q,
+        "delta": after_q - before_q,
+        "delta_low": low,
+        "delta_high": high,
+        "relative": (after_q - before_q) / before_q if before_q else np.nan,
+    }
+
+
+def compare_runs(
+    baseline: pd.DataFrame | str | Path,
+    current: pd.DataFrame | str | Path,
+    *,
+    q: float = 0.95,
+    by: str = "event",
+    n_resamples: int = 1000,
+    confidence: float = 0.95,
+    seed: int | None = None,
+) -> pd.DataFrame:
+    """Returns a comparison of the q'th quantile of the durations of two runs per event
+
+    Args:
+        baseline (pd.DataFrame | str | Path): The results or Loadwright file of the baseline run
+        current (pd.DataFrame | str | Path): The results or Loadwright file of the current run
+        q (float, optional): The quantile. Defaults to 0.95.
+        by (str, optional): The column to group by. Defaults to "event".
+        n_resamples (int, optional): The number of bootstrap resamples. Defaults to 1000.
+        confidence (float, optional): The confidence level of the interval of the difference.
+            Defaults to 0.95.
+        seed (int | None, optional): The seed of the bootstrap. Defaults to None.
+
+    Returns:
+        pd.DataFrame: A row per event with the `baseline_count`, `current_count`, the `baseline`
+            and `current` quantiles, their difference `delta` with its confidence interval
+            `delta_low` to `delta_high` and the `relative` difference
+    """
+    if not isinstance(baseline, pd.DataFrame):
+        baseline = read_loadwright_file(baseline)
+    if not isinstance(current, pd.DataFrame):
+        current = read_loadwright_file(current)
+    baseline_groups = user_events(baseline).groupby(by, observed=True)["duration"]
+    current_groups = user_events(current).groupby(by, observed=True)["duration"]
+    baseline_durations = {key: values.to_numpy() for key, values in baseline_groups}
+    current_durations = {key: values.to_numpy() for key, values in current_groups}
+
+    empty = np.array([])
+    rows = {
+        key: _compare(
+            baseline_durations.get(key, empty),
+            current_durations.get(key, empty),
+            q,
+            n_resamples=n_resamples,
+            confidence=confidence,
+            seed=seed,
+        )
+        for key in dict.fromkeys([*baseline_durations, *current_durations])
+    }
+    columns = [
+        "baseline_count",
+        "current_count",
+        "baseline",
+        "current",
+        "delta",
+        "delta_low",
+        "delta_high",
+        "relative",
+    ]
+    return pd.DataFrame.from_dict(rows, orient="index", columns=columns).rename_axis(by)
+
+
+class RegressionGate(param.Parameterized):
+    """Fails a run that breaks a latency budget or regresses compared to a baseline run
+
+    A regression is significant if the lower bound of the bootstrap confidence interval of the
+    difference is more than `max_regression` times the baseline, i.e. if we are confident the
+    run got slower by more than that.
+
+    Use it in a test as
+
+    ```python
+    gate = RegressionGate(budgets={"load": 2.0}, max_regression=0.1)
+    gate.check(runner.logger.data)
+    ```
+
+    or via the `loadwright_gate` fixture of the opt-in `loadwright.pytest_plugin`.
+    """
+
+    baseline: str | None = param.String(
+        None,
+        doc="""The Loadwright file of the baseline run. Defaults to the latest run archived
+        under `path` before the current run""",
+    )
+    path: str = param.String(TEST_RESULTS_PATH, doc="The path the runs are archived under")
+    file: str = param.String(TEST_RESULTS_FILE, doc="The file the runs are logged to")
+    percentile: float = param.Number(
+        0.95, bounds=(0, 1), doc="The percentile of the durations compared"
+    )
+    budgets: dict = param.Dict(
+        {}, doc="The maximum percentile duration in seconds per event, for example {'load': 2.0}"
+    )
+    max_regression: float | None = param.Number(
+        0.1,
+        bounds=(0, None),
+        doc="""The maximum relative increase of the percentile duration compared to the
+        baseline. If None the run is not compared to a baseline""",
+    )
+    confidence: float = param.Number(
+        0.95, bounds=(0, 1), doc="The confidence level of the bootstrap intervals"
+    )
+    n_resamples: int = param.Integer(1000, bounds=(1, None), doc="The number of resamples")
+    seed: int | None = param.Integer(None, doc="The seed of the bootstrap")
+
+    def baseline_file(self, current: pd.DataFrame) -> Optional[Path]:
+        """Returns the Loadwright file of the baseline run or None if there is none"""
+        if self.baseline:
+            return Path(self.baseline)
+        before = current["start"].min() if len(current) else None
+        return latest_run(self.path, self.file, before=before)
+
+    def compare(self, current: pd.DataFrame | str | Path) -> Optional[pd.DataFrame]:
+        """Returns the comparison of the current run with the baseline or None if there is no
+        baseline run"""
+        if not isinstance(current, pd.DataFrame):
+            current = read_loadwright_file(current)
+        baseline = self.baseline_file(current)
+        if baseline is None:
+            return None
+        return compare_runs(
+            baseline,
+            current,
+            q=self.percentile,
+            n_resamples=self.n_resamples,
+            confidence=self.confidence,
+            seed=self.seed,
+        )
+
+    def failures(self, current: pd.DataFrame | str | Path) -> List[str]:
+        """Returns the budgets broken and the significant regressions of the current run"""
+        if not isinstance(current, pd.DataFrame):
+            current = read_loadwright_file(current)
+        name = f"p{self.percentile * 100:g}"
+        failures = []
+        durations = user_events(current).groupby("event", observed=True)["duration"]
+        for event, budget in self.budgets.items():
+            if event in durations.groups:
+                duration = durations.get_group(event).quantile(self.percentile)
+                if duration > budget:
+                    failures.append(
+                        f"The {name} of '{event}' is {duration:.3f}s. The budget is {budget}s"
+                    )
+        if self.max_regression is None:
+            return failures
+        comparison = self.compare(current)
+        if comparison is None:
+            return failures
+        for event, row in comparison.iterrows():
+            if row["delta_low"] > self.max_regression * row["baseline"]:
+                failures.append(
+                    f"The {name} of '{event}' regressed from {row['baseline']:.3f}s to "
+                    f"{row['current']:.3f}s ({row['relative']:+.0%}, {self.confidence:.0%} "
+                    f"CI of the increase {row['delta_low']:.3f}s to {row['delta_high']:.3f}s)"
+                )
+        return failures
+
+    def check(self, current: pd.DataFrame | str | Path):
+        """Raises a PerformanceRegression if the current run breaks a budget or regressed"""
+        failures = self.failures(current)
+        if failures:
+            raise PerformanceRegression("\n".join(failures))
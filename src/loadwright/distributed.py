@@ -0,0 +1,483 @@
+"""Running a load test on several machines, i.e. a Coordinator and Worker nodes"""
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import importlib
+import json
+import math
+import os
+import socket
+import time
+from typing import Dict, List, Tuple
+
+import param
+
+from .logger import Logger, iter_events
+from .runner import LoadTestRunner
+from .scheduler import LoadProfile
+from .user import User
+
+# The maximum size in bytes of a message
+STREAM_LIMIT = 2**26
+# The maximum number of events sent in one message
+MAX_EVENTS_PER_MESSAGE = 10_000
+CONNECT_RETRY_DELAY = 0.2
+
+
+def clock_offset(samples: List[Tuple[float, float, float]]) -> Tuple[float, float]:
+    """Estimates the offset of a remote clock from round trips, like NTP
+
+    Args:
+        samples (List[Tuple[float, float, float]]): The (sent, remote time, received) of each
+            round trip. The sent and received times are in the local clock
+
+    Returns:
+        Tuple[float, float]: The offset, i.e. remote time = local time + offset, and the round
+            trip time in seconds of the fastest round trip. The error of the offset is at most
+            half the round trip time
+    """
+    sent, remote, received = min(samples, key=lambda sample: sample[2] - sample[0])
+    return remote - (sent + received) / 2, received - sent
+
+
+def _to_json(value):
+    if hasattr(value, "item"):
+        return value.item()
+    return str(value)
+
+
+def _encode(message: Dict) -> bytes:
+    return (json.dumps(message, default=_to_json) + "\n").encode()
+
+
+async def _receive(reader: asyncio.StreamReader) -> Dict:
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("The connection was closed")
+    return json.loads(line)
+
+
+def _profile_message(profile: LoadProfile) -> Dict:
+    cls = type(profile)
+    params = {name: value for name, value in profile.param.values().items() if name != "name"}
+    return {"class": f"{cls.__module__}.{cls.__qualname__}", "params": params}
+
+
+def _load_profile(message: Dict) -> LoadProfile:
+    module, _, name = message["class"].rpartition(".")
+    cls = getattr(importlib.import_module(module), name, None)
+    if not (isinstance(cls, type) and issubclass(cls, LoadProfile)):
+        raise ValueError(f"{message['class']} is not a LoadProfile")
+    return cls(**message["params"])
+
+
+class _Node:
+    """The connection of the Coordinator to a Worker node"""
+
+    def __init__(self, name: str, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.name = name
+        self.reader = reader
+        self.writer = writer
+        self.offset = 0.0
+        self.round_trip = math.nan
+
+    def write(self, **message):
+        """Queues a message without waiting for it to be sent"""
+        if not self.writer.is_closing():
+            self.writer.write(_encode(message))
+
+    async def send(self, **message):
+        """Sends a message"""
+        self.write(**message)
+        await self.writer.drain()
+
+    async def receive(self) -> Dict:
+        """Returns the next message"""
+        return await _receive(self.reader)
+
+    async def synchronize(self, n_pings: int):
+        """Estimates the offset of the clock of the node"""
+        samples = []
+        for _ in range(n_pings):
+            sent = time.time()
+            await self.send(type="ping")
+            pong = await self.receive()
+            samples.append((sent, pong["time"], time.time()))
+        self.offset, self.round_trip = clock_offset(samples)
+
+
+class Coordinator(LoadTestRunner):
+    """Runs a load test on Worker nodes, for example on several machines, and merges their
+    events into its logger
+
+    The Worker nodes connect to the coordinator over TCP. For every run the coordinator
+    estimates the clock offset of each node, deals out the users of the load profile to the
+    nodes in turn and starts them at the same time. The nodes stream their events back while
+    the test runs. Their times are corrected for the clock offsets, such that `start_seconds`
+    is consistent across the nodes. The events get a `node` column.
+
+    Use it as
+
+    ```python
+    async with Coordinator(host=host, n_users=100, n_nodes=2, address="0.0.0.0") as runner:
+        await runner.run()
+    ```
+
+    and run `await Worker(runner=LoadTestRunner(user=MyUser()), address=...).run()` on each
+    machine. The user and browser settings of the nodes are given by their runner. The hosts
+    and the load profile are given by the coordinator. Only JSON is exchanged, i.e. the profile
+    is recreated by its class name and parameters on the nodes.
+    """
+
+    address: str = param.String(
+        "127.0.0.1",
+        doc="The address to listen on. Use '0.0.0.0' to accept nodes on other machines",
+    )
+    port: int = param.Integer(
+        6100,
+        bounds=(0, None),
+        doc="The port to listen on. If 0 a free port is chosen and set when started",
+    )
+    n_nodes: int = param.Integer(
+        1, bounds=(1, None), doc="The number of Worker nodes running the users"
+    )
+    n_pings: int = param.Integer(
+        8,
+        bounds=(1, None),
+        doc="The number of round trips used to estimate the clock offset of each node",
+    )
+    start_delay: float = param.Number(
+        0.5,
+        bounds=(0, None),
+        doc="""The seconds from all nodes being ready to the start of the test. Gives the start
+        message time to reach the nodes""",
+    )
+    connect_timeout: float = param.Number(
+        60.0, bounds=(0, None), doc="The seconds to wait for the nodes to connect"
+    )
+
+    def __init__(self, user: User | None = None, users: List[User] | None = None, **params):
+        super().__init__(user=user, users=users, **params)
+
+        self._server: asyncio.AbstractServer | None = None
+        self._nodes: List[_Node] = []
+        self._connected: asyncio.Event | None = None
+
+    async def __aenter__(self) -> "Coordinator":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    @property
+    def clock_offsets(self) -> Dict[str, float]:
+        """Returns the clock offset in seconds of each connected node estimated for the last run,
+        i.e. node time = coordinator time + offset"""
+        return {node.name: node.offset for node in self._nodes}
+
+    async def start(self):
+        """Starts listening for Worker nodes. Called by `run` if needed"""
+        if self._server is not None:
+            return
+        self._connected = asyncio.Event()
+        self._server = await asyncio.start_server(
+            self._accept, self.address, self.port, limit=STREAM_LIMIT
+        )
+        if not self.port:
+            self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Asks the Worker nodes to exit and stops listening"""
+        for node in self._nodes:
+            node.write(type="close")
+        await self._disconnect()
+        server, self._server = self._server, None
+        if server is not None:
+            server.close()
+            await server.wait_closed()
+
+    async def _disconnect(self):
+        nodes, self._nodes = self._nodes, []
+        for node in nodes:
+            node.writer.close()
+        await asyncio.gather(*(node.writer.wait_closed() for node in nodes), return_exceptions=True)
+        self._connected = asyncio.Event()
+
+    async def _accept(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            hello = await _receive(reader)
+        except (ConnectionError, ValueError):
+            writer.close()
+            return
+        if len(self._nodes) >= self.n_nodes:
+            self.param.warning(f"Rejected the node '{hello.get('node')}'. All nodes connected")
+            writer.write(_encode({"type": "close"}))
+            writer.close()
+            return
+        name = str(hello.get("node") or len(self._nodes))
+        if name in [node.name for node in self._nodes]:
+            name = f"{name}-{len(self._nodes)}"
+        self._nodes.append(_Node(name, reader, writer))
+        if len(self._nodes) == self.n_nodes and self._connected is not None:
+            self._connected.set()
+
+    async def _wait_for_nodes(self) -> List[_Node]:
+        await self.start()
+        try:
+            await asyncio.wait_for(self._connected.wait(), self.connect_timeout)  # type: ignore
+        except asyncio.TimeoutError as ex:
+            raise TimeoutError(
+                f"{len(self._nodes)} of {self.n_nodes} nodes connected to "
+                f"{self.address}:{self.port} within {self.connect_timeout}s"
+            ) from ex
+        return list(self._nodes)
+
+    async def _start_logger(self) -> float:
+        origin = time.time() + self.start_delay
+        self.logger.reset(origin=origin)
+        return origin
+
+    async def _run_load(self, arrivals: List[Tuple[int, float]], get_origin):
+        """Runs the users on the Worker nodes. A failing node aborts the run and disconnects
+        the nodes"""
+        nodes = await self._wait_for_nodes()
+        n_users = math.ceil(self.n_users / len(nodes))
+        profile = _profile_message(self.profile)
+        self._loop = loop = asyncio.get_running_loop()
+        ready = [loop.create_future() for _ in nodes]
+
+        async def start():
+            await asyncio.gather(*ready)
+            origin = await get_origin()
+            for node in nodes:
+                await node.send(type="start", origin=origin + node.offset)
+
+        tasks = [asyncio.ensure_future(start())] + [
+            asyncio.ensure_future(
+                self._run_node(node, arrivals[index :: len(nodes)], n_users, profile, ready[index])
+            )
+            for index, node in enumerate(nodes)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await self._disconnect()
+            raise
+
+    async def _run_node(
+        self,
+        node: _Node,
+        arrivals: List[Tuple[int, float]],
+        n_users: int,
+        profile: Dict,
+        ready: asyncio.Future,
+    ):
+        await node.synchronize(self.n_pings)
+        await node.send(
+            type="run",
+            host=self.host,
+            hosts=self.hosts,
+            n_users=n_users,
+            profile=profile,
+            arrivals=arrivals,
+        )
+        if self._stopped:
+            node.write(type="stop")
+        while True:
+            message = await node.receive()
+            kind = message["type"]
+            if kind == "events":
+                self._log_events(node, message["events"])
+            elif kind == "ready":
+                ready.set_result(None)
+            elif kind == "error":
+                raise RuntimeError(f"The node '{node.name}' failed: {message['message']}")
+            elif kind == "done":
+                if not ready.done():
+                    ready.set_result(None)
+                return
+
+    def _log_events(self, node: _Node, events: List[Dict]):
+        for event in events:
+            name, user = event.pop("event"), event.pop("user")
+            start, stop = event.pop("start") - node.offset, event.pop("stop") - node.offset
+            self.logger.log(name, user, start, stop, node=node.name, **event)
+
+    def _stop_nodes(self):
+        for node in self._nodes:
+            node.write(type="stop")
+
+    def stop(self):
+        """Aborts the running test. Can be called from any thread.
+
+        The nodes stop their users and send the events logged so far."""
+        super().stop()
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self._stop_nodes)
+
+    @contextlib.asynccontextmanager
+    async def reuse_browsers(self):
+        """The coordinator does not launch browsers. The nodes keep theirs between runs"""
+        yield
+
+    def _metadata(self) -> Dict:
+        return {**super()._metadata(), "n_nodes": self.n_nodes, "clock_offsets": self.clock_offsets}
+
+
+class Worker(param.Parameterized):
+    """A node running its share of the users of a Coordinator, for example on another machine
+
+    The worker connects to the coordinator and runs the users it is given until the coordinator
+    closes the connection. The events are streamed to the coordinator every `interval` seconds
+    and are neither saved nor kept in memory by the worker.
+
+    Use it as
+
+    ```python
+    await Worker(runner=LoadTestRunner(user=MyUser(), headless=True), address=address).run()
+    ```
+
+    The users run with the user and browser settings of the runner. Set its `n_workers` to run
+    them in several processes.
+    """
+
+    runner: LoadTestRunner = param.ClassSelector(
+        class_=LoadTestRunner,
+        doc="""The runner running the users of the node. The hosts and the load profile are
+        given by the coordinator""",
+    )
+    address: str = param.String("127.0.0.1", doc="The address of the Coordinator")
+    port: int = param.Integer(6100, bounds=(1, None), doc="The port of the Coordinator")
+    node: str | None = param.String(
+        None, doc="The name of the node in the `node` column. Defaults to hostname-pid"
+    )
+    interval: float = param.Number(
+        1.0, bounds=(0, None), doc="The seconds between streaming the new events"
+    )
+    connect_timeout: float = param.Number(
+        60.0, bounds=(0, None), doc="The seconds to retry connecting to the Coordinator"
+    )
+
+    def __init__(self, **params):
+        params["runner"] = params.get("runner", LoadTestRunner())
+        super().__init__(**params)
+
+        self.runner.logger = Logger(auto_save=False, auto_archive=False)
+        self._writer: asyncio.StreamWriter | None = None
+        self._origin: asyncio.Future | None = None
+        self._running: asyncio.Future | None = None
+        self._sent = 0
+
+    async def _connect(self) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                return await asyncio.open_connection(self.address, self.port, limit=STREAM_LIMIT)
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise
+                await asyncio.sleep(CONNECT_RETRY_DELAY)
+
+    async def _send(self, **message):
+        self._writer.write(_encode(message))  # type: ignore[union-attr]
+        await self._writer.drain()  # type: ignore[union-attr]
+
+    async def run(self):
+        """Connects to the Coordinator and runs the users it gives the node until the coordinator
+        closes the connection"""
+        reader, self._writer = await self._connect()
+        try:
+            await self._send(
+                type="hello", node=self.node or f"{socket.gethostname()}-{os.getpid()}"
+            )
+            while True:
+                try:
+                    message = await _receive(reader)
+                except ConnectionError:
+                    break
+                kind = message["type"]
+                if kind == "ping":
+                    await self._send(type="pong", time=time.time())
+                elif kind == "run":
+                    self._running = asyncio.ensure_future(self._run(message))
+                elif kind == "start" and self._origin is not None and not self._origin.done():
+                    self._origin.set_result(message["origin"])
+                elif kind == "stop":
+                    self._stop()
+                elif kind == "close":
+                    break
+        finally:
+            self._stop()
+            if self._running is not None:
+                await asyncio.gather(self._running, return_exceptions=True)
+            self._writer.close()
+            with contextlib.suppress(ConnectionError):
+                await self._writer.wait_closed()
+
+    def _stop(self):
+        if self._running is None or self._running.done():
+            return
+        self.runner.stop()
+        # Users not started yet start and stop at once
+        if self._origin is not None and not self._origin.done():
+            self._origin.set_result(time.time())
+
+    async def _run(self, message: Dict):
+        runner = self.runner
+        runner._stopped = False  # pylint: disable=protected-access
+        self._origin = asyncio.get_running_loop().create_future()
+        self._sent = 0
+        finished = asyncio.Event()
+        streaming: List[asyncio.Future] = []
+
+        async def get_origin():
+            await self._send(type="ready")
+            origin = await self._origin  # type: ignore[misc]
+            runner.logger.reset(origin=origin)
+            streaming.append(asyncio.ensure_future(self._stream(finished)))
+            return origin
+
+        try:
+            runner.host = message["host"]
+            runner.hosts = message["hosts"]
+            runner.n_users = message["n_users"]
+            runner.profile = _load_profile(message["profile"])
+            arrivals = [tuple(arrival) for arrival in message["arrivals"]]
+            await runner._run_load(arrivals, get_origin)  # pylint: disable=protected-access
+        except Exception as ex:  # pylint: disable=broad-except
+            finished.set()
+            await asyncio.gather(*streaming, return_exceptions=True)
+            with contextlib.suppress(ConnectionError):
+                await self._send(type="error", message=repr(ex))
+            return
+        finished.set()
+        await asyncio.gather(*streaming)
+        await self._flush()
+        with contextlib.suppress(ConnectionError):
+            await self._send(type="done")
+
+    async def _stream(self, finished: asyncio.Event):
+        while not finished.is_set():
+            with contextlib.suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(finished.wait(), self.interval)
+            await self._flush()
+
+    async def _flush(self):
+        """Sends the events logged since the last flush and removes them from memory"""
+        buffer = self.runner.logger.buffer
+        data = self.runner.logger.tail(self._sent)
+        self._sent += len(data)
+        buffer.discard(self._sent - buffer.discarded)
+        for position in range(0, len(data), MAX_EVENTS_PER_MESSAGE):
+            events = [
+                {"event": name, "user": user, "start": start, "stop": stop, **kwargs}
+                for name, user, start, stop, kwargs in iter_events(
+                    data.iloc[position : position + MAX_EVENTS_PER_MESSAGE]
+                )
+            ]
+            await self._send(type="events", events=events)
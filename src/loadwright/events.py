@@ -0,0 +1,10 @@
+"""The names of the events logged by Loadwright itself next to the events of the users"""
+RESOURCE_EVENT = "resources"
+GENERATOR_EVENT = "generator"
+TRACE_EVENT = "websocket"
+PUSH_EVENT = "websocket_push"
+
+SAMPLE_EVENTS = [RESOURCE_EVENT, GENERATOR_EVENT]
+TRACE_EVENTS = [TRACE_EVENT, PUSH_EVENT]
+# The internal events are not part of the latency statistics
+INTERNAL_EVENTS = [*SAMPLE_EVENTS, *TRACE_EVENTS]
@@ -2,19 +2,200 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
 
 import pandas as pd
 
+from .sinks import import_pyarrow
 
-def read_loadwright_file(file: str | Path = "test_results/loadwright.csv") -> pd.DataFrame:
-    """Returns the Loadwright csv file as a dataframe
+CSV = "csv"
+JSONL = "jsonl"
+PARQUET = "parquet"
+ARROW = "arrow"
+
+FORMATS_BY_EXTENSION = {
+    ".csv": CSV,
+    ".jsonl": JSONL,
+    ".ndjson": JSONL,
+    ".parquet": PARQUET,
+    ".arrow": ARROW,
+    ".feather": ARROW,
+}
+
+TimeWindow = Tuple[Optional[float], Optional[float]]
+
+
+def detect_format(file: str | Path) -> str:
+    """Returns the format of the Loadwright file based on its first bytes
+
+    Args:
+        file (str | Path): The path to a Loadwright file
+
+    Returns:
+        str: One of 'csv', 'jsonl', 'parquet' or 'arrow'
+    """
+    with open(file, "rb") as handle:
+        head = handle.read(8)
+    if head.startswith(b"PAR1"):
+        return PARQUET
+    if head.startswith(b"ARROW1"):
+        return ARROW
+    if head.lstrip().startswith(b"{"):
+        return JSONL
+    return CSV
+
+
+def read_loadwright_file(
+    file: str | Path = "test_results/loadwright.csv",
+    columns: List[str] | None = None,
+    time_window: TimeWindow | None = None,
+    users: Iterable[str] | None = None,
+) -> pd.DataFrame:
+    """Returns the Loadwright file as a dataframe
+
+    The format (csv, json lines, Parquet or Arrow IPC) is detected from the file. Parquet files
+    are filtered while reading and Arrow files are memory mapped.
 
     Args:
-        file (str | Path, optional): The path to a Loadwright csv file.
+        file (str | Path, optional): The path to a Loadwright file.
             Defaults to "test_results/loadwright.csv".
+        columns (List[str] | None, optional): The columns to read. Defaults to all columns.
+        time_window (TimeWindow | None, optional): A (min, max) tuple of `start_seconds`. Only
+            events starting inside the window are read. Use None for an open end. Defaults to
+            None.
+        users (Iterable[str] | None, optional): The users to read. Defaults to all users.
 
     Returns:
         pd.DataFrame: A Pandas DataFrame
     """
     file = Path(file)
-    return pd.read_csv(file, parse_dates=["start", "stop"], dtype={"user": "str"}, index_col=0)
+    users = None if users is None else [str(user) for user in users]
+    file_format = detect_format(file)
+    if file_format == PARQUET:
+        return _read_parquet(file, columns, time_window, users)
+    if file_format == ARROW:
+        return _read_arrow(file, columns, time_window, users)
+    if file_format == JSONL:
+        data = pd.read_json(file, lines=True, dtype={"user": "str"}, convert_dates=False)
+        for column in ["start", "stop"]:
+            if column in data.columns:
+                data[column] = pd.to_datetime(data[column])
+        return _filter(data, columns, time_window, users)
+    return _read_csv(file, columns, time_window, users)
+
+
+def _filter_columns(columns: List[str] | None, time_window, users) -> List[str] | None:
+    if columns is None:
+        return None
+    extra = []
+    if time_window is not None:
+        extra.append("start_seconds")
+    if users is not None:
+        extra.append("user")
+    return list(dict.fromkeys(list(columns) + extra))
+
+
+def _filter(data: pd.DataFrame, columns, time_window, users) -> pd.DataFrame:
+    mask = pd.Series(True, index=data.index)
+    if time_window is not None:
+        low, high = time_window
+        if low is not None:
+            mask &= data["start_seconds"] >= low
+        if high is not None:
+            mask &= data["start_seconds"] <= high
+    if users is not None:
+        mask &= data["user"].astype(str).isin(users)
+    if not mask.all():
+        data = data[mask]
+    if columns is not None:
+        data = data[list(columns)]
+    return data
+
+
+def _read_csv(file: Path, columns, time_window, users) -> pd.DataFrame:
+    read_columns = _filter_columns(columns, time_window, users)
+    usecols = None
+    parse_dates = ["start", "stop"]
+    if read_columns is not None:
+
+        def usecols(column):  # pylint: disable=function-redefined
+            # The first, unnamed column is the index
+            return column in read_columns or column.startswith("Unnamed: 0")
+
+        parse_dates = [column for column in parse_dates if column in read_columns]
+    data = pd.read_csv(
+        file, usecols=usecols, parse_dates=parse_dates, dtype={"user": "str"}, index_col=0
+    )
+    return _filter(data, columns, time_window, users)
+
+
+def _arrow_filters(time_window, users) -> List[Tuple]:
+    filters: List[Tuple] = []
+    if time_window is not None:
+        low, high = time_window
+        if low is not None:
+            filters.append(("start_seconds", ">=", low))
+        if high is not None:
+            filters.append(("start_seconds", "<=", high))
+    if users is not None:
+        filters.append(("user", "in", users))
+    return filters
+
+
+def _read_parquet(file: Path, columns, time_window, users) -> pd.DataFrame:
+    import_pyarrow()
+    from pyarrow import parquet  # pylint: disable=import-outside-toplevel
+
+    table = parquet.read_table(
+        file,
+        columns=columns,
+        filters=_arrow_filters(time_window, users) or None,
+        memory_map=True,
+    )
+    return table.to_pandas()
+
+
+def _read_arrow(file: Path, columns, time_window, users) -> pd.DataFrame:
+    pyarrow = import_pyarrow()
+    from pyarrow import dataset  # pylint: disable=import-outside-toplevel
+
+    with pyarrow.memory_map(str(file)) as source:
+        table = pyarrow.ipc.open_file(source).read_all()
+        expression = None
+        for column, operator, value in _arrow_filters(time_window, users):
+            field = dataset.field(column)
+            if operator == ">=":
+                condition = field >= value
+            elif operator == "<=":
+                condition = field <= value
+            else:
+                condition = field.isin(value)
+            expression = condition if expression is None else expression & condition
+        if expression is not None:
+            table = table.filter(expression)
+        if columns is not None:
+            table = table.select(list(columns))
+        return table.to_pandas()
+
+
+def write_loadwright_file(data: pd.DataFrame, file: str | Path):
+    """Writes the DataFrame to the Loadwright file in the format given by its extension
+
+    Args:
+        data (pd.DataFrame): The results to write
+        file (str | Path): The path to a Loadwright file
+    """
+    file = Path(file)
+    file_format = FORMATS_BY_EXTENSION.get(file.suffix.lower(), CSV)
+    if file_format == PARQUET:
+        import_pyarrow()
+        data.to_parquet(file, index=False)
+    elif file_format == ARROW:
+        import_pyarrow()
+        from pyarrow import feather  # pylint: disable=import-outside-toplevel
+
+        feather.write_feather(data.reset_index(drop=True), str(file))
+    elif file_format == JSONL:
+        data.to_json(file, orient="records", lines=True, date_format="iso", date_unit="ns")
+    else:
+        data.to_csv(file, index=True)
@@ -1,24 +1,79 @@
 """Functionality for logging LoadTestRunner events"""
+from __future__ import annotations
+
+import shutil
 import time
 from contextlib import contextmanager
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterator, List, Optional, Tuple
 
 import pandas as pd
 import param
 
+from .buffer import COLUMNS, ResultBuffer
+from .catalog import CATALOG_FILE, RunCatalog
+from .events import INTERNAL_EVENTS
+from .io import read_loadwright_file, write_loadwright_file
+from .quantiles import QuantileTracker
+from .sinks import Sink, create_sink
+
 TEST_RESULTS_PATH = "test_results"
 TEST_RESULTS_FILE = "loadwright.csv"
 
 DEFAULT_LOADWRIGHT_FILE = Path(TEST_RESULTS_PATH) / Path(TEST_RESULTS_FILE)
+# The fraction of max_events spilled at once, such that the buffer is not shifted on every event
+SPILL_FRACTION = 0.25
+
+
+def iter_events(data: pd.DataFrame) -> Iterator[Tuple[str, str, float, float, Dict]]:
+    """Yields the events of a DataFrame as the arguments of `Logger.log`
+
+    Args:
+        data (pd.DataFrame): A DataFrame with the `event`, `user`, `start` and `stop` columns
+            and optionally extra columns
+
+    Yields:
+        Tuple[str, str, float, float, Dict]: The name, user, start and stop time in seconds
+            since the epoch and the extra values, without the missing ones, of each event
+    """
+    starts = data["start"].to_numpy(dtype="datetime64[ns]").astype("int64") / 1e9
+    stops = data["stop"].to_numpy(dtype="datetime64[ns]").astype("int64") / 1e9
+    extra = [column for column in data.columns if column not in COLUMNS]
+    rows = data[["event", "user"] + extra].itertuples(index=False, name=None)
+    for start, stop, (name, user, *values) in zip(starts, stops, rows):
+        kwargs = {
+            column: value
+            for column, value in zip(extra, values)
+            if value is not None and value == value  # pylint: disable=comparison-with-itself
+        }
+        yield name, user, start, stop, kwargs
+
+
+class EventRecord:
+    """The record of an event being logged
+
+    Use it to stop the event before the `with` block ends, for example before collecting
+    metrics, and to add extra values to log with the event.
+    """
+
+    def __init__(self, start: float):
+        self.start = start
+        self.stop_time: float | None = None
+        self.values: Dict = {}
+
+    def stop(self):
+        """Stops the event now"""
+        if self.stop_time is None:
+            self.stop_time = time.time()
+
+    def update(self, **values):
+        """Adds extra values to log with the event"""
+        self.values.update(values)
 
 
 class Logger(param.Parameterized):
     """Used to log events while running a LoadTestRunner"""
 
-    results: List[Dict] = param.List(
-        class_=dict, doc="A list of results. Each result is a dictionary"
-    )
     path: str = param.String(
         TEST_RESULTS_PATH, doc=f"The path to log to. Defaults to {TEST_RESULTS_PATH}"
     )
@@ -26,71 +81,251 @@ class Logger(param.Parameterized):
         TEST_RESULTS_FILE, doc=f"The file to log to. Defaults to {TEST_RESULTS_FILE}"
     )
     auto_save: str = param.Boolean(
-        True, doc="""Whether or not to save automatically when logging an event"""
+        True,
+        doc="""Whether or not to stream the results to the file via the sink when logging an
+        event""",
     )
     auto_archive: str = param.Boolean(
-        True, doc="""Whether or not to save automatically to the archive when logging an event"""
+        True, doc="""Whether or not to save automatically to the archive when closing"""
+    )
+    auto_catalog: bool = param.Boolean(
+        True,
+        doc="""Whether or not to record the archived runs and their summary statistics in the
+        catalog of the archive""",
+    )
+    max_events: int | None = param.Integer(
+        None,
+        bounds=(1, None),
+        doc="""If provided, at most this many of the latest events are kept in memory. Older
+        events are spilled, i.e. only kept in the file, bounding the memory used by long soak
+        tests. The events are then streamed to the file even if auto_save is False""",
+    )
+    sink: Optional[Sink] = param.ClassSelector(
+        class_=Sink,
+        doc="""The Sink used to stream results to the file. If not provided a Sink is created
+        based on the extension of the file""",
     )
 
     def __init__(self, **params):
         super().__init__(**params)
 
+        if self.sink is None:
+            self.sink = create_sink(self.file)
+        self.buffer = ResultBuffer()
+        self.quantiles = QuantileTracker()
         self._start = None
         self.reset()
 
     @contextmanager
-    def event(self, name: str, user: str, **kwargs):
+    def event(self, name: str, user: str, intended_start: float | None = None, **kwargs):
         """Log an event
 
         Args:
             name (str): The name of the event
             user (str): The name of the user triggering the event
+            intended_start (float | None, optional): The time in seconds since the epoch the
+                event should have started, if known. If earlier than the actual start, the
+                event is logged with a `corrected_duration` measured from it, i.e. corrected
+                for coordinated omission. Defaults to None.
+
+        Yields:
+            EventRecord: Can stop the event early and add extra values to log with it. They
+                replace the values given as keyword arguments
         """
         start = time.time()
         if not self._start:
             self._start = start
-        yield
-        stop = time.time()
-        result = {
-            "event": name,
-            "user": user,
-            "start": pd.to_datetime(start, unit="s"),
-            "stop": pd.to_datetime(stop, unit="s"),
-            "start_seconds": start - self._start,
-            "stop_seconds": stop - self._start,
-            "duration": stop - start,
-            **kwargs,
-        }
-        self.results.append(result)
-        if self.auto_save:
-            self.save()
-            if self.auto_archive:
-                self.archive()
+        record = EventRecord(start)
+        yield record
+        stop = record.stop_time or time.time()
+        if intended_start is not None:
+            kwargs["corrected_duration"] = stop - min(start, intended_start)
+        # The values added via the record win over the ones given when starting the event
+        self.log(name, user, start, stop, **{**kwargs, **record.values})
+
+    def log(self, name: str, user: str, start: float, stop: float, **kwargs):
+        """Log an event with a known start and stop time
+
+        Args:
+            name (str): The name of the event
+            user (str): The name of the user triggering the event
+            start (float): The start time in seconds since the epoch
+            stop (float): The stop time in seconds since the epoch
+        """
+        if not self._start:
+            self._start = start
+        self.buffer.append(name, user, start, stop, **kwargs)
+        if name not in INTERNAL_EVENTS:
+            self.quantiles.add(name, stop - start, time=stop - self._start)
+        if self.auto_save or self.max_events:
+            if not self.sink.is_open:
+                self.sink.open(self._file)
+            self.sink.write(
+                {
+                    "event": name,
+                    "user": user,
+                    "start": start,
+                    "stop": stop,
+                    "start_seconds": start - self._start,
+                    "stop_seconds": stop - self._start,
+                    "duration": stop - start,
+                    **kwargs,
+                }
+            )
+        if self.max_events and len(self.buffer) > self.max_events:
+            self.buffer.discard(len(self.buffer) - int(self.max_events * (1 - SPILL_FRACTION)))
+
+    def extend(self, data: pd.DataFrame):
+        """Log the events of a DataFrame, for example the results of a worker process
+
+        Args:
+            data (pd.DataFrame): A DataFrame with the `event`, `user`, `start` and `stop` columns
+                and optionally extra columns
+        """
+        for name, user, start, stop, kwargs in iter_events(data):
+            self.log(name, user, start, stop, **kwargs)
 
     @property
     def data(self) -> pd.DataFrame:
-        """Returns the results as a DataFrame"""
-        return pd.DataFrame(self.results)
+        """Returns the results in memory as a DataFrame. See `read` for all the results"""
+        return self.buffer.to_frame(origin=self._start)
 
-    def reset(self):
-        """Resets the results to the empty list"""
-        self.results = []
-        self._start = None
+    @property
+    def spilled(self) -> int:
+        """Returns the number of events spilled to the file and removed from memory"""
+        return self.buffer.discarded
+
+    def read(self) -> pd.DataFrame:
+        """Returns all the results as a DataFrame, including the spilled events which are read
+        from the file. The Parquet and Arrow files are only readable after closing the logger"""
+        if not self.spilled:
+            return self.data
+        self.sink.flush()
+        return read_loadwright_file(self._file)
+
+    def tail(self, since: int = 0) -> pd.DataFrame:
+        """Returns the events logged since a position as a DataFrame
+
+        Use it to read the results incrementally while a test is running.
+
+        Args:
+            since (int, optional): The number of events already read. Defaults to 0.
+
+        Returns:
+            pd.DataFrame: The new events. The index is the position of the events.
+        """
+        return self.buffer.to_frame(origin=self._start, since=since)
+
+    def summary(self) -> pd.DataFrame:
+        """Returns the count, mean and p50, p90, p95 and p99 durations per user event
+
+        The resource and generator samples and the websocket traces are not included. The
+        quantiles are tracked incrementally, so this is cheap while the test is running. Set `logger.quantiles.window` to only include the recent events.
+        """
+        return self.quantiles.summary()
+
+    @property
+    def results(self) -> List[Dict]:
+        """Returns a list of results. Each result is a dictionary
+
+        Assigning a list of results replaces the results. Each result needs the `event`, `user`,
+        `start` and `stop` keys. The `start` and `stop` times are datetimes or seconds since the
+        epoch.
+        """
+        return self.data.to_dict("records")
+
+    @results.setter
+    def results(self, results: List[Dict]):
+        self.reset()
+        if not results:
+            return
+        data = pd.DataFrame(results)
+        for column in ["start", "stop"]:
+            if pd.api.types.is_numeric_dtype(data[column]):
+                data[column] = pd.to_datetime(data[column], unit="s")
+        self.extend(data)
+
+    @property
+    def _file(self) -> Path:
+        return Path(self.path) / self.file
+
+    def reset(self, origin: float | None = None):
+        """Resets the results
+
+        Args:
+            origin (float | None, optional): The time in seconds since the epoch that
+                `start_seconds` and `stop_seconds` are relative to. Defaults to the start of the
+                first event.
+        """
+        self.sink.close()
+        self.buffer.clear()
+        self.quantiles.clear()
+        self._start = origin
 
     def save(self):
-        """Saves the results to self.path / self.file"""
+        """Saves the results to self.path / self.file
+
+        If the results are being streamed to the file, the pending results are written.
+        Otherwise the file is rewritten with all the results.
+        """
+        if self.spilled or (self.sink.is_open and self.sink.file == self._file):
+            self.sink.flush()
+            return
+
         path = Path(self.path)
         path.mkdir(parents=True, exist_ok=True)
         file = path / self.file
-        self.data.to_csv(file, index=True)
+        write_loadwright_file(self.data, file)
+
+    @property
+    def catalog(self) -> RunCatalog:
+        """Returns the catalog of the runs archived under self.path / 'archive'. It is stored
+        in self.path / 'catalog.sqlite'"""
+        return RunCatalog(file=str(Path(self.path) / CATALOG_FILE))
 
-    def archive(self):
-        """Archives the results to self.path / "archive" / self.file_{now}"""
-        data = self.data
+    def archive(self, metadata: Dict | None = None) -> Path:
+        """Archives the results to self.path / "archive" / self.file_{now}
+
+        Args:
+            metadata (Dict | None, optional): The metadata of the run, like the `host`, `user`
+                and `n_users`, to record in the catalog if auto_catalog is True. Defaults to
+                None.
+
+        Returns:
+            Path: The archived file
+        """
+        data = self.read()
         now = data.start.min()
         timestamp = now.strftime("%Y%m%d_%H%M%S")
         filename, extension = self.file.split(".")
         path = Path(self.path)
         file = path / "archive" / f"{filename}_{timestamp}.{extension}"
         file.parent.mkdir(parents=True, exist_ok=True)
-        data.to_csv(file, index=True)
+        if self.spilled:
+            # Only the file holds all the events. It is complete as `read` succeeded
+            self.sink.flush()
+            shutil.copyfile(self._file, file)
+        else:
+            # A Parquet or Arrow file being streamed to has no footer yet, so it is not copied
+            write_loadwright_file(data, file)
+        if self.auto_catalog:
+            self.catalog.record(file, data, **(metadata or {}))
+        return file
+
+    def close(self, metadata: Dict | None = None):
+        """Saves the results, archives them if auto_archive is True and closes the sink
+
+        Args:
+            metadata (Dict | None, optional): The metadata of the run to record in the catalog
+                of the archive. Defaults to None.
+        """
+        if not self.buffer and not self.spilled:
+            self.sink.close()
+            return
+        self.save()
+        if self.spilled:
+            # The spilled events are read from the file, which must be complete
+            self.sink.close()
+        if self.auto_archive:
+            self.archive(metadata)
+        self.sink.close()
@@ -0,0 +1,154 @@
+"""Browser side performance metrics of the events of a User"""
+from __future__ import annotations
+
+import weakref
+from typing import Dict, Optional
+
+import param
+from playwright.async_api import Error, Page
+
+PREFIX = "browser_"
+
+# Installed in every document of the page to count the long tasks. Also raises the resource
+# timing buffer size from the default of 250 entries.
+INIT_SCRIPT = """
+(() => {
+  if (window.__loadwright_long_tasks) { return; }
+  window.__loadwright_long_tasks = {count: 0, duration: 0};
+  performance.setResourceTimingBufferSize(100000);
+  try {
+    new PerformanceObserver((list) => {
+      for (const entry of list.getEntries()) {
+        window.__loadwright_long_tasks.count += 1;
+        window.__loadwright_long_tasks.duration += entry.duration;
+      }
+    }).observe({type: "longtask", buffered: true});
+  } catch (error) {}
+})();
+"""
+
+SNAPSHOT_SCRIPT = """
+() => {
+  const navigation = performance.getEntriesByType("navigation")[0];
+  const resources = performance.getEntriesByType("resource");
+  let transferSize = 0;
+  for (const resource of resources) { transferSize += resource.transferSize || 0; }
+  const longTasks = window.__loadwright_long_tasks || {count: 0, duration: 0};
+  const seconds = (value) => (navigation && value > 0 ? value / 1000 : null);
+  return {
+    time_origin: performance.timeOrigin,
+    ttfb: navigation ? seconds(navigation.responseStart - navigation.requestStart) : null,
+    response_end: navigation ? seconds(navigation.responseEnd) : null,
+    dom_content_loaded: navigation ? seconds(navigation.domContentLoadedEventEnd) : null,
+    load_event_end: navigation ? seconds(navigation.loadEventEnd) : null,
+    resource_count: resources.length,
+    resource_transfer_size: transferSize,
+    long_task_count: longTasks.count,
+    long_task_duration: longTasks.duration / 1000,
+  };
+}
+"""
+
+# The Chrome DevTools Protocol Performance.getMetrics that are cumulative durations in seconds
+CDP_DURATIONS = {
+    "ScriptDuration": "script_duration",
+    "LayoutDuration": "layout_duration",
+    "RecalcStyleDuration": "recalc_style_duration",
+    "TaskDuration": "task_duration",
+}
+# The Chrome DevTools Protocol Performance.getMetrics that are levels
+CDP_LEVELS = {
+    "JSHeapUsedSize": "js_heap_used_size",
+    "JSHeapTotalSize": "js_heap_total_size",
+    "Nodes": "nodes",
+}
+NAVIGATION_METRICS = ["ttfb", "response_end", "dom_content_loaded", "load_event_end"]
+COUNTERS = ["resource_count", "resource_transfer_size", "long_task_count", "long_task_duration"]
+
+
+class MetricsCollector(param.Parameterized):
+    """Collects the browser side performance metrics of the events of a User
+
+    For each event measured via `User.measure` the collector records
+
+    - the Navigation Timing of a page loaded during the event, for example the time to first
+    byte (`browser_ttfb`) which is dominated by the server,
+    - the number and transfer size of the resources loaded (Resource Timing),
+    - the number and duration of long tasks blocking the main thread and
+    - the script, layout, style recalculation and task durations and the JS heap size as
+    reported by the Chrome DevTools Protocol.
+
+    The metrics are logged as extra columns prefixed by `browser_`. Durations are in seconds.
+    """
+
+    cdp: bool = param.Boolean(
+        True, doc="Whether or not to collect the Chrome DevTools Protocol metrics (Chromium only)"
+    )
+    timing: bool = param.Boolean(
+        True, doc="Whether or not to collect the navigation, resource and long task timings"
+    )
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._sessions: weakref.WeakKeyDictionary = weakref.WeakKeyDictionary()
+
+    async def _attach(self, page: Page):
+        session = None
+        if self.cdp:
+            try:
+                session = await page.context.new_cdp_session(page)
+                await session.send("Performance.enable")
+            except Error:
+                session = None
+        if self.timing:
+            await page.add_init_script(INIT_SCRIPT)
+            await page.evaluate(INIT_SCRIPT)
+        self._sessions[page] = session
+
+    async def snapshot(self, page: Page) -> Dict[str, Optional[float]]:
+        """Returns the current, cumulative metrics of the page"""
+        if page not in self._sessions:
+            await self._attach(page)
+        metrics: Dict[str, Optional[float]] = {}
+        session = self._sessions[page]
+        if session is not None:
+            response = await session.send("Performance.getMetrics")
+            names = {**CDP_DURATIONS, **CDP_LEVELS}
+            for metric in response["metrics"]:
+                if metric["name"] in names:
+                    metrics[names[metric["name"]]] = metric["value"]
+        if self.timing:
+            metrics.update(await page.evaluate(SNAPSHOT_SCRIPT))
+        return metrics
+
+    @staticmethod
+    def diff(
+        before: Dict[str, Optional[float]], after: Dict[str, Optional[float]]
+    ) -> Dict[str, float]:
+        """Returns the metrics of an event given the snapshots taken before and after it
+
+        Args:
+            before (Dict[str, Optional[float]]): The snapshot taken before the event
+            after (Dict[str, Optional[float]]): The snapshot taken after the event
+
+        Returns:
+            Dict[str, float]: The metrics prefixed by `browser_`
+        """
+        navigated = after.get("time_origin", None) != before.get("time_origin", None)
+        metrics: Dict[str, Optional[float]] = {}
+        for name in CDP_DURATIONS.values():
+            if name in after:
+                delta = after[name] - before.get(name, 0.0)  # type: ignore[operator]
+                # The counters restart when the renderer process changes
+                metrics[name] = delta if delta >= 0 else after[name]
+        for name in CDP_LEVELS.values():
+            metrics[name] = after.get(name, None)
+        for name in COUNTERS:
+            if name in after:
+                # The counters restart in a newly loaded document
+                metrics[name] = after[name] if navigated else after[name] - before.get(name, 0)
+        if navigated:
+            for name in NAVIGATION_METRICS:
+                metrics[name] = after.get(name, None)
+        return {PREFIX + name: value for name, value in metrics.items() if value is not None}
@@ -0,0 +1,167 @@
+"""Monitoring of the load generator itself, i.e. of the LoadTestRunner"""
+from __future__ import annotations
+
+import asyncio
+import os
+import time
+from typing import Callable, Dict, List
+
+import pandas as pd
+import param
+
+from .events import GENERATOR_EVENT
+
+GENERATOR_USER = "generator"
+GENERATOR_COLUMNS = {
+    "generator_loop_lag": "Generator loop lag in seconds",
+    "generator_cpu_percent": "Generator CPU %",
+    "generator_rss": "Generator RSS in MB",
+    "generator_browser_rss": "Browser RSS in MB",
+}
+
+
+def memory_usage() -> Dict[str, float]:
+    """Returns the RSS in MB of the current process and, if psutil is installed, of its child
+    processes, i.e. the Playwright driver and the browsers
+
+    Returns:
+        Dict[str, float]: The `generator_rss` and `generator_browser_rss`. Empty if unknown
+    """
+    try:
+        import psutil  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        try:
+            with open("/proc/self/statm", encoding="utf8") as handle:
+                pages = int(handle.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            return {}
+        return {"generator_rss": pages * os.sysconf("SC_PAGE_SIZE") / 1e6}
+
+    process = psutil.Process()
+    browser_rss = 0
+    for child in process.children(recursive=True):
+        try:
+            browser_rss += child.memory_info().rss
+        except psutil.Error:
+            continue
+    return {
+        "generator_rss": process.memory_info().rss / 1e6,
+        "generator_browser_rss": browser_rss / 1e6,
+    }
+
+
+def start_lags(data: pd.DataFrame) -> pd.Series:
+    """Returns the seconds each user session started later than scheduled by the load profile
+
+    Args:
+        data (pd.DataFrame): The results of a LoadTestRunner
+
+    Returns:
+        pd.Series: The start lag of each session
+    """
+    columns = ["user", "session", "scheduled_start_seconds", "actual_start_seconds"]
+    if not set(columns).issubset(data.columns):
+        return pd.Series(dtype="float64")
+    sessions = data[columns].dropna().drop_duplicates(["user", "session"])
+    return sessions["actual_start_seconds"] - sessions["scheduled_start_seconds"]
+
+
+def corrected_durations(data: pd.DataFrame) -> pd.Series:
+    """Returns the durations corrected for coordinated omission
+
+    The first event of a session is measured from when the session should have started
+    according to the load profile, i.e. it includes the time the session waited for the load
+    generator. Other events are not corrected.
+
+    Args:
+        data (pd.DataFrame): The results of a LoadTestRunner
+
+    Returns:
+        pd.Series: The corrected duration of each event
+    """
+    if "corrected_duration" not in data.columns:
+        return data["duration"]
+    return data["corrected_duration"].fillna(data["duration"])
+
+
+class GeneratorMonitor(param.Parameterized):
+    """Monitors whether the load generator, rather than the app, is the bottleneck
+
+    When the event loop of the LoadTestRunner is overloaded, the users start late and their
+    events take longer, because the generator is slow and not because the app is. The monitor
+    logs a `generator` event every `interval` seconds with
+
+    - `generator_loop_lag`: the seconds the event loop was late waking up from a sleep,
+    - `generator_cpu_percent`: the CPU used by the thread running the event loop of the
+    generator. The CPU of other threads, for example of an app served in the same process, is
+    not included and
+    - `generator_rss` and `generator_browser_rss`: the memory used by the generator process and,
+    if psutil is installed, by the browsers. Use them to spot the memory growth of long soak
+    tests.
+
+    The users also log when their sessions were scheduled and actually started. After the run
+    `check` flags the run if the loop lag, CPU or start lags exceed the thresholds.
+    """
+
+    interval: float = param.Number(
+        0.5, bounds=(0, None), inclusive_bounds=(False, True), doc="The seconds between samples"
+    )
+    max_loop_lag: float = param.Number(
+        0.1, bounds=(0, None), doc="The p95 loop lag in seconds above which the generator is bound"
+    )
+    max_cpu_percent: float = param.Number(
+        90.0, bounds=(0, None), doc="The mean CPU % above which the generator is bound"
+    )
+    max_start_lag: float = param.Number(
+        0.5,
+        bounds=(0, None),
+        doc="The p95 session start lag in seconds above which the generator is bound",
+    )
+
+    async def run(self, log: Callable):
+        """Logs a sample every interval seconds until cancelled
+
+        Args:
+            log (Callable): Logs an event with a known start and stop, like `Logger.log`
+        """
+        while True:
+            start = time.perf_counter()
+            cpu_start = time.thread_time()
+            await asyncio.sleep(self.interval)
+            elapsed = time.perf_counter() - start
+            now = time.time()
+            log(
+                GENERATOR_EVENT,
+                GENERATOR_USER,
+                now,
+                now,
+                generator_loop_lag=max(elapsed - self.interval, 0.0),
+                generator_cpu_percent=(time.thread_time() - cpu_start) / elapsed * 100,
+                **memory_usage(),
+            )
+
+    def check(self, data: pd.DataFrame) -> List[str]:
+        """Returns the reasons the load generator was the bottleneck of the run, if any
+
+        Args:
+            data (pd.DataFrame): The results of a LoadTestRunner
+
+        Returns:
+            List[str]: The reasons. Empty if the generator was not the bottleneck
+        """
+        reasons = []
+        samples = data[data["event"] == GENERATOR_EVENT]
+        if len(samples) and "generator_loop_lag" in samples.columns:
+            loop_lag = samples["generator_loop_lag"].quantile(0.95)
+            if loop_lag > self.max_loop_lag:
+                reasons.append(f"the p95 event loop lag was {loop_lag:.3f}s")
+        if len(samples) and "generator_cpu_percent" in samples.columns:
+            cpu_percent = samples["generator_cpu_percent"].mean()
+            if cpu_percent > self.max_cpu_percent:
+                reasons.append(f"the mean CPU was {cpu_percent:.0f}%")
+        lags = start_lags(data)
+        if len(lags):
+            start_lag = lags.quantile(0.95)
+            if start_lag > self.max_start_lag:
+                reasons.append(f"the p95 session start lag was {start_lag:.3f}s")
+        return reasons
@@ -0,0 +1,248 @@
+"""A pool of browsers handing out pages in isolated browser contexts"""
+from __future__ import annotations
+
+import asyncio
+import math
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional, Set
+
+import param
+from playwright.async_api import Browser, BrowserContext, Error, Page, Playwright
+
+HEAP_SCRIPT = "() => performance.memory ? performance.memory.usedJSHeapSize : null"
+
+
+class _PooledContext:  # pylint: disable=too-few-public-methods
+    """A BrowserContext and the number of users that have used it"""
+
+    def __init__(self, context: BrowserContext):
+        self.context = context
+        self.uses = 0
+        self.exhausted = False
+
+
+class _PooledBrowser:  # pylint: disable=too-few-public-methods
+    """A Browser, its number of active users and pages served and its idle contexts"""
+
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.active = 0
+        self.sessions = 0
+        self.replacing = False
+        self.idle: List[_PooledContext] = []
+
+
+async def _js_heap_size(page: Page) -> Optional[float]:
+    """Returns the used JS heap size of the page in bytes or None if unknown (Chromium only)"""
+    try:
+        return await page.evaluate(HEAP_SCRIPT)
+    except Error:
+        return None
+
+
+class BrowserPool(param.Parameterized):
+    """Launches one or more browsers and hands out pages to users
+
+    Every user gets a page in its own BrowserContext such that cookies and sessions are not
+    shared between concurrent users. A context can optionally be reused by successive users.
+    A page is given to the browser with the fewest active users.
+
+    For long soak tests the browsers and contexts can be recycled, such that their memory
+    growth does not slow down the load generator. A browser is replaced by a new one in the
+    background after `max_sessions_per_browser` pages. It is closed when its last user is done.
+
+    Use it as
+
+    ```python
+    async with async_playwright() as playwright:
+        pool = BrowserPool(users_per_browser=10)
+        await pool.start(playwright, n_users=100)
+        async with pool.page() as page:
+            ...
+        await pool.stop()
+    ```
+    """
+
+    headless: bool = param.Boolean(True, doc="If False the browsers will be shown")
+    n_browsers: int | None = param.Integer(
+        None,
+        bounds=(1, None),
+        doc="""The number of browsers to launch. If None it is given by n_users and
+        users_per_browser""",
+    )
+    users_per_browser: int | None = param.Integer(
+        None,
+        bounds=(1, None),
+        doc="""The number of users to run in each browser. If None and n_browsers is None, all
+        users run in one browser""",
+    )
+    max_pages_per_context: int = param.Integer(
+        1,
+        bounds=(1, None),
+        doc="""The number of successive users that can use a BrowserContext before it is closed.
+        Defaults to 1, i.e. every user gets a fresh context""",
+    )
+    max_sessions_per_browser: int | None = param.Integer(
+        None,
+        bounds=(1, None),
+        doc="""The number of pages a browser serves before it is replaced by a new browser. If
+        None the browsers are never replaced""",
+    )
+    max_context_heap: float | None = param.Number(
+        None,
+        bounds=(0, None),
+        doc="""The used JS heap size in MB of a page above which its BrowserContext is closed
+        instead of being reused by the next user (Chromium only)""",
+    )
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._browsers: List[_PooledBrowser] = []
+        self._retired: List[_PooledBrowser] = []
+        self._playwright: Playwright | None = None
+        self._replacing: Set[asyncio.Future] = set()
+
+    @property
+    def browsers(self) -> List[Browser]:
+        """Returns the launched browsers"""
+        return [browser.browser for browser in self._browsers]
+
+    def _get_n_browsers(self, n_users: int) -> int:
+        if self.n_browsers:
+            return self.n_browsers
+        if self.users_per_browser:
+            return max(math.ceil(n_users / self.users_per_browser), 1)
+        return 1
+
+    async def start(self, playwright: Playwright, n_users: int = 1):
+        """Launches the browsers
+
+        Args:
+            playwright (Playwright): The Playwright instance to launch the browsers with
+            n_users (int, optional): The number of users the pool should be able to serve.
+                Defaults to 1.
+        """
+        self._playwright = playwright
+        browsers = await asyncio.gather(
+            *(
+                playwright.chromium.launch(headless=self.headless)
+                for _ in range(self._get_n_browsers(n_users))
+            )
+        )
+        self._browsers = [_PooledBrowser(browser) for browser in browsers]
+
+    async def grow(self, playwright: Playwright, n_users: int = 1):
+        """Launches more browsers if needed to serve more users, for example when the pool is
+        reused for successive runs with more users
+
+        Args:
+            playwright (Playwright): The Playwright instance to launch the browsers with
+            n_users (int, optional): The number of users the pool should be able to serve.
+                Defaults to 1.
+        """
+        self._playwright = playwright
+        n_browsers = self._get_n_browsers(n_users) - len(self._browsers)
+        if n_browsers <= 0:
+            return
+        browsers = await asyncio.gather(
+            *(playwright.chromium.launch(headless=self.headless) for _ in range(n_browsers))
+        )
+        self._browsers += [_PooledBrowser(browser) for browser in browsers]
+
+    async def stop(self):
+        """Closes the contexts and browsers"""
+        await asyncio.gather(*self._replacing, return_exceptions=True)
+        browsers, self._browsers, self._retired = self._browsers + self._retired, [], []
+        await asyncio.gather(*(browser.browser.close() for browser in browsers))
+
+    async def _replace(self, browser: _PooledBrowser):
+        """Launches a new browser replacing the browser. The browser is closed when idle"""
+        assert self._playwright is not None
+        new_browser = _PooledBrowser(await self._playwright.chromium.launch(headless=self.headless))
+        if browser not in self._browsers:
+            # The pool was stopped
+            await new_browser.browser.close()
+            return
+        self._browsers[self._browsers.index(browser)] = new_browser
+        self._retired.append(browser)
+        if not browser.active:
+            await self._close(browser)
+
+    async def _close(self, browser: _PooledBrowser):
+        if browser in self._retired:
+            self._retired.remove(browser)
+            await browser.browser.close()
+
+    async def _acquire(self) -> tuple[_PooledBrowser, _PooledContext]:
+        if not self._browsers:
+            raise RuntimeError("The BrowserPool has not been started")
+        browser = min(self._browsers, key=lambda browser: browser.active)
+        browser.active += 1
+        browser.sessions += 1
+        if (
+            self.max_sessions_per_browser
+            and browser.sessions >= self.max_sessions_per_browser
+            and not browser.replacing
+            and self._playwright is not None
+        ):
+            browser.replacing = True
+            task = asyncio.ensure_future(self._replace(browser))
+            self._replacing.add(task)
+            task.add_done_callback(self._replacing.discard)
+        if browser.idle:
+            context = browser.idle.pop()
+        else:
+            context = _PooledContext(await browser.browser.new_context())
+        return browser, context
+
+    async def _release(self, browser: _PooledBrowser, context: _PooledContext):
+        browser.active -= 1
+        context.uses += 1
+        if (
+            context.uses >= self.max_pages_per_context
+            or context.exhausted
+            or browser not in self._browsers
+        ):
+            await context.context.close()
+        else:
+            browser.idle.append(context)
+        if not browser.active:
+            await self._close(browser)
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[Page]:
+        """Yields a new page in a BrowserContext of the least loaded browser.
+
+        The page is closed when leaving the context manager.
+        """
+        browser, context = await self._acquire()
+        try:
+            page = await context.context.new_page()
+            try:
+                yield page
+            finally:
+                if self.max_context_heap is not None and not page.is_closed():
+                    heap = await _js_heap_size(page)
+                    context.exhausted = heap is not None and heap > self.max_context_heap * 1e6
+                await page.close()
+        finally:
+            await self._release(browser, context)
+
+
+class NoBrowserPool(BrowserPool):
+    """A pool for users that do not need a browser. It launches no browsers and yields no
+    pages"""
+
+    async def start(self, playwright: Playwright | None = None, n_users: int = 1):
+        pass
+
+    async def grow(self, playwright: Playwright | None = None, n_users: int = 1):
+        pass
+
+    async def stop(self):
+        pass
+
+    @asynccontextmanager
+    async def page(self) -> AsyncIterator[None]:  # type: ignore[override]
+        yield None
@@ -0,0 +1,301 @@
+"""A browserless User talking the Bokeh server protocol directly"""
+from __future__ import annotations
+
+import asyncio
+import json
+import re
+from typing import Any, Callable, Dict, List, Union
+
+import bokeh
+import param
+from bokeh.client.websocket import WebSocketClientConnectionWrapper
+from bokeh.protocol import Protocol
+from bokeh.protocol.message import Message
+from bokeh.protocol.messages.patch_doc import patch_doc
+from bokeh.protocol.receiver import Receiver
+from bokeh.util.token import generate_jwt_token, generate_session_id
+from tornado.httpclient import AsyncHTTPClient, HTTPRequest
+from tornado.websocket import websocket_connect
+
+from .user import User
+
+BOKEH_3 = int(bokeh.__version__.split(".", maxsplit=1)[0]) >= 3
+TOKEN_REGEX = re.compile(r'"token"\s*:\s*"([^"]+)"')
+
+WaitFor = Union[str, Callable[[Message], bool], None]
+
+
+def websocket_url(url: str) -> str:
+    """Returns the url of the Bokeh websocket of the app served at the url"""
+    url = url.split("?", maxsplit=1)[0]
+    if url.startswith("https"):
+        url = "wss" + url[len("https") :]
+    elif url.startswith("http"):
+        url = "ws" + url[len("http") :]
+    return url.rstrip("/") + "/ws"
+
+
+def model_type(model: Dict) -> str | None:
+    """Returns the type name, for example 'Button', of the json representation of a model"""
+    if model.get("type") == "object":
+        return model.get("name", None)
+    return model.get("type", None)
+
+
+def find_models(document: Any, type_name: str | None = None, **attributes) -> List[Dict]:
+    """Returns the json representations of the models in the document
+
+    Args:
+        document (Any): The json representation of a document or part of it
+        type_name (str | None, optional): The type of the models, for example 'Button'.
+            Defaults to all types.
+        attributes: The values of the attributes the models should have. For example
+            `label="Run"`.
+
+    Returns:
+        List[Dict]: The json representations of the models
+    """
+    models: Dict[str, Dict] = {}
+
+    def walk(value):
+        if isinstance(value, dict):
+            if "id" in value and "attributes" in value and model_type(value):
+                models.setdefault(value["id"], value)
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, list):
+            for item in value:
+                walk(item)
+
+    walk(document)
+    return [
+        model
+        for model in models.values()
+        if (type_name is None or model_type(model) == type_name)
+        and all(model["attributes"].get(key, None) == value for key, value in attributes.items())
+    ]
+
+
+def button_click_event(model_id: str) -> Dict:
+    """Returns the PATCH-DOC event sent when clicking a Bokeh Button"""
+    if BOKEH_3:
+        data = {
+            "type": "event",
+            "name": "button_click",
+            "values": {"type": "map", "entries": [["model", {"id": model_id}]]},
+        }
+    else:
+        data = {"event_name": "button_click", "event_values": {"model": {"id": model_id}}}
+    return {"kind": "MessageSent", "msg_type": "bokeh_event", "msg_data": data}
+
+
+def model_changed_event(model_id: str, attr: str, new: Any) -> Dict:
+    """Returns the PATCH-DOC event sent when changing an attribute of a Bokeh model"""
+    event = {"kind": "ModelChanged", "model": {"id": model_id}, "attr": attr, "new": new}
+    if not BOKEH_3:
+        event["hint"] = None
+    return event
+
+
+class AssembledMessage:  # pylint: disable=too-few-public-methods
+    """The header and raw frames of a Bokeh protocol message"""
+
+    def __init__(self, header: Dict, frames: List[str | bytes]):
+        self.header = header
+        self.frames = frames
+
+    @property
+    def msgtype(self) -> str:
+        """Returns the type of the message, for example 'PATCH-DOC'"""
+        return self.header.get("msgtype", "")
+
+    @property
+    def size(self) -> int:
+        """Returns the size of the frames in bytes"""
+        return sum(
+            len(frame.encode("utf8")) if isinstance(frame, str) else len(frame)
+            for frame in self.frames
+        )
+
+
+class MessageAssembler:  # pylint: disable=too-few-public-methods
+    """Groups the websocket frames of one direction into Bokeh protocol messages
+
+    A message is a header, a metadata and a content frame followed by a header and a payload
+    frame per buffer. Use it to observe the websocket of a browser, for example via
+    Playwright's `page.on("websocket")`.
+    """
+
+    def __init__(self):
+        self._header: Dict = {}
+        self._frames: List[str | bytes] = []
+        self._expected = 0
+
+    def add(self, frame: str | bytes) -> AssembledMessage | None:
+        """Adds the frame. Returns the message when it is complete"""
+        if not self._frames:
+            try:
+                self._header = json.loads(frame)
+            except (TypeError, ValueError):
+                return AssembledMessage({}, [frame])
+            if not isinstance(self._header, dict):
+                return AssembledMessage({}, [frame])
+            self._expected = 3 + 2 * int(self._header.get("num_buffers", 0))
+        self._frames.append(frame)
+        if len(self._frames) < self._expected:
+            return None
+        frames, self._frames = self._frames, []
+        return AssembledMessage(self._header, frames)
+
+
+class ProtocolUser(User):
+    """A User interacting with a Panel or Bokeh server app without a browser
+
+    The user loads the page over http, opens the Bokeh websocket, pulls the document and can
+    then send `PATCH-DOC` events, for example button clicks, and wait for the reply patches.
+    This costs orders of magnitude less than driving a browser, but no javascript is run.
+
+    Override the `run` method to implement custom user interactions.
+    """
+
+    requires_page = False
+
+    timeout: float = param.Number(
+        30.0, bounds=(0, None), doc="The maximum number of seconds to wait for a reply"
+    )
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._connection: WebSocketClientConnectionWrapper | None = None
+        self._protocol = Protocol()
+        self._receiver = Receiver(self._protocol)
+        self.document: Dict = {}
+        self.token: str = ""
+
+    async def run(self):
+        """Override the `run` method to implement custom user interactions.
+
+        The default is to load self.url and connect to the app
+        """
+        try:
+            with self.event(name="load", user=self.name):
+                await self.connect()
+            await self.sleep()
+        finally:
+            self.close()
+
+    async def connect(self):
+        """Loads the page, opens the websocket and pulls the document
+
+        The websocket is closed again if the document cannot be pulled.
+        """
+        response = await AsyncHTTPClient().fetch(self.url)
+        match = TOKEN_REGEX.search(response.body.decode("utf8"))
+        if match:
+            self.token = match.group(1)
+        else:
+            self.token = generate_jwt_token(generate_session_id())
+
+        socket = await websocket_connect(
+            HTTPRequest(websocket_url(self.url)), subprotocols=["bokeh", self.token]
+        )
+        self._connection = WebSocketClientConnectionWrapper(socket)
+        try:
+            await self.receive(wait_for=lambda message: message.header["msgtype"] == "ACK")
+
+            request = self._protocol.create("PULL-DOC-REQ")
+            await request.send(self._connection)
+            reply = await self.receive(reqid=request.header["msgid"])
+        except BaseException:
+            self.close()
+            raise
+        self.document = reply[-1].content["doc"]
+
+    def close(self):
+        """Closes the websocket"""
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def find_models(self, type_name: str | None = None, **attributes) -> List[Dict]:
+        """Returns the json representation of the models of the document
+
+        Args:
+            type_name (str | None, optional): The type of the models, for example 'Button'.
+                Defaults to all types.
+            attributes: The values of the attributes the models should have. For example
+                `label="Run"`.
+        """
+        return find_models(self.document, type_name, **attributes)
+
+    async def _read(self) -> Message:
+        assert self._connection is not None, "Please connect first"
+        while True:
+            fragment = await self._connection.read_message()
+            if fragment is None:
+                raise ConnectionError("The websocket was closed by the server")
+            message = await self._receiver.consume(fragment)
+            if message is not None:
+                return message
+
+    async def receive(self, reqid: str | None = None, wait_for: WaitFor = None) -> List[Message]:
+        """Receives messages until the wait_for condition is met or the reply to reqid arrives
+
+        Args:
+            reqid (str | None, optional): The msgid of a sent message. Waits for its reply.
+            wait_for (WaitFor, optional): A string that should be in the content of a received
+                PATCH-DOC message or a function returning True for the message waited for.
+
+        Returns:
+            List[Message]: The messages received
+        """
+        messages: List[Message] = []
+
+        async def _receive():
+            while True:
+                message = await self._read()
+                messages.append(message)
+                msgtype = message.header["msgtype"]
+                if msgtype == "ERROR":
+                    raise RuntimeError(f"The server replied with an error: {message.content}")
+                if wait_for is None:
+                    if message.header.get("reqid", None) == reqid:
+                        return
+                elif callable(wait_for):
+                    if wait_for(message):
+                        return
+                elif msgtype == "PATCH-DOC" and wait_for in json.dumps(message.content):
+                    return
+
+        await asyncio.wait_for(_receive(), timeout=self.timeout)
+        return messages
+
+    async def patch(self, events: List[Dict], wait_for: WaitFor = None) -> List[Message]:
+        """Sends a PATCH-DOC message and waits for the reply
+
+        Args:
+            events (List[Dict]): The json events to send, for example a `button_click_event`
+            wait_for (WaitFor, optional): A string that should be in the content of a PATCH-DOC
+                reply or a function returning True for the message waited for. Defaults to
+                waiting for the server to acknowledge the patch.
+
+        Returns:
+            List[Message]: The messages received
+        """
+        assert self._connection is not None, "Please connect first"
+        content: Dict[str, Any] = {"events": events}
+        if not BOKEH_3:
+            content["references"] = []
+        message = patch_doc(patch_doc.create_header(), {}, content)
+        await message.send(self._connection)
+        return await self.receive(reqid=message.header["msgid"], wait_for=wait_for)
+
+    async def click(self, model_id: str, wait_for: WaitFor = None) -> List[Message]:
+        """Clicks the Button with the given id and waits for the reply"""
+        return await self.patch([button_click_event(model_id)], wait_for=wait_for)
+
+    async def change(self, model_id: str, attr: str, new: Any, wait_for: WaitFor = None):
+        """Changes an attribute of a model, for example the value of a widget, and waits for the
+        reply"""
+        return await self.patch([model_changed_event(model_id, attr, new)], wait_for=wait_for)
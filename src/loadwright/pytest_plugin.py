@@ -0,0 +1,64 @@
+"""A pytest plugin failing load tests on performance regressions
+
+The plugin is opt-in. Enable it in the `conftest.py` of your tests
+
+```python
+pytest_plugins = ["loadwright.pytest_plugin"]
+```
+
+or with `pytest -p loadwright.pytest_plugin`. It adds the `loadwright_gate` fixture and the
+command line options configuring it, for example
+
+```bash
+pytest --loadwright-baseline=test_results/archive/loadwright_20230101_120000.csv
+```
+"""
+from __future__ import annotations
+
+import pytest
+
+from .compare import RegressionGate
+
+
+def pytest_addoption(parser):
+    """Adds the options of the loadwright_gate fixture"""
+    group = parser.getgroup("loadwright", "Performance regression gate of Loadwright")
+    group.addoption(
+        "--loadwright-baseline",
+        default=None,
+        help="The Loadwright file of the baseline run. Defaults to the latest archived run",
+    )
+    group.addoption(
+        "--loadwright-max-regression",
+        type=float,
+        default=0.1,
+        help="The maximum relative increase of the percentile durations. Defaults to 0.1",
+    )
+    group.addoption(
+        "--loadwright-percentile",
+        type=float,
+        default=0.95,
+        help="The percentile of the durations compared. Defaults to 0.95",
+    )
+
+
+@pytest.fixture
+def loadwright_gate(request) -> RegressionGate:
+    """Returns a RegressionGate configured by the command line options
+
+    Use it as
+
+    ```python
+    async def test_app(loadwright_gate):
+        ...
+        await runner.run()
+        loadwright_gate.budgets = {"load": 2.0}
+        loadwright_gate.check(runner.logger.data)
+    ```
+    """
+    config = request.config
+    return RegressionGate(
+        baseline=config.getoption("loadwright_baseline"),
+        max_regression=config.getoption("loadwright_max_regression"),
+        percentile=config.getoption("loadwright_percentile"),
+    )
@@ -0,0 +1,311 @@
+"""Incremental quantiles of event durations computed in one pass"""
+from __future__ import annotations
+
+import math
+from collections import deque
+from typing import Deque, Dict, Hashable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import param
+
+QUANTILES = {"p50": 0.5, "p90": 0.9, "p95": 0.95, "p99": 0.99}
+
+
+class LogHistogram:
+    """A histogram of positive values with logarithmic buckets, like a HDR histogram
+
+    Every value between `lowest` and `highest` is counted in a bucket whose width is
+    `precision` times its lower edge. Quantiles are accurate to within that relative precision,
+    regardless of the number of values, using a fixed amount of memory.
+
+    The counts are kept in a Fenwick tree, so adding, removing and finding the bucket of a
+    quantile take O(log buckets). Removal makes time windows possible.
+    """
+
+    def __init__(self, lowest: float = 1e-4, highest: float = 3600.0, precision: float = 0.01):
+        if not 0 < lowest < highest:
+            raise ValueError("lowest should be positive and smaller than highest")
+        if not 0 < precision < 1:
+            raise ValueError("precision should be between 0 and 1")
+        self.lowest = lowest
+        self.highest = highest
+        self.precision = precision
+        self._log_base = math.log1p(precision)
+        # Bucket 0 counts the values below lowest. The last bucket counts the values above highest
+        self.n_buckets = int(math.ceil(math.log(highest / lowest) / self._log_base)) + 2
+        self._tree = [0] * (self.n_buckets + 1)
+        self._step = 1 << (self.n_buckets.bit_length() - 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def bucket(self, value: float) -> int:
+        """Returns the index of the bucket counting the value"""
+        if value < self.lowest:
+            return 0
+        return min(int(math.log(value / self.lowest) / self._log_base) + 1, self.n_buckets - 1)
+
+    def buckets(self, values: np.ndarray) -> np.ndarray:
+        """Returns the indices of the buckets counting the values"""
+        values = np.asarray(values, dtype="float64")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            buckets = np.floor(np.log(values / self.lowest) / self._log_base) + 1
+        buckets = np.where(values < self.lowest, 0, buckets)
+        return np.clip(np.nan_to_num(buckets), 0, self.n_buckets - 1).astype("int64")
+
+    def value(self, bucket: int) -> float:
+        """Returns the value representing the bucket, i.e. its geometric midpoint"""
+        if bucket <= 0:
+            return self.lowest
+        return self.lowest * math.exp((bucket - 0.5) * self._log_base)
+
+    def _update(self, bucket: int, count: int):
+        index = bucket + 1
+        tree = self._tree
+        while index <= self.n_buckets:
+            tree[index] += count
+            index += index & -index
+
+    def add(self, value: float, count: int = 1, bucket: Optional[int] = None):
+        """Adds the value count times"""
+        self._update(self.bucket(value) if bucket is None else bucket, count)
+        self.count += count
+        self.sum += value * count
+
+    def remove(self, value: float, count: int = 1, bucket: Optional[int] = None):
+        """Removes the value, previously added, count times"""
+        self.add(value, -count, bucket)
+
+    def quantile(self, q: float) -> float:
+        """Returns the q'th quantile of the values or nan if there are no values"""
+        if self.count <= 0:
+            return math.nan
+        rank = min(max(math.ceil(q * self.count), 1), self.count)
+        # Find the first bucket where the cumulative count reaches rank by descending the tree
+        index = 0
+        step = self._step
+        tree = self._tree
+        while step:
+            if index + step <= self.n_buckets and tree[index + step] < rank:
+                index += step
+                rank -= tree[index]
+            step >>= 1
+        return self.value(index)
+
+    @property
+    def mean(self) -> float:
+        """Returns the mean of the values or nan if there are no values"""
+        return self.sum / self.count if self.count > 0 else math.nan
+
+    def clear(self):
+        """Removes all values"""
+        self._tree = [0] * (self.n_buckets + 1)
+        self.count = 0
+        self.sum = 0.0
+
+
+class QuantileTracker(param.Parameterized):
+    """Tracks the running or time windowed quantiles of values, for example event durations,
+    per key, for example per event name
+
+    Use it as
+
+    ```python
+    tracker = QuantileTracker(window=60)
+    tracker.add("load", 1.2, time=10.0)
+    tracker.quantile("load", 0.99)
+    tracker.summary()
+    ```
+    """
+
+    window: Optional[float] = param.Number(
+        None,
+        bounds=(0, None),
+        doc="""If provided only the values added during the last window seconds are tracked.
+        Otherwise all values are""",
+    )
+    precision: float = param.Number(
+        0.01, bounds=(0, 1), inclusive_bounds=(False, False), doc="The relative precision"
+    )
+    lowest: float = param.Number(1e-4, bounds=(0, None), doc="The lowest value to distinguish")
+    highest: float = param.Number(3600.0, bounds=(0, None), doc="The highest value to count")
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._histograms: Dict[Hashable, LogHistogram] = {}
+        self._values: Deque[Tuple[float, Hashable, float, int]] = deque()
+
+    def histogram(self, key: Hashable) -> LogHistogram:
+        """Returns the histogram of the key"""
+        histogram = self._histograms.get(key, None)
+        if histogram is None:
+            histogram = self._histograms[key] = LogHistogram(
+                lowest=self.lowest, highest=self.highest, precision=self.precision
+            )
+        return histogram
+
+    @property
+    def keys(self) -> List[Hashable]:
+        """Returns the keys added"""
+        return list(self._histograms)
+
+    def add(self, key: Hashable, value: float, time: float = 0.0):
+        """Adds the value
+
+        Args:
+            key (Hashable): The key, for example the name of the event
+            value (float): The value, for example the duration of the event
+            time (float, optional): The time of the value in seconds. Values older than
+                `window` seconds relative to the latest time are removed. Defaults to 0.0.
+        """
+        histogram = self.histogram(key)
+        bucket = histogram.bucket(value)
+        histogram.add(value, bucket=bucket)
+        if self.window is not None:
+            self._values.append((time, key, value, bucket))
+            self.expire(time - self.window)
+
+    def expire(self, before: float):
+        """Removes the values added before the given time. Values are expected in time order"""
+        values = self._values
+        while values and values[0][0] < before:
+            _, key, value, bucket = values.popleft()
+            self._histograms[key].remove(value, bucket=bucket)
+
+    def quantile(self, key: Hashable, q: float) -> float:
+        """Returns the q'th quantile of the values of the key or nan if there are none"""
+        histogram = self._histograms.get(key, None)
+        return histogram.quantile(q) if histogram is not None else math.nan
+
+    def summary(self, quantiles: Dict[str, float] | None = None) -> pd.DataFrame:
+        """Returns a DataFrame with the count, mean and quantiles of the values of each key"""
+        quantiles = QUANTILES if quantiles is None else quantiles
+        rows = {
+            key: {
+                "count": histogram.count,
+                "mean": histogram.mean,
+                **{name: histogram.quantile(q) for name, q in quantiles.items()},
+            }
+            for key, histogram in self._histograms.items()
+        }
+        return pd.DataFrame.from_dict(
+            rows, orient="index", columns=["count", "mean", *quantiles]
+        ).rename_axis("event")
+
+    def clear(self):
+        """Removes all values"""
+        self._histograms = {}
+        self._values.clear()
+
+
+def _running_quantile(
+    histogram: LogHistogram, values: np.ndarray, times: np.ndarray, q: float, window: float | None
+) -> List[float]:
+    buckets = histogram.buckets(values).tolist()
+    values, times = values.tolist(), times.tolist()
+    result = []
+    oldest = 0
+    for index, value in enumerate(values):
+        histogram.add(value, bucket=buckets[index])
+        if window is not None:
+            while times[oldest] < times[index] - window:
+                histogram.remove(values[oldest], bucket=buckets[oldest])
+                oldest += 1
+        result.append(histogram.quantile(q))
+    return result
+
+
+def running_quantile(
+    data: pd.DataFrame,
+    q: float,
+    *,
+    window: Optional[float] = None,
+    by: str = "event",
+    value: str = "duration",
+    precision: float = 0.01,
+) -> np.ndarray:
+    """Returns the running quantile of the values of all previous rows in the same group
+
+    The rows should be sorted by `start_seconds`. The quantiles are computed in one pass with
+    a LogHistogram per group.
+
+    Args:
+        data (pd.DataFrame): The results
+        q (float): The quantile, for example 0.99
+        window (Optional[float], optional): If provided only the rows started during the last
+            window seconds are included. Defaults to all previous rows.
+        by (str, optional): The column to group by. Defaults to "event".
+        value (str, optional): The column of values. Defaults to "duration".
+        precision (float, optional): The relative precision. Defaults to 0.01.
+
+    Returns:
+        np.ndarray: The quantile of each row
+    """
+    values = data[value].to_numpy(dtype="float64")
+    times = data["start_seconds"].to_numpy(dtype="float64")
+    result = np.full(len(values), np.nan)
+    for indices in data.groupby(by, observed=True).indices.values():
+        result[indices] = _running_quantile(
+            LogHistogram(precision=precision), values[indices], times[indices], q, window
+        )
+    return result
+
+
+def running_aggregate(
+    data: pd.DataFrame, how: str, window: Optional[float] = None, by: str = "event"
+) -> np.ndarray:
+    """Returns the running `mean`, `min`, `max` or quantile, for example `p99`, of the durations
+    of all previous rows in the same group
+
+    The rows should be sorted by `start_seconds`.
+
+    Args:
+        data (pd.DataFrame): The results
+        how (str): One of `mean`, `min`, `max` or a key of QUANTILES like `p99`
+        window (Optional[float], optional): If provided only the rows started during the last
+            window seconds are included. Defaults to all previous rows.
+        by (str, optional): The column to group by. Defaults to "event".
+
+    Returns:
+        np.ndarray: The aggregated duration of each row
+    """
+    if how in QUANTILES:
+        return running_quantile(data, QUANTILES[how], window=window, by=by)
+    if how not in ["mean", "min", "max"]:
+        raise ValueError(f"how should be mean, min, max or one of {list(QUANTILES)}. Got {how}")
+    durations = data["duration"].to_numpy(dtype="float64")
+    times = data["start_seconds"].to_numpy(dtype="float64")
+    result = np.full(len(durations), np.nan)
+    for indices in data.groupby(by, observed=True).indices.values():
+        series = pd.Series(durations[indices])
+        if window is None:
+            rolling = series.expanding()
+        else:
+            series.index = pd.to_timedelta(times[indices], unit="s")
+            rolling = series.rolling(pd.Timedelta(seconds=window))
+        result[indices] = getattr(rolling, how)().to_numpy()
+    return result
+
+
+def summary(
+    data: pd.DataFrame, by: str = "event", quantiles: Dict[str, float] | None = None
+) -> pd.DataFrame:
+    """Returns a table of the count, mean, min, quantiles and max of the durations per group
+
+    Args:
+        data (pd.DataFrame): The results
+        by (str, optional): The column to group by. Defaults to "event".
+        quantiles (Dict[str, float] | None, optional): The quantiles by name. Defaults to
+            QUANTILES, i.e. p50, p90, p95 and p99.
+
+    Returns:
+        pd.DataFrame: The summary with a row per group
+    """
+    quantiles = QUANTILES if quantiles is None else quantiles
+    grouped = data.groupby(by, observed=True)["duration"]
+    table = grouped.agg(["count", "mean", "min"])
+    for name, q in quantiles.items():
+        table[name] = grouped.quantile(q)
+    table["max"] = grouped.max()
+    return table
@@ -0,0 +1,397 @@
+"""Record a browser User session once and replay it at scale without a browser"""
+from __future__ import annotations
+
+import asyncio
+import base64
+import json
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+from urllib.parse import urlsplit
+
+import param
+from bokeh.protocol.messages.patch_doc import patch_doc
+from bokeh.util.token import get_session_id
+from playwright.async_api import async_playwright
+from tornado.httpclient import AsyncHTTPClient
+
+from .protocol import TOKEN_REGEX, MessageAssembler, ProtocolUser, find_models
+from .user import User
+
+RECORDING_VERSION = 1
+DEFAULT_RECORDING_FILE = Path("test_results") / "recording.jsonl"
+
+Frame = Union[str, Dict[str, str]]
+
+
+def _encode_frame(payload: str | bytes) -> Frame:
+    if isinstance(payload, bytes):
+        return {"base64": base64.b64encode(payload).decode("ascii")}
+    return payload
+
+
+def _decode_frame(frame: Frame) -> str | bytes:
+    if isinstance(frame, dict):
+        return base64.b64decode(frame["base64"])
+    return frame
+
+
+class RecordedEvent(param.Parameterized):
+    """The traffic of one event of a recorded User session"""
+
+    event = param.String(doc="The name of the event. For example 'load' or 'interact'")
+    start = param.Number(doc="The start of the event in seconds since the start of the recording")
+    stop = param.Number(doc="The stop of the event in seconds since the start of the recording")
+    requests = param.List(doc="The http requests sent during the event")
+    messages = param.List(doc="The frames of the websocket messages sent during the event")
+    replies = param.Integer(
+        0, doc="The number of PATCH-DOC messages received after the first message was sent"
+    )
+
+
+class Recording(param.Parameterized):
+    """A compact recording of the http requests, websocket messages and events of a session
+
+    The recording is a list of json records stored one per line.
+    """
+
+    records: List[Dict] = param.List(doc="The recorded records")
+
+    @classmethod
+    def load(cls, file: str | Path = DEFAULT_RECORDING_FILE) -> "Recording":
+        """Returns the Recording stored in the file"""
+        with open(file, "r", encoding="utf8") as handle:
+            records = [json.loads(line) for line in handle if line.strip()]
+        return cls(records=records)
+
+    def save(self, file: str | Path = DEFAULT_RECORDING_FILE):
+        """Saves the Recording to the file"""
+        file = Path(file)
+        file.parent.mkdir(parents=True, exist_ok=True)
+        with open(file, "w", encoding="utf8") as handle:
+            for record in self.records:
+                handle.write(json.dumps(record) + "\n")
+
+    def _first(self, kind: str, **values) -> Optional[Dict]:
+        for record in self.records:
+            if record["kind"] == kind and all(record.get(k) == v for k, v in values.items()):
+                return record
+        return None
+
+    @property
+    def url(self) -> str:
+        """Returns the url the recorded User visited"""
+        meta = self._first("meta")
+        return meta["url"] if meta else ""
+
+    @property
+    def session_id(self) -> str:
+        """Returns the Bokeh session id of the recorded session or an empty string"""
+        session = self._first("session")
+        return session["session_id"] if session else ""
+
+    @property
+    def document(self) -> Dict:
+        """Returns the json representation of the document pulled by the recorded session"""
+        reply = self._first("ws_received", msgtype="PULL-DOC-REPLY")
+        return reply["content"]["doc"] if reply else {}
+
+    def events(self) -> List[RecordedEvent]:
+        """Returns the traffic grouped by the events of the recorded session"""
+        events: List[RecordedEvent] = []
+        current: Optional[RecordedEvent] = None
+        first_sent: Optional[float] = None
+        for record in self.records:
+            kind = record["kind"]
+            if kind == "event_start":
+                current = RecordedEvent(event=record["event"], start=record["t"])
+                first_sent = None
+            elif current is None:
+                continue
+            elif kind == "event_stop":
+                current.stop = record["t"]
+                events.append(current)
+                current = None
+            elif kind == "request":
+                current.requests.append(record)
+            elif kind == "ws_sent":
+                current.messages.append(record["frames"])
+                if first_sent is None:
+                    first_sent = record["t"]
+            elif kind == "ws_received" and record["msgtype"] == "PATCH-DOC":
+                if first_sent is not None:
+                    current.replies += 1
+        return events
+
+
+class Recorder(param.Parameterized):
+    """Runs a Playwright User once and records its http requests, websocket messages, events and
+    their timing to a Recording"""
+
+    user: User = param.ClassSelector(class_=User, doc="The User to record")
+    host: str = param.String("http://localhost:5006", doc="The host to record")
+    headless: bool = param.Boolean(True, doc="If False the browser will be shown")
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._records: List[Dict] = []
+        self._start = 0.0
+
+    def _add(self, kind: str, **values):
+        self._records.append({"kind": kind, "t": time.time() - self._start, **values})
+
+    @contextmanager
+    def _event(self, name: str, user: str, **kwargs):  # pylint: disable=unused-argument
+        self._add("event_start", event=name)
+        yield
+        self._add("event_stop", event=name)
+
+    def _on_request(self, request):
+        self._add(
+            "request",
+            method=request.method,
+            url=request.url,
+            resource_type=request.resource_type,
+            post_data=request.post_data,
+        )
+
+    async def _on_response(self, response):
+        if response.request.resource_type != "document":
+            return
+        match = TOKEN_REGEX.search(await response.text())
+        if match:
+            self._add("session", session_id=get_session_id(match.group(1)))
+
+    def _on_websocket(self, websocket):
+        sent = MessageAssembler()
+        received = MessageAssembler()
+        self._add("ws_open", url=websocket.url)
+
+        def on_sent(payload):
+            message = sent.add(payload)
+            if message is not None:
+                self._add("ws_sent", frames=[_encode_frame(frame) for frame in message.frames])
+
+        def on_received(payload):
+            message = received.add(payload)
+            if message is None:
+                return
+            record: Dict[str, Any] = {
+                "msgtype": message.msgtype,
+                "reqid": message.header.get("reqid", None),
+                "size": message.size,
+            }
+            if message.msgtype == "PULL-DOC-REPLY":
+                record["content"] = json.loads(message.frames[2])
+            self._add("ws_received", **record)
+
+        websocket.on("framesent", on_sent)
+        websocket.on("framereceived", on_received)
+
+    async def record(self, file: str | Path | None = DEFAULT_RECORDING_FILE) -> Recording:
+        """Runs the User once and returns the Recording
+
+        Args:
+            file (str | Path | None, optional): The file to save the recording to. If None the
+                recording is not saved. Defaults to "test_results/recording.jsonl".
+
+        Returns:
+            Recording: The Recording
+        """
+        self._records = []
+        self._start = time.time()
+        self._add("meta", version=RECORDING_VERSION, url=self.host + self.user.endpoint)
+        async with async_playwright() as pwright:
+            browser = await pwright.chromium.launch(headless=self.headless)
+            page = await browser.new_page()
+            page.on("request", self._on_request)
+            page.on("response", self._on_response)
+            page.on("websocket", self._on_websocket)
+            await self.user.clone(name="0", host=self.host, page=page, event=self._event).run()
+            await page.close()
+            await browser.close()
+
+        recording = Recording(records=self._records)
+        if file is not None:
+            recording.save(file)
+        return recording
+
+
+def _map_ids(recorded: Dict, replayed: Dict) -> Dict[str, str]:
+    """Returns a map from the model ids of the recorded document to the ids of the replayed
+    document
+
+    The models are aligned by walking the two model graphs in parallel from their roots. The
+    order of the references is not stable between sessions and is not relied on.
+    """
+    recorded_models = {model["id"]: model for model in find_models(recorded)}
+    replayed_models = {model["id"]: model for model in find_models(replayed)}
+    mapping: Dict[str, str] = {}
+
+    def walk(old: Any, new: Any):
+        if isinstance(old, dict) and isinstance(new, dict):
+            old_id, new_id = old.get("id", None), new.get("id", None)
+            if isinstance(old_id, str) and isinstance(new_id, str):
+                if old_id in mapping:
+                    return
+                mapping[old_id] = new_id
+                old = recorded_models.get(old_id, old)
+                new = replayed_models.get(new_id, new)
+            for key, value in old.items():
+                if key != "id" and key in new:
+                    walk(value, new[key])
+        elif isinstance(old, list) and isinstance(new, list):
+            for old_item, new_item in zip(old, new):
+                walk(old_item, new_item)
+
+    old_roots, new_roots = recorded.get("roots", []), replayed.get("roots", [])
+    if isinstance(old_roots, dict) and isinstance(new_roots, dict):
+        for old_id, new_id in zip(old_roots.get("root_ids", []), new_roots.get("root_ids", [])):
+            walk({"id": old_id}, {"id": new_id})
+    else:
+        walk(old_roots, new_roots)
+    return mapping
+
+
+def _rewrite_ids(value: Any, mapping: Dict[str, str]) -> Any:
+    if isinstance(value, dict):
+        return {
+            key: mapping.get(item, item)
+            if key == "id" and isinstance(item, str)
+            else _rewrite_ids(item, mapping)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        return [_rewrite_ids(item, mapping) for item in value]
+    return value
+
+
+class ReplayUser(ProtocolUser):
+    """Replays a Recording without a browser
+
+    The events are logged under their recorded names. The recorded Bokeh model and session ids
+    are rewritten to the ids of the new session.
+
+    Run N concurrent copies via `LoadTestRunner(user=ReplayUser(recording=...), n_users=N)`.
+    """
+
+    recording: Recording = param.ClassSelector(class_=Recording, doc="The Recording to replay")
+    think_time_scale: float = param.Number(
+        1.0, bounds=(0, None), doc="The factor to scale the recorded time between events by"
+    )
+    think_time: float | None = param.Number(
+        None,
+        bounds=(0, None),
+        doc="If set, the time between events in seconds instead of the recorded time",
+    )
+    replay_requests: bool = param.Boolean(
+        True, doc="Whether or not to replay the http requests to the host, for example for js"
+    )
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._ids: Dict[str, str] = {}
+
+    async def run(self):
+        """Replays the events of the recording"""
+        previous_stop = None
+        try:
+            for event in self.recording.events():
+                if previous_stop is not None:
+                    await asyncio.sleep(self._get_think_time(event.start - previous_stop))
+                with self.event(name=event.event, user=self.name):
+                    if self._connection is None:
+                        await self.connect()
+                        self._ids = _map_ids(self.recording.document, self.document)
+                    await self._replay(event)
+                previous_stop = event.stop
+        finally:
+            self.close()
+
+    def _get_think_time(self, recorded: float) -> float:
+        if self.think_time is not None:
+            return self.think_time
+        return max(recorded, 0) * self.think_time_scale
+
+    def _rewrite_url(self, url: str) -> Optional[str]:
+        """Returns the url on self.host or None if the url is on another host"""
+        recorded = urlsplit(self.recording.url)
+        parts = urlsplit(url)
+        if parts.netloc != recorded.netloc:
+            return None
+        host = urlsplit(self.url)
+        url = parts._replace(scheme=host.scheme, netloc=host.netloc).geturl()
+        session_id = self.recording.session_id
+        if session_id:
+            url = url.replace(session_id, get_session_id(self.token))
+        return url
+
+    async def _replay_requests(self, requests: List[Dict]):
+        client = AsyncHTTPClient()
+        fetches = []
+        for request in requests:
+            if request["resource_type"] in ["document", "websocket"]:
+                continue
+            url = self._rewrite_url(request["url"])
+            if url is None:
+                continue
+            fetches.append(
+                client.fetch(
+                    url,
+                    method=request["method"],
+                    body=request.get("post_data", None),
+                    raise_error=False,
+                    allow_nonstandard_methods=True,
+                )
+            )
+        await asyncio.gather(*fetches)
+
+    async def _send(self, frames: List[Frame]) -> Optional[str]:
+        """Sends the recorded message with rewritten ids. Returns its new msgid"""
+        assert self._connection is not None
+        header = json.loads(_decode_frame(frames[0]))
+        if header.get("msgtype", None) == "PULL-DOC-REQ":
+            return None
+        header["msgid"] = patch_doc.create_header()["msgid"]
+        content = _rewrite_ids(json.loads(_decode_frame(frames[2])), self._ids)
+        session_id = self.recording.session_id
+        payloads: List[str | bytes] = [
+            json.dumps(header),
+            _decode_frame(frames[1]),
+            json.dumps(content),
+        ]
+        if session_id:
+            payloads[2] = str(payloads[2]).replace(session_id, get_session_id(self.token))
+        payloads.extend(_decode_frame(frame) for frame in frames[3:])
+        for payload in payloads:
+            await self._connection.write_message(payload, binary=isinstance(payload, bytes))
+        return header["msgid"]
+
+    async def _replay(self, event: RecordedEvent):
+        if self.replay_requests and event.requests:
+            requests = asyncio.ensure_future(self._replay_requests(event.requests))
+        else:
+            requests = None
+
+        msgids = set()
+        for frames in event.messages:
+            msgid = await self._send(frames)
+            if msgid is not None:
+                msgids.add(msgid)
+
+        replies = 0
+
+        def is_done(message) -> bool:
+            nonlocal replies
+            msgids.discard(message.header.get("reqid", None))
+            if message.header["msgtype"] == "PATCH-DOC":
+                replies += 1
+            return not msgids and replies >= event.replies
+
+        if msgids or event.replies:
+            await self.receive(wait_for=is_done)
+        if requests is not None:
+            await requests
@@ -0,0 +1,129 @@
+"""Sampling of the resources used by the server under test"""
+from __future__ import annotations
+
+import asyncio
+import concurrent.futures
+import os
+import time
+from typing import Callable, Dict, List, Optional
+
+import param
+
+from .events import RESOURCE_EVENT
+
+RESOURCE_USER = "server"
+RESOURCE_COLUMNS = {
+    "server_cpu_percent": "CPU %",
+    "server_rss": "RSS in MB",
+    "server_threads": "Threads",
+    "server_sessions": "Sessions",
+    "server_loop_lag": "Event loop lag in seconds",
+}
+
+
+def import_psutil():
+    """Returns the psutil module. Raises an ImportError with a helpful message if missing"""
+    try:
+        import psutil  # pylint: disable=import-outside-toplevel
+    except ImportError as ex:
+        raise ImportError(
+            "Sampling the server resources requires psutil. Install it via "
+            "'pip install loadwright[resources]'"
+        ) from ex
+    return psutil
+
+
+def _served() -> List:
+    """Returns the Bokeh servers started by Panel in this process, e.g. via
+    LoadTestRunner.serve"""
+    # pylint: disable=import-outside-toplevel,protected-access
+    import panel as pn
+
+    return [server for server, *_ in getattr(pn.state, "_servers", {}).values()]
+
+
+async def _loop_lag(io_loop, timeout: float) -> float:
+    """Returns the time in seconds it takes the io_loop of another thread to run a callback"""
+    future: concurrent.futures.Future = concurrent.futures.Future()
+    start = time.perf_counter()
+    io_loop.add_callback(lambda: future.set_result(time.perf_counter() - start))
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+    except asyncio.TimeoutError:
+        return timeout
+
+
+class ResourceSampler(param.Parameterized):
+    """Samples the CPU, memory, threads, sessions and event loop lag of the server under test
+
+    By default the current process is sampled, i.e. the apps served via
+    `LoadTestRunner.serve`. The open sessions and the event loop lag are measured for the
+    Panel servers running in the current process only.
+
+    Give it to the LoadTestRunner to log a `resources` event with the `server_*` columns every
+    `interval` seconds
+
+    ```python
+    LoadTestRunner(sampler=ResourceSampler(interval=0.5), ...)
+    ```
+    """
+
+    pid: Optional[int] = param.Integer(
+        None, doc="The id of the process to sample. Defaults to the current process"
+    )
+    interval: float = param.Number(
+        1.0, bounds=(0, None), inclusive_bounds=(False, True), doc="The seconds between samples"
+    )
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._process = None
+
+    @property
+    def is_local(self) -> bool:
+        """Returns True if the current process is sampled"""
+        return self.pid is None or self.pid == os.getpid()
+
+    async def sample(self) -> Dict[str, Optional[float]]:
+        """Returns a sample of the resources used by the process"""
+        if self._process is None or self._process.pid != (self.pid or os.getpid()):
+            self._process = import_psutil().Process(self.pid)
+            # The first call to cpu_percent returns a meaningless 0.0
+            self._process.cpu_percent(None)
+        with self._process.oneshot():
+            sample: Dict[str, Optional[float]] = {
+                "server_cpu_percent": self._process.cpu_percent(None),
+                "server_rss": self._process.memory_info().rss / 1e6,
+                "server_threads": self._process.num_threads(),
+                "server_sessions": None,
+                "server_loop_lag": None,
+            }
+        if self.is_local:
+            servers = _served()
+            if servers:
+                sample["server_sessions"] = sum(len(server.get_sessions()) for server in servers)
+                lags = await asyncio.gather(
+                    *(_loop_lag(server.io_loop, timeout=self.interval) for server in servers)
+                )
+                sample["server_loop_lag"] = max(lags)
+        return sample
+
+    async def run(self, log: Callable):
+        """Logs a sample every interval seconds until cancelled
+
+        Args:
+            log (Callable): Logs an event with a known start and stop, like `Logger.log`
+        """
+        await self.sample()
+        while True:
+            await asyncio.sleep(self.interval)
+            sample = await self.sample()
+            now = time.time()
+            log(
+                RESOURCE_EVENT,
+                RESOURCE_USER,
+                now,
+                now,
+                **{name: value for name, value in sample.items() if value is not None},
+            )
@@ -2,35 +2,136 @@
 from __future__ import annotations
 
 import asyncio
-from contextlib import asynccontextmanager
-from typing import List
+import functools
+import math
+import multiprocessing
+import socket
+import time
+import urllib.error
+import urllib.request
+from contextlib import asynccontextmanager, contextmanager
+from typing import Callable, Dict, List, Tuple
 
-import panel as pn
+import pandas as pd
 import param
-from playwright.async_api import async_playwright
+from playwright.async_api import Playwright, async_playwright
 
 from .logger import Logger
+from .monitor import GeneratorMonitor
+from .pool import BrowserPool, NoBrowserPool
+from .resources import ResourceSampler
+from .scheduler import LoadProfile, Ramp
 from .user import User
 
 USERS = 10
 USER_DELAY = 1
 USER_CLICKS = 10
+WORKER_START_DELAY = 0.1
+# The seconds to wait for a served app to be ready and between checking
+SERVER_TIMEOUT = 30.0
+READY_INTERVAL = 0.05
+# The limits of soak tests, unless set
+SOAK_MAX_EVENTS = 100_000
+SOAK_SESSIONS_PER_BROWSER = 200
+SOAK_CONTEXT_HEAP = 256.0
 
 
-class LoadTestRunner(pn.viewable.Viewer):
-    """Can run load tests a data apps using the Playwright framework"""
+class LoadTestRunner(param.Parameterized):
+    """Can run load tests a data apps using the Playwright framework
+
+    The runner does not import Panel or HoloViews, such that headless load generators and
+    worker processes do not pay for the plotting stack. Use the LoadTestViewer to view the
+    results.
+    """
 
     host: str = param.String("http://localhost:5006")
+    hosts: List[str] = param.List(
+        [],
+        item_type=str,
+        doc="""The hosts of several servers of the same app, for example the server processes
+        started via `serve_many`. If provided the users are dealt out to the hosts in turn instead
+        of using host, and their events are logged with their host in the `server` column""",
+    )
     logger: Logger = param.ClassSelector(class_=Logger)
     headless: bool = param.Boolean(doc="If True the browser will be shown while running the test")
-    n_users: int = param.Integer(default=USERS, doc="The number of users to access the page")
+    n_users: int = param.Integer(
+        default=USERS,
+        doc="""The number of users to access the page. For arrival rate profiles it is the
+        expected number of concurrent users used to size the browser pool""",
+    )
     user_delay: float = param.Number(
         default=USER_DELAY, doc="The delay to apply between users accessing the the page"
     )
+    profile: LoadProfile = param.ClassSelector(
+        class_=LoadProfile,
+        default=Ramp(),
+        doc="""The load profile scheduling when the user sessions start. Defaults to starting
+        n_users users user_delay seconds apart""",
+    )
     user: User = param.Selector(objects=[User()], doc="The user to use")
-
-    def __panel__(self):
-        raise NotImplementedError()
+    n_workers: int = param.Integer(
+        default=1,
+        bounds=(1, None),
+        doc="""The number of worker processes to run the users in. Each worker runs its own
+        browser and a slice of the users""",
+    )
+    n_browsers: int | None = param.Integer(
+        None,
+        bounds=(1, None),
+        doc="""The number of browsers to launch per worker. If None it is given by the number of
+        users and users_per_browser""",
+    )
+    users_per_browser: int | None = param.Integer(
+        None,
+        bounds=(1, None),
+        doc="""The number of users to run in each browser. If None and n_browsers is None, all
+        users of a worker run in one browser""",
+    )
+    max_pages_per_context: int = param.Integer(
+        1,
+        bounds=(1, None),
+        doc="""The number of successive users that can reuse a BrowserContext. Defaults to 1,
+        i.e. every user gets a fresh, isolated context""",
+    )
+    max_sessions_per_browser: int | None = param.Integer(
+        None,
+        bounds=(1, None),
+        doc="""The number of pages each browser serves before it is replaced, bounding the memory
+        growth of the browsers in long tests. If None the browsers are never replaced""",
+    )
+    max_context_heap: float | None = param.Number(
+        None,
+        bounds=(0, None),
+        doc="""The used JS heap size in MB of a page above which its BrowserContext is not
+        reused by the next user (Chromium only)""",
+    )
+    soak: bool = param.Boolean(
+        False,
+        doc=f"""If True the runner is configured for long soak tests, such that the memory
+        growth of the load generator does not distort the latencies. Only the latest
+        {SOAK_MAX_EVENTS} events are kept in memory by the logger, the browsers are replaced
+        after {SOAK_SESSIONS_PER_BROWSER} pages and contexts using more than
+        {SOAK_CONTEXT_HEAP:g} MB of JS heap are not reused, unless these limits are set.
+        The RSS of the generator is logged by a GeneratorMonitor, which is added if the
+        monitor is not set""",
+    )
+    sampler: ResourceSampler | None = param.ClassSelector(
+        class_=ResourceSampler,
+        doc="""If provided the CPU, memory, threads, sessions and event loop lag of the server are
+        logged as `resources` events while the test runs""",
+    )
+    monitor: GeneratorMonitor | None = param.ClassSelector(
+        class_=GeneratorMonitor,
+        default=None,
+        allow_None=True,
+        doc="""If provided the event loop lag, CPU and memory of the load generator are logged as
+        `generator` events and the run is flagged if the generator was the bottleneck""",
+    )
+    trace_websockets: bool = param.Boolean(
+        False,
+        doc="""If True the server round trip time, payload sizes and number of patches of every
+        Bokeh websocket message sent by the browser are logged as `websocket` events""",
+    )
 
     def __init__(self, user: User | None = None, users: List[User] | None = None, **params):
         """_summary_
@@ -51,42 +152,508 @@ class LoadTestRunner(pn.viewable.Viewer):
         elif not self.param.user.default in self.param.user.objects and self.param.user.objects:
             self.user = self.param.user.default = self.param.user.objects[0]
 
-    async def _create_task(self, index, browser, **kwargs):
-        await asyncio.sleep(delay=index * self.user_delay)
-        page = await browser.new_page()
-        await self.user.clone(
-            name=str(index), host=self.host, page=page, event=self.logger.event, **kwargs
-        ).run()
-        await asyncio.sleep(self.user.sleep_time)
-        await page.close()
+        self._stopped = False
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: asyncio.Future | None = None
+        self._processes: List = []
+        self._saturation: List[str] = []
+        self._playwright: Playwright | None = None
+        self._pool: BrowserPool | None = None
+
+    @param.depends("soak", watch=True, on_init=True)
+    def _configure_soak(self):
+        """Sets the limits of soak tests that are not set"""
+        if not self.soak:
+            return
+        if self.logger.max_events is None:
+            self.logger.max_events = SOAK_MAX_EVENTS
+        if self.max_sessions_per_browser is None:
+            self.max_sessions_per_browser = SOAK_SESSIONS_PER_BROWSER
+        if self.max_context_heap is None:
+            self.max_context_heap = SOAK_CONTEXT_HEAP
+        if self.monitor is None:
+            self.monitor = GeneratorMonitor()
+
+    async def _create_task(
+        self, index: int, scheduled: float, pool: BrowserPool, origin: float, **kwargs
+    ):
+        session = 0
+        host = self.hosts[index % len(self.hosts)] if self.hosts else self.host
+        server = {"server": host} if self.hosts else {}
+        while True:
+            await asyncio.sleep(delay=max(origin + scheduled - time.time(), 0))
+            event = self._session_event(session, scheduled, origin, **server)
+            async with pool.page() as page:
+                if self.trace_websockets and page is not None:
+                    # The tracer needs the Bokeh protocol. Headless runs do not pay for it
+                    from .tracing import (  # pylint: disable=import-outside-toplevel
+                        WebSocketTracer,
+                    )
+
+                    WebSocketTracer(
+                        log=functools.partial(self.logger.log, session=session, **server),
+                        user=str(index),
+                    ).attach(page)
+                await self.user.clone(
+                    name=str(index), host=host, page=page, event=event, **kwargs
+                ).run()
+                await asyncio.sleep(self.user.sleep_time)
+
+            scheduled = time.time() - origin
+            session += 1
+            if not self.profile.recycle or scheduled >= (self.profile.duration or 0):
+                break
+
+    def _session_event(self, session: int, scheduled: float, origin: float, **values) -> Callable:
+        """Returns the event logger of a user session
+
+        The first event of the session is logged with a `corrected_duration` measured from the
+        scheduled start of the session. The `values` are logged with every event"""
+        intended_starts = [origin + scheduled]
+        actual_start = time.time() - origin
+
+        @contextmanager
+        def event(name: str, user: str, **kwargs):
+            with self.logger.event(
+                name,
+                user,
+                intended_start=intended_starts.pop() if intended_starts else None,
+                session=session,
+                scheduled_start_seconds=scheduled,
+                actual_start_seconds=actual_start,
+                **values,
+                **kwargs,
+            ) as record:
+                yield record
+
+        return event
+
+    def _create_tasks(self, pool: BrowserPool, arrivals: List[Tuple[int, float]], origin: float):
+        return [
+            self._create_task(index=index, scheduled=scheduled, pool=pool, origin=origin)
+            for index, scheduled in arrivals
+        ]
+
+    def _create_pool(self) -> BrowserPool:
+        return BrowserPool(
+            headless=self.headless,
+            n_browsers=self.n_browsers,
+            users_per_browser=self.users_per_browser,
+            max_pages_per_context=self.max_pages_per_context,
+            max_sessions_per_browser=self.max_sessions_per_browser,
+            max_context_heap=self.max_context_heap,
+        )
 
-    def _create_tasks(self, browser):
-        return [self._create_task(index=index, browser=browser) for index in range(self.n_users)]
+    def _arrivals(self) -> List[Tuple[int, float]]:
+        """Returns the (user index, scheduled start in seconds) of the users"""
+        return list(enumerate(self.profile.arrivals(self.n_users, self.user_delay)))
+
+    async def _run_users(
+        self, arrivals: List[Tuple[int, float]], get_origin: Callable, n_users: int
+    ):
+        if not self.user.requires_page:
+            await self._run_tasks(NoBrowserPool(), arrivals, get_origin)
+            return
+        if self._pool is not None:
+            await self._pool.grow(self._playwright, n_users=min(len(arrivals), n_users))
+            await self._run_tasks(self._pool, arrivals, get_origin)
+            return
+
+        async with async_playwright() as pwright:
+            pool = self._create_pool()
+            await pool.start(pwright, n_users=min(len(arrivals), n_users))
+            await asyncio.sleep(0.2)
+            await self._run_tasks(pool, arrivals, get_origin)
+            await pool.stop()
+
+    @asynccontextmanager
+    async def reuse_browsers(self):
+        """Keeps the browsers running between the runs in the context, for example between
+        short trials. More browsers are launched if a run needs them.
+
+        Use it as
+
+        ```python
+        async with runner.reuse_browsers():
+            for n_users in [1, 2, 4]:
+                runner.n_users = n_users
+                await runner.run()
+        ```
+
+        The browsers are not reused when running in worker processes.
+        """
+        if self.n_workers > 1 or not self.user.requires_page:
+            yield
+            return
+
+        async with async_playwright() as pwright:
+            self._playwright, self._pool = pwright, self._create_pool()
+            try:
+                yield
+            finally:
+                pool, self._playwright, self._pool = self._pool, None, None
+                await pool.stop()
+
+    async def _run_tasks(
+        self, pool: BrowserPool, arrivals: List[Tuple[int, float]], get_origin: Callable
+    ):
+        origin = await get_origin()
+        # Then()
+        tasks = self._create_tasks(pool=pool, arrivals=arrivals, origin=origin)
+        self._loop = asyncio.get_running_loop()
+        self._tasks = asyncio.gather(*tasks)
+        if self._stopped:
+            self._tasks.cancel()
+        monitoring = None
+        if self.monitor is not None:
+            monitoring = asyncio.ensure_future(self.monitor.run(self.logger.log))
+        try:
+            await self._tasks
+        except asyncio.CancelledError:
+            if not self._stopped:
+                raise
+        finally:
+            self._tasks = None
+            if monitoring is not None:
+                monitoring.cancel()
+
+    async def _start_logger(self) -> float:
+        # Worker processes need time to receive the origin before it
+        origin = time.time() + (WORKER_START_DELAY if self.n_workers > 1 else 0)
+        self.logger.reset(origin=origin)
+        return origin
+
+    async def _run_load(self, arrivals: List[Tuple[int, float]], get_origin: Callable):
+        """Runs the users with the given (index, scheduled start) in this process or in worker
+        processes. `get_origin` is awaited when the browsers are launched and returns the
+        shared time origin of the schedule"""
+        if self.n_workers > 1:
+            await self._run_workers(arrivals, get_origin)
+        else:
+            await self._run_users(arrivals, get_origin=get_origin, n_users=self.n_users)
 
     async def run(self):
         """Runs the test"""
+        self._stopped = False
+        self._saturation = []
         self.logger.reset()
-        async with async_playwright() as pwright:
-            browser = await pwright.chromium.launch(headless=self.headless)
-            await asyncio.sleep(0.2)
-            # Then()
-            tasks = self._create_tasks(browser=browser)
-            await asyncio.gather(*tasks)
-            await browser.close()
-        self.logger.save()
-        self.logger.archive()
+        sampling = None
+
+        async def get_origin() -> float:
+            nonlocal sampling
+            origin = await self._start_logger()
+            # Started once the logger is reset so the first samples are kept
+            if self.sampler is not None and sampling is None:
+                sampling = asyncio.ensure_future(self.sampler.run(self.logger.log))
+            return origin
+
+        try:
+            await self._run_load(self._arrivals(), get_origin=get_origin)
+        finally:
+            if sampling is not None:
+                sampling.cancel()
+                await asyncio.gather(sampling, return_exceptions=True)
+        if sampling is not None and not sampling.cancelled() and sampling.exception():
+            raise sampling.exception()  # type: ignore[misc]
+        if self.monitor is not None and self.logger.buffer:
+            self._saturation = self.monitor.check(self.logger.data)
+        if self._saturation:
+            self.param.warning(
+                "The load generator was the bottleneck of the run: "
+                f"{', '.join(self._saturation)}. Consider more workers or fewer users"
+            )
+        self.logger.close(metadata=self._metadata())
+
+    def _metadata(self) -> Dict:
+        """Returns the metadata of the run recorded in the catalog of the archive"""
+        return {
+            "host": ", ".join(self.hosts) if self.hosts else self.host,
+            "user": type(self.user).__name__,
+            "n_users": self.n_users,
+            "profile": type(self.profile).__name__,
+            "n_workers": self.n_workers,
+            "generator_bound": self.generator_bound,
+            "stopped": self.stopped,
+        }
+
+    @property
+    def generator_bound(self) -> bool:
+        """Returns True if the load generator was the bottleneck of the last run. The latencies
+        measured are then too high. See `saturation` for the reasons"""
+        return bool(self._saturation)
+
+    @property
+    def saturation(self) -> List[str]:
+        """Returns the reasons the load generator was the bottleneck of the last run, if any"""
+        return list(self._saturation)
+
+    @property
+    def stopped(self) -> bool:
+        """Returns True if the running test was aborted via `stop`"""
+        return self._stopped
+
+    def stop(self):
+        """Aborts the running test. Can be called from any thread, for example from a Panel
+        callback while watching the test in a LoadTestViewer.
+
+        The running user sessions are cancelled and the events logged so far are saved. When
+        running in worker processes, the workers are terminated and their events are lost.
+        """
+        self._stopped = True
+        for process in self._processes:
+            process.terminate()
+        loop, tasks = self._loop, self._tasks
+        if loop is not None and tasks is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(tasks.cancel)
+
+    def _worker_params(self) -> Dict:
+        return {
+            name: value
+            for name, value in self.param.values().items()
+            # The limits set by soak are given explicitly. The workers do not save any events
+            if name not in ["name", "logger", "n_workers", "sampler", "soak"]
+        }
+
+    def _start_workers(self, arrivals: List[Tuple[int, float]]) -> Tuple[List, List]:
+        context = multiprocessing.get_context("spawn")
+        params = self._worker_params()
+        n_users = math.ceil(self.n_users / self.n_workers)
+        connections = []
+        processes = []
+        for worker in range(self.n_workers):
+            connection, worker_connection = context.Pipe()
+            process = context.Process(
+                target=_run_worker,
+                args=(params, arrivals[worker :: self.n_workers], n_users, worker_connection),
+                daemon=True,
+            )
+            process.start()
+            connections.append(connection)
+            processes.append(process)
+        self._processes = processes
+        return connections, processes
+
+    async def _run_workers(self, arrivals: List[Tuple[int, float]], get_origin: Callable):
+        """Runs the users in worker processes and merges their results into the logger.
+
+        The users are dealt out to the workers in turn such that every worker takes part in
+        the ramp up. The workers start the users when all browsers have been launched. The
+        start times are given by a shared time origin and the global schedule of the profile.
+        """
+        connections, processes = self._start_workers(arrivals)
+        loop = asyncio.get_running_loop()
+
+        async def receive_all():
+            messages = await asyncio.gather(
+                *(loop.run_in_executor(None, connection.recv) for connection in connections)
+            )
+            for message in messages:
+                if isinstance(message, BaseException):
+                    raise message
+            return messages
+
+        try:
+            await receive_all()
+            origin = await get_origin()
+            for connection in connections:
+                connection.send(origin)
+            results = await receive_all()
+        except (EOFError, OSError):
+            if not self._stopped:
+                raise
+            return
+        finally:
+            self._processes = []
+            for process in processes:
+                process.join(timeout=10)
+                if process.is_alive():
+                    process.terminate()
+
+        data = pd.concat(results, ignore_index=True).sort_values("start", kind="stable")
+        self.logger.extend(data)
 
     @staticmethod
     @asynccontextmanager
-    async def serve(panels, threaded=True, show=False, port: int | None = None, **kwargs):
-        """Utility context manager for serving one or more panels in the context
+    async def serve(
+        panels,
+        threaded=True,
+        show=False,
+        port: int | None = None,
+        *,
+        timeout: float = SERVER_TIMEOUT,
+        **kwargs,
+    ):
+        """Utility context manager for serving one or more panels in this process
+
+        The context is entered when the server responds to HTTP requests and yields its host,
+        for example 'http://localhost:5006'. See `serve_many` to serve in several processes.
+
+        Args:
+            panels: The panels to serve, like for pn.serve
+            threaded (bool, optional): Whether or not to serve in a thread. Defaults to True.
+            show (bool, optional): Whether or not to open the app in a browser. Defaults to False.
+            port (int | None, optional): The port. Defaults to a free port.
+            timeout (float, optional): The seconds to wait for the server to be ready. Defaults
+                to 30.
+
+        Other parameters are the same as for pn.serve
 
-        Parameters are the same as for pn.serve
+        Yields:
+            str: The host of the server
         """
-        server = pn.serve(panels, port=port, threaded=threaded, show=show, **kwargs)
-        await asyncio.sleep(0.2)
+        import panel as pn  # pylint: disable=import-outside-toplevel
 
+        port = port or _free_ports(1)[0]
+        host = f"http://localhost:{port}"
+        server = pn.serve(panels, port=port, threaded=threaded, show=show, **kwargs)
         try:
-            yield f"http://localhost:{port}"
+            await wait_until_ready(host, timeout=timeout)
+            yield host
         finally:
             server.stop()
+
+    @staticmethod
+    @asynccontextmanager
+    async def serve_many(
+        panels,
+        n_processes: int = 2,
+        port: int | None = None,
+        *,
+        timeout: float = SERVER_TIMEOUT,
+        **kwargs,
+    ):
+        """Utility context manager for serving one or more panels in several processes
+
+        Each process serves the panels on its own port. The context is entered when all the
+        servers respond to HTTP requests and always yields the list of hosts, even for one
+        process. Give them to the `hosts` of the runner.
+
+        Args:
+            panels: The panels to serve, like for pn.serve. They must be picklable, for example
+                a function or class defined in a module.
+            n_processes (int, optional): The number of server processes. Defaults to 2.
+            port (int | None, optional): The port of the first process. The next processes use
+                the next ports. Defaults to free ports.
+            timeout (float, optional): The seconds to wait for the servers to be ready. Defaults
+                to 30.
+
+        Other parameters are the same as for pn.serve
+
+        Yields:
+            List[str]: The hosts of the servers, one per process
+        """
+        if n_processes < 1:
+            raise ValueError(f"n_processes should be at least 1. Got {n_processes}")
+        ports = [port + index for index in range(n_processes)] if port else _free_ports(n_processes)
+        hosts = [f"http://localhost:{port}" for port in ports]
+        context = multiprocessing.get_context("spawn")
+        processes = [
+            context.Process(target=_serve_process, args=(panels, port, kwargs), daemon=True)
+            for port in ports
+        ]
+        for process in processes:
+            process.start()
+        try:
+            await asyncio.gather(
+                *(
+                    wait_until_ready(host, timeout=timeout, process=process)
+                    for host, process in zip(hosts, processes)
+                )
+            )
+            yield hosts
+        finally:
+            for process in processes:
+                process.terminate()
+            for process in processes:
+                process.join(timeout=10)
+
+
+def _free_ports(count: int) -> List[int]:
+    """Returns the given number of free ports"""
+    sockets = [socket.socket() for _ in range(count)]
+    try:
+        for sock in sockets:
+            sock.bind(("localhost", 0))
+        return [sock.getsockname()[1] for sock in sockets]
+    finally:
+        for sock in sockets:
+            sock.close()
+
+
+def _probe(url: str):
+    """Raises an OSError if the server at the url does not respond to a HEAD request"""
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, method="HEAD"), timeout=1):
+            pass
+    except urllib.error.HTTPError:
+        # Any response, even an error, means the server is up
+        pass
+
+
+async def wait_until_ready(
+    url: str, timeout: float = SERVER_TIMEOUT, process: multiprocessing.Process | None = None
+):
+    """Waits until the server at the url responds to HTTP requests
+
+    Args:
+        url (str): The url of the server, for example http://localhost:5006
+        timeout (float, optional): The seconds to wait. Defaults to 30.
+        process (multiprocessing.Process | None, optional): The process running the server, if
+            any. Defaults to None.
+
+    Raises:
+        TimeoutError: If the server is not ready within the timeout
+        RuntimeError: If the process running the server exited
+    """
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            await loop.run_in_executor(None, _probe, url)
+            return
+        except OSError:
+            pass
+        if process is not None and not process.is_alive():
+            raise RuntimeError(
+                f"The server process of {url} exited with the code {process.exitcode}"
+            )
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"The server at {url} was not ready within {timeout}s")
+        await asyncio.sleep(READY_INTERVAL)
+
+
+def _serve_process(panels, port: int, kwargs: Dict):
+    """Serves the panels on the port until terminated"""
+    import panel as pn  # pylint: disable=import-outside-toplevel
+
+    pn.serve(panels, port=port, threaded=False, show=False, start=True, **kwargs)
+
+
+def _run_worker(params: Dict, arrivals: List[Tuple[int, float]], n_users: int, connection):
+    """Runs the users with the given (index, scheduled start) in a worker process
+
+    Sends "ready" when the browser has been launched, receives the shared time origin and sends
+    back the results as a DataFrame. Any exception is sent back instead.
+    """
+    try:
+        logger = Logger(auto_save=False, auto_archive=False)
+        runner = LoadTestRunner(logger=logger, **params)
+
+        async def get_origin():
+            connection.send("ready")
+            origin = await asyncio.get_running_loop().run_in_executor(None, connection.recv)
+            logger.reset(origin=origin)
+            return origin
+
+        asyncio.run(
+            runner._run_users(  # pylint: disable=protected-access
+                arrivals, get_origin=get_origin, n_users=n_users
+            )
+        )
+        connection.send(logger.data)
+    except BaseException as ex:  # pylint: disable=broad-except
+        # The exception might not be picklable
+        indices = [index for index, _ in arrivals]
+        connection.send(RuntimeError(f"The worker running the users {indices} failed: {ex!r}"))
+    finally:
+        connection.close()
@@ -0,0 +1,151 @@
+"""Load profiles scheduling when the LoadTestRunner starts user sessions"""
+from __future__ import annotations
+
+import math
+import random
+from typing import List, Tuple
+
+import param
+
+
+class LoadProfile(param.Parameterized):
+    """Base class for load profiles
+
+    A load profile returns the scheduled start times of the user sessions. Override the
+    `arrivals` method to implement a custom profile.
+    """
+
+    recycle: bool = param.Boolean(
+        False,
+        constant=True,
+        doc="""If True each user starts a new session when its previous session has finished
+        until `duration` seconds have passed""",
+    )
+    duration: float | None = param.Number(
+        None, bounds=(0, None), doc="The duration in seconds of the load"
+    )
+
+    def arrivals(self, n_users: int, user_delay: float) -> List[float]:
+        """Returns the scheduled start times of the user sessions
+
+        Args:
+            n_users (int): The number of users configured on the LoadTestRunner
+            user_delay (float): The delay between users configured on the LoadTestRunner
+
+        Returns:
+            List[float]: The sorted start times in seconds relative to the start of the test.
+                Each start time is a new user.
+        """
+        raise NotImplementedError()
+
+
+class Ramp(LoadProfile):
+    """Starts `n_users` users `user_delay` seconds apart. Each user runs once.
+
+    This is the default profile.
+    """
+
+    def arrivals(self, n_users: int, user_delay: float) -> List[float]:
+        return [index * user_delay for index in range(n_users)]
+
+
+class Hold(Ramp):
+    """Ramps up `n_users` users `user_delay` seconds apart and keeps them busy for `duration`
+    seconds. A user starts a new session as soon as its previous session has finished.
+    """
+
+    recycle: bool = param.Boolean(True, constant=True)
+    duration: float = param.Number(60.0, bounds=(0, None))
+
+
+class ArrivalRate(LoadProfile):
+    """Base class for open loop profiles starting new users at a given rate independently of
+    how fast the app responds.
+
+    Override the `stages` method to return the (rate, duration) of each stage.
+    """
+
+    poisson: bool = param.Boolean(
+        False,
+        doc="""If True the time between arrivals is exponentially distributed, i.e. the users
+        arrive as a Poisson process. Otherwise they arrive at fixed intervals""",
+    )
+    seed: int | None = param.Integer(None, doc="The seed used to draw Poisson arrivals")
+
+    def stages(self) -> List[Tuple[float, float]]:
+        """Returns a list of (arrivals per second, duration in seconds) stages"""
+        raise NotImplementedError()
+
+    def arrivals(self, n_users: int, user_delay: float) -> List[float]:
+        generator = random.Random(self.seed)
+        arrivals: List[float] = []
+        stage_start = 0.0
+        for rate, duration in self.stages():
+            stage_stop = stage_start + duration
+            if rate > 0:
+                if self.poisson:
+                    arrival = stage_start + generator.expovariate(rate)
+                    while arrival < stage_stop:
+                        arrivals.append(arrival)
+                        arrival += generator.expovariate(rate)
+                else:
+                    # Rounded as for example 2.2 * 25 gives 55.00000000000001
+                    count = math.ceil(round(duration * rate, 9))
+                    arrivals.extend(stage_start + index / rate for index in range(count))
+            stage_start = stage_stop
+        return arrivals
+
+
+class ConstantRate(ArrivalRate):
+    """Starts `rate` new users per second for `duration` seconds"""
+
+    rate: float = param.Number(1.0, bounds=(0, None), doc="The number of new users per second")
+    duration: float = param.Number(60.0, bounds=(0, None))
+
+    def stages(self) -> List[Tuple[float, float]]:
+        return [(self.rate, self.duration)]
+
+
+class Poisson(ConstantRate):
+    """Starts on average `rate` new users per second for `duration` seconds. The users arrive
+    as a Poisson process"""
+
+    poisson: bool = param.Boolean(True)
+
+
+class Steps(ArrivalRate):
+    """Starts new users at a rate that changes in steps, for example to ramp up in stairs"""
+
+    steps: List[Tuple[float, float]] = param.List(
+        [(1.0, 30.0), (2.0, 30.0), (4.0, 30.0)],
+        doc="A list of (new users per second, duration in seconds) steps",
+    )
+
+    def stages(self) -> List[Tuple[float, float]]:
+        return [(float(rate), float(duration)) for rate, duration in self.steps]
+
+
+class Spike(ArrivalRate):
+    """Starts `rate` new users per second for `duration` seconds except during a spike where
+    `spike_rate` new users per second are started"""
+
+    rate: float = param.Number(1.0, bounds=(0, None), doc="The number of new users per second")
+    spike_rate: float = param.Number(
+        10.0, bounds=(0, None), doc="The number of new users per second during the spike"
+    )
+    spike_start: float = param.Number(
+        30.0, bounds=(0, None), doc="The start of the spike in seconds"
+    )
+    spike_duration: float = param.Number(
+        10.0, bounds=(0, None), doc="The duration of the spike in seconds"
+    )
+    duration: float = param.Number(60.0, bounds=(0, None))
+
+    def stages(self) -> List[Tuple[float, float]]:
+        spike_start = min(self.spike_start, self.duration)
+        spike_stop = min(spike_start + self.spike_duration, self.duration)
+        return [
+            (self.rate, spike_start),
+            (self.spike_rate, spike_stop - spike_start),
+            (self.rate, self.duration - spike_stop),
+        ]
@@ -0,0 +1,425 @@
+"""Sinks for streaming LoadTestRunner events to a file while the test is running"""
+from __future__ import annotations
+
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import IO, Dict, List
+
+import param
+
+EPOCH = datetime(1970, 1, 1)
+TIMESTAMP_COLUMNS = ("start", "stop")
+DICTIONARY_COLUMNS = ("event", "user")
+
+
+class Sink(param.Parameterized):
+    """Base class for writing results to a file while the test is running
+
+    Results are kept in memory and written to the file in batches. A batch is written when
+    `batch_size` results are pending or when more than `flush_interval` seconds have passed since
+    the last write. The CSV and JSON lines files are always complete up to the last flush, so
+    the results survive a crash of the test. The Parquet and Arrow files are not crash-safe:
+    they are only readable once the sink has been closed.
+
+    The `start` and `stop` values of a result are given in seconds since the epoch.
+
+    Override `_open`, `_write_batch` and `_close` to implement a custom file format.
+    """
+
+    batch_size: int = param.Integer(
+        100, bounds=(1, None), doc="The maximum number of results to keep before writing them"
+    )
+    flush_interval: float = param.Number(
+        1.0, bounds=(0, None), doc="The maximum number of seconds between writing results"
+    )
+    fsync: bool = param.Boolean(
+        False, doc="Whether or not to ask the operating system to sync the file after each write"
+    )
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._file: Path | None = None
+        self._pending: List[Dict] = []
+        self._last_flush = time.time()
+        self._count = 0
+
+    @property
+    def file(self) -> Path | None:
+        """Returns the file written to or None if the sink is not open"""
+        return self._file
+
+    @property
+    def is_open(self) -> bool:
+        """Returns True if the sink is open"""
+        return self._file is not None
+
+    @property
+    def count(self) -> int:
+        """Returns the number of results written to the file"""
+        return self._count
+
+    def open(self, file: str | Path):
+        """Opens the file for writing. An existing file is truncated.
+
+        Args:
+            file (str | Path): The file to write to
+        """
+        self.close()
+        self._file = Path(file)
+        self._file.parent.mkdir(parents=True, exist_ok=True)
+        self._pending = []
+        self._count = 0
+        self._last_flush = time.time()
+        self._open(self._file)
+
+    def write(self, result: Dict):
+        """Adds the result to the sink. The result is written when the next batch is flushed
+
+        Args:
+            result (Dict): The result to write
+        """
+        self._pending.append(result)
+        if (
+            len(self._pending) >= self.batch_size
+            or time.time() - self._last_flush >= self.flush_interval
+        ):
+            self.flush()
+
+    def flush(self):
+        """Writes the pending results to the file"""
+        if self._pending and self.is_open:
+            self._write_batch(self._pending)
+            self._count += len(self._pending)
+            self._pending = []
+        self._last_flush = time.time()
+
+    def close(self):
+        """Writes the pending results and closes the file"""
+        if self.is_open:
+            self.flush()
+            self._close()
+            self._file = None
+
+    def _open(self, file: Path):
+        raise NotImplementedError()
+
+    def _write_batch(self, results: List[Dict]):
+        raise NotImplementedError()
+
+    def _close(self):
+        raise NotImplementedError()
+
+
+class _TextSink(Sink):  # pylint: disable=abstract-method
+    """A Sink that keeps a text file handle open and appends to it"""
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._handle: IO[str] | None = None
+
+    def _open(self, file: Path):
+        # pylint: disable=consider-using-with
+        self._handle = open(file, "w", encoding="utf8", newline="")
+
+    @staticmethod
+    def _format(result: Dict) -> Dict:
+        """Returns the result with the timestamps formatted as UTC datetime strings"""
+        result = dict(result)
+        for column in TIMESTAMP_COLUMNS:
+            if column in result:
+                result[column] = format_timestamp(result[column])
+        return result
+
+    def _write_text(self, text: str):
+        # The batch is written in one call to limit the risk of leaving a partial line behind
+        handle = self._handle
+        assert handle is not None
+        handle.write(text)
+        handle.flush()
+        if self.fsync:
+            os.fsync(handle.fileno())
+
+    def _close(self):
+        if self._handle is not None:
+            self._handle.close()
+            self._handle = None
+
+
+class CSVSink(_TextSink):
+    """Appends the results to a csv file in the format written by `Logger.save`
+
+    The columns are given by the first result. If a later result contains a new column, the
+    file is rewritten once with the extended header.
+    """
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._columns: List[str] = []
+
+    def _open(self, file: Path):
+        super()._open(file)
+        self._columns = []
+
+    def _write_batch(self, results: List[Dict]):
+        new_columns = [
+            column for result in results for column in result if column not in self._columns
+        ]
+        if new_columns:
+            self._extend_columns(list(dict.fromkeys(new_columns)))
+
+        text = io.StringIO()
+        writer = csv.writer(text)
+        for index, result in enumerate(results, start=self._count):
+            result = self._format(result)
+            writer.writerow([index] + [result.get(column, None) for column in self._columns])
+        self._write_text(text.getvalue())
+
+    def _extend_columns(self, columns: List[str]):
+        file = self._file
+        assert file is not None and self._handle is not None
+        self._handle.close()
+        if self._columns:
+            with open(file, "r", encoding="utf8", newline="") as handle:
+                rows = list(csv.reader(handle))[1:]
+        else:
+            rows = []
+        self._columns = self._columns + columns
+        # pylint: disable=consider-using-with
+        self._handle = open(file, "w", encoding="utf8", newline="")
+
+        text = io.StringIO()
+        writer = csv.writer(text)
+        writer.writerow([""] + self._columns)
+        padding = [""] * len(columns)
+        writer.writerows(row + padding for row in rows)
+        self._write_text(text.getvalue())
+
+
+class JSONLinesSink(_TextSink):
+    """Appends the results to a file with one json object per line"""
+
+    def _write_batch(self, results: List[Dict]):
+        text = "".join(json.dumps(self._format(result), default=str) + "\n" for result in results)
+        self._write_text(text)
+
+
+class _ColumnarSink(Sink):
+    """A Sink that writes each batch as an Arrow record batch
+
+    The `event` and `user` columns are dictionary encoded. The columns and their types are given
+    by the first batch. If a later batch contains a new column or a value not fitting the type of
+    its column, the file is rewritten once with the widened schema: integers and floats are
+    widened to float64 and other mixed types to strings, like the CSVSink extends its header.
+
+    The file is only readable after the sink has been closed.
+    """
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self._writer = None
+        self._schema = None
+        self._dictionaries: Dict[str, Dict[str, int]] = {}
+
+    def _open(self, file: Path):
+        import_pyarrow()
+        self._writer = None
+        self._schema = None
+        self._dictionaries = {column: {} for column in DICTIONARY_COLUMNS}
+
+    def _write_batch(self, results: List[Dict]):
+        pyarrow = import_pyarrow()
+        names = list(dict.fromkeys(column for result in results for column in result))
+        if self._schema is not None:
+            names = self._schema.names + [name for name in names if name not in self._schema.names]
+        arrays = [
+            self._to_array(pyarrow, name, [result.get(name, None) for result in results])
+            for name in names
+        ]
+        if self._schema is None:
+            self._schema = pyarrow.schema(
+                [(name, array.type) for name, array in zip(names, arrays)]
+            )
+            self._writer = self._create_writer(self._file, self._schema)
+        else:
+            schema = _widen_schema(pyarrow, self._schema, names, arrays)
+            if not schema.equals(self._schema):
+                self._rewrite(pyarrow, schema)
+        batch = pyarrow.record_batch(
+            [_cast(pyarrow, array, field.type) for array, field in zip(arrays, self._schema)],
+            schema=self._schema,
+        )
+        self._write_record_batch(pyarrow.Table.from_batches([batch]))
+
+    def _to_array(self, pyarrow, name: str, values: List):
+        if name in self._dictionaries:
+            codes = self._dictionaries[name]
+            indices = [codes.setdefault(str(value), len(codes)) for value in values]
+            # The dictionary only grows so it can be written as a delta in the Arrow IPC format
+            return pyarrow.DictionaryArray.from_arrays(
+                pyarrow.array(indices, type=pyarrow.int32()), pyarrow.array(list(codes))
+            )
+        if name in TIMESTAMP_COLUMNS:
+            nanoseconds = [None if value is None else int(value * 1e9) for value in values]
+            return pyarrow.array(nanoseconds, type=pyarrow.timestamp("ns"))
+        try:
+            return pyarrow.array(values)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError, OverflowError):
+            return pyarrow.array([None if value is None else str(value) for value in values])
+
+    def _rewrite(self, pyarrow, schema):
+        """Rewrites the file written so far with the widened schema"""
+        self._close()
+        table = self._read(pyarrow, self._file)
+        arrays = []
+        for field in schema:
+            if field.name in self._dictionaries:
+                values = table[field.name].cast(pyarrow.string()).to_pylist()
+                arrays.append(self._to_array(pyarrow, field.name, values))
+            elif field.name in table.column_names:
+                arrays.append(_cast(pyarrow, table[field.name].combine_chunks(), field.type))
+            else:
+                arrays.append(pyarrow.nulls(table.num_rows, type=field.type))
+        self._schema = schema
+        self._writer = self._create_writer(self._file, schema)
+        if table.num_rows:
+            self._write_record_batch(pyarrow.Table.from_arrays(arrays, schema=schema))
+
+    def _create_writer(self, file, schema):
+        raise NotImplementedError()
+
+    @staticmethod
+    def _read(pyarrow, file):
+        """Returns the complete file as a Table held in memory"""
+        raise NotImplementedError()
+
+    def _write_record_batch(self, table):
+        assert self._writer is not None
+        self._writer.write_table(table)
+
+    def _close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
+class ParquetSink(_ColumnarSink):
+    """Writes the results to a Parquet file. Each batch is written as a row group"""
+
+    def _create_writer(self, file, schema):
+        import_pyarrow()
+        from pyarrow import parquet  # pylint: disable=import-outside-toplevel
+
+        return parquet.ParquetWriter(str(file), schema)
+
+    @staticmethod
+    def _read(pyarrow, file):
+        from pyarrow import parquet  # pylint: disable=import-outside-toplevel
+
+        return parquet.read_table(str(file))
+
+
+class ArrowSink(_ColumnarSink):
+    """Writes the results to an Arrow IPC (Feather v2) file which can be memory mapped"""
+
+    def _create_writer(self, file, schema):
+        pyarrow = import_pyarrow()
+        options = pyarrow.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+        return pyarrow.ipc.new_file(str(file), schema, options=options)
+
+    @staticmethod
+    def _read(pyarrow, file):
+        # Not memory mapped as the file is overwritten next
+        with pyarrow.OSFile(str(file)) as source:
+            return pyarrow.ipc.open_file(source).read_all()
+
+
+def import_pyarrow():
+    """Returns the pyarrow module. Raises an ImportError with a helpful message if missing"""
+    try:
+        import pyarrow  # pylint: disable=import-outside-toplevel
+        import pyarrow.ipc  # pylint: disable=import-outside-toplevel
+    except ImportError as ex:
+        raise ImportError(
+            "The Parquet and Arrow formats require pyarrow. Install it via "
+            "'pip install loadwright[arrow]'"
+        ) from ex
+    return pyarrow
+
+
+def _widen_schema(pyarrow, schema, names: List[str], arrays: List):
+    """Returns the schema extended with the new columns and widened to fit the arrays"""
+    fields = []
+    for name, array in zip(names, arrays):
+        if name not in schema.names:
+            fields.append(pyarrow.field(name, array.type))
+            continue
+        field = schema.field(name)
+        fields.append(field.with_type(_common_type(pyarrow, field.type, array.type)))
+    return pyarrow.schema(fields)
+
+
+def _common_type(pyarrow, old, new):
+    """Returns the type both types of values can be stored as"""
+    types = pyarrow.types
+    if old.equals(new) or types.is_null(new):
+        return old
+    if types.is_null(old):
+        return new
+    numbers = [(types.is_integer(type_) or types.is_floating(type_)) for type_ in (old, new)]
+    if all(numbers):
+        return pyarrow.float64()
+    return pyarrow.string()
+
+
+def _cast(pyarrow, array, type_):
+    """Returns the array as the type. Values are formatted as strings if needed"""
+    if array.type.equals(type_):
+        return array
+    if pyarrow.types.is_string(type_) and not (
+        pyarrow.types.is_integer(array.type)
+        or pyarrow.types.is_floating(array.type)
+        or pyarrow.types.is_boolean(array.type)
+        or pyarrow.types.is_null(array.type)
+        or pyarrow.types.is_string(array.type)
+    ):
+        return pyarrow.array([None if value is None else str(value) for value in array.to_pylist()])
+    return array.cast(type_)
+
+
+def format_timestamp(seconds: float) -> str:
+    """Returns the seconds since the epoch as an UTC datetime string with microseconds"""
+    return (EPOCH + timedelta(seconds=seconds)).isoformat(sep=" ", timespec="microseconds")
+
+
+SINKS = {
+    ".csv": CSVSink,
+    ".jsonl": JSONLinesSink,
+    ".ndjson": JSONLinesSink,
+    ".parquet": ParquetSink,
+    ".arrow": ArrowSink,
+    ".feather": ArrowSink,
+}
+
+
+def create_sink(file: str | Path, **params) -> Sink:
+    """Returns a new Sink for the file based on its extension
+
+    Args:
+        file (str | Path): The file to write to. For example `loadwright.csv`
+
+    Returns:
+        Sink: A new Sink
+    """
+    extension = Path(file).suffix.lower()
+    if extension not in SINKS:
+        raise ValueError(f"No sink found for the extension '{extension}'. Use one of {list(SINKS)}")
+    return SINKS[extension](**params)
@@ -0,0 +1,110 @@
+"""Tracing of the round trips of the Bokeh websocket messages of a Playwright page"""
+from __future__ import annotations
+
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+import param
+from playwright.async_api import Page
+
+from .events import PUSH_EVENT, TRACE_EVENT
+from .protocol import AssembledMessage, MessageAssembler
+
+
+class _Pending:  # pylint: disable=too-few-public-methods
+    """A sent message waiting for the reply of the server"""
+
+    def __init__(self, start: float, message: AssembledMessage):
+        self.start = start
+        self.msgtype = message.msgtype
+        self.sent_bytes = message.size
+        self.patches = 0
+        self.patch_bytes = 0
+        self.max_patch_bytes = 0
+
+
+class WebSocketTracer(param.Parameterized):
+    """Logs the server round trip of every Bokeh websocket message sent by a page
+
+    A round trip starts when the browser sends a message, for example the PATCH-DOC of a
+    button click, and stops when the server answers it, for example with an OK or ERROR. The
+    server answers once the synchronous callbacks have run, so the `duration` of a round trip
+    excludes the async callbacks and the tasks they schedule. Their PATCH-DOC messages usually
+    arrive after the answer and are then logged as `websocket_push` events. The PATCH-DOC
+    messages received before the answer are counted as its replies. Each round trip is
+    logged as a `websocket` event with the `msgtype`, `sent_bytes`, `received_bytes`,
+    `patches` and `max_patch_bytes` columns. Patches pushed by the server without a request,
+    for example by periodic callbacks, are logged as `websocket_push` events.
+
+    Use it as
+
+    ```python
+    WebSocketTracer(log=logger.log, user="0").attach(page)
+    ```
+    """
+
+    log = param.Callable(doc="Logs an event with a known start and stop, like `Logger.log`")
+    user: str = param.String("0", doc="The name of the user the events are logged for")
+
+    def attach(self, page: Page):
+        """Traces the Bokeh websockets opened by the page from now on"""
+        page.on("websocket", self.trace)
+
+    def trace(self, websocket):
+        """Traces a Playwright WebSocket if it is a Bokeh websocket"""
+        if not urlsplit(websocket.url).path.endswith("/ws"):
+            return
+        sent = MessageAssembler()
+        received = MessageAssembler()
+        pending: Dict[str, _Pending] = {}
+
+        def on_sent(frame):
+            message = sent.add(frame)
+            msgid = message.header.get("msgid", None) if message else None
+            if msgid is not None:
+                pending[msgid] = _Pending(time.time(), message)
+
+        def on_received(frame):
+            message = received.add(frame)
+            if message is not None:
+                self._receive(message, pending)
+
+        websocket.on("framesent", on_sent)
+        websocket.on("framereceived", on_received)
+
+    def _receive(self, message: AssembledMessage, pending: Dict[str, _Pending]):
+        now = time.time()
+        reqid = message.header.get("reqid", None)
+        if message.msgtype == "PATCH-DOC" and reqid is None:
+            if not pending:
+                self.log(
+                    PUSH_EVENT,
+                    self.user,
+                    now,
+                    now,
+                    msgtype=message.msgtype,
+                    sent_bytes=0,
+                    received_bytes=message.size,
+                    patches=1,
+                    max_patch_bytes=message.size,
+                )
+            for request in pending.values():
+                request.patches += 1
+                request.patch_bytes += message.size
+                request.max_patch_bytes = max(request.max_patch_bytes, message.size)
+            return
+
+        request = pending.pop(reqid, None)
+        if request is not None:
+            self.log(
+                TRACE_EVENT,
+                self.user,
+                request.start,
+                now,
+                msgtype=request.msgtype,
+                sent_bytes=request.sent_bytes,
+                received_bytes=request.patch_bytes + message.size,
+                patches=request.patches,
+                max_patch_bytes=request.max_patch_bytes,
+            )
@@ -2,11 +2,14 @@
 from __future__ import annotations
 
 import asyncio
-from typing import Callable
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable
 
 import param
 from playwright.async_api import Page
 
+from .metrics import MetricsCollector
+
 DEFAULT_SLEEP_TIME = 0.5
 
 
@@ -16,6 +19,9 @@ class User(param.Parameterized):
     Override the `run` method to implement custom user interactions
     """
 
+    # Whether or not the LoadTestRunner should give the user a Playwright page
+    requires_page = True
+
     page: Page = param.ClassSelector(
         class_=Page, constant=True, doc="A Playwright page to interact with"
     )
@@ -26,6 +32,11 @@ class User(param.Parameterized):
     )
 
     endpoint: str = param.String("/")
+    metrics: MetricsCollector = param.ClassSelector(
+        class_=MetricsCollector,
+        doc="""If provided, the events measured via `measure` are logged with browser side
+        performance metrics""",
+    )
 
     @property
     def url(self):
@@ -36,12 +47,39 @@ class User(param.Parameterized):
         """Sleep for a duration of sleep_time"""
         await asyncio.sleep(self.sleep_time)
 
+    @asynccontextmanager
+    async def measure(self, name: str) -> AsyncIterator:
+        """Logs an event and, if a MetricsCollector is provided, its browser side metrics
+
+        The metrics are collected outside of the measured duration. Use it as
+
+        ```python
+        async with self.measure("interact"):
+            await self.page.get_by_role("button", name="Run").click()
+        ```
+
+        Args:
+            name (str): The name of the event
+        """
+        if self.metrics is None or self.page is None:
+            with self.event(name=name, user=self.name) as record:
+                yield record
+            return
+
+        before = await self.metrics.snapshot(self.page)
+        with self.event(name=name, user=self.name) as record:
+            yield record
+            if record is not None:
+                record.stop()
+                after = await self.metrics.snapshot(self.page)
+                record.update(**self.metrics.diff(before, after))
+
     async def run(self):
         """Override the `run` method to implement custom user interactions.
 
         The default is to go to self.url
         """
-        with self.event(name="load", user=self.name):
+        async with self.measure("load"):
             await self.page.goto(self.url)
         await self.sleep()
 
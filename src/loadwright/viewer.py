@@ -2,16 +2,48 @@
 from __future__ import annotations
 
 from pathlib import Path
+from typing import Any, Callable, Dict, Hashable
 
 import holoviews as hv
 import hvplot.pandas  # pylint: disable=unused-import
+import numpy as np
 import pandas as pd
 import panel as pn
 import param
 from bokeh.models import HoverTool
 
+from loadwright import analysis, quantiles
+from loadwright.compare import compare_runs
+from loadwright.events import SAMPLE_EVENTS
 from loadwright.io import read_loadwright_file
-from loadwright.logger import DEFAULT_LOADWRIGHT_FILE
+from loadwright.logger import DEFAULT_LOADWRIGHT_FILE, Logger
+from loadwright.monitor import GENERATOR_COLUMNS, GENERATOR_EVENT
+from loadwright.resources import RESOURCE_COLUMNS, RESOURCE_EVENT
+from loadwright.runner import LoadTestRunner
+
+LIVE_COLUMNS = ["event", "user", "start_seconds", "stop_seconds", "duration", "color"]
+EVENT_COLORS = {
+    "load": "#0072B5",
+    "interact": "#DF9F1F",
+    "websocket": "#7F7F7F",
+    "websocket_push": "#BCBD22",
+}
+MAX_YTICKS = 20
+COMPARISON_PERCENTILE = 0.95
+AGGREGATIONS = {"Median": "p50"}
+SLA_COLORS = {"green": "green", "red": "red"}
+
+
+def import_datashader():
+    """Returns the datashader module. Raises an ImportError with a helpful message if missing"""
+    try:
+        import datashader  # pylint: disable=import-outside-toplevel
+    except ImportError as ex:
+        raise ImportError(
+            "Rasterizing large runs requires datashader. Install it via "
+            "'pip install loadwright[datashader]'"
+        ) from ex
+    return datashader
 
 
 class LoadTestViewer(pn.viewable.Viewer):
@@ -23,46 +55,286 @@ class LoadTestViewer(pn.viewable.Viewer):
     max_interaction_duration = param.Number(
         1.0, bounds=(0.1, 5.0), step=0.1, doc="The maxium allowable time for the interaction event"
     )
-    aggregation = param.Selector(objects=["None", "Median", "Mean", "Min", "Max"])
+    aggregation = param.Selector(
+        objects=["None", "Median", "Mean", "Min", "Max", "P90", "P95", "P99"],
+        doc="The aggregation of the durations of all previous events of the same type",
+    )
+    window = param.Number(
+        None,
+        bounds=(0, None),
+        doc="""If provided the aggregation is over the events started during the last window
+        seconds instead of all previous events""",
+    )
     data = param.DataFrame()
+    baseline = param.DataFrame(
+        None, doc="If provided the data is compared side by side to this baseline run"
+    )
+
+    logger = param.ClassSelector(
+        class_=Logger,
+        doc="""If provided the viewer streams the events logged by a running test instead of
+        showing static data""",
+    )
+    runner = param.ClassSelector(
+        class_=LoadTestRunner, doc="If provided the running test can be aborted from the viewer"
+    )
+    refresh_rate = param.Integer(
+        1000, bounds=(100, None), doc="The time in milliseconds between live updates"
+    )
+    resample = param.Number(
+        None,
+        bounds=(0, None),
+        inclusive_bounds=(False, True),
+        doc="""If provided the active users and concurrency are shown on a regular grid of
+        this many seconds. Defaults to every start and stop time""",
+    )
+    large_data = param.Selector(
+        default="auto",
+        objects=["auto", "rasterize", "decimate", "off"],
+        doc="""How to render the segment and duration plots of large runs. 'rasterize' aggregates
+        the events to images on the server with datashader. 'decimate' shows a sample of
+        max_samples events with hover. 'auto' rasterizes, or decimates if datashader is not
+        installed, above large_data_threshold events""",
+    )
+    large_data_threshold = param.Integer(
+        50_000, bounds=(0, None), doc="The number of events above which 'auto' kicks in"
+    )
+    max_samples = param.Integer(
+        5_000, bounds=(1, None), doc="The maximum number of events shown when decimating"
+    )
+    max_rows = param.Integer(
+        10_000,
+        bounds=(1, None),
+        doc="""The maximum number of events kept by the live plots. The active users are kept as
+        one span per user""",
+    )
 
-    def __init__(self, data: str | Path | pd.DataFrame | None = None, **params):
-        if data is None:
+    def __init__(
+        self,
+        data: str | Path | pd.DataFrame | None = None,
+        runner: LoadTestRunner | None = None,
+        baseline: str | Path | pd.DataFrame | None = None,
+        **params,
+    ):
+        if runner is not None:
+            params["logger"] = params.get("logger", runner.logger)
+        if params.get("logger", None) is not None:
+            data = params["logger"].data
+        elif data is None:
             data = DEFAULT_LOADWRIGHT_FILE
         if isinstance(data, (str, Path)):
             data = read_loadwright_file(data)
-        super().__init__(data=data, **params)
+        if isinstance(baseline, (str, Path)):
+            baseline = read_loadwright_file(baseline)
+        super().__init__(data=data, runner=runner, baseline=baseline, **params)
 
-        self._view = pn.Column(
-            pn.Param(self, parameters=["max_load_duration", "max_interaction_duration"]),
-            self.segment_plot,
-            pn.widgets.RadioButtonGroup.from_param(self.param.aggregation),
-            self.duration_plot,
-            self.active_users_plot,
-        )
+        self._position = 0
+        self._callback = None
+        self._cache: Dict[Hashable, Any] = {}
+        self._cache_data: pd.DataFrame | None = None
+        if self.logger is None:
+            self._view = pn.Column(
+                pn.Param(self, parameters=["max_load_duration", "max_interaction_duration"]),
+                self.segment_plot,
+                pn.widgets.RadioButtonGroup.from_param(self.param.aggregation),
+                pn.widgets.FloatInput.from_param(self.param.window),
+                self.duration_plot,
+                self.summary_table,
+                self.comparison_plot,
+                self.comparison_table,
+                self.active_users_plot,
+                self.resources_plot,
+                self.concurrency_plot,
+            )
+        else:
+            self._view = self._create_live_view()
 
     def __panel__(self):
+        if self.logger is not None and self._callback is None:
+            self._callback = pn.state.add_periodic_callback(self.update, period=self.refresh_rate)
         return self._view
 
-    @pn.depends("max_load_duration", "max_interaction_duration", "data")
+    def _create_live_view(self) -> pn.Column:
+        """Returns a view of DynamicMaps appending the new events via bounded Buffer streams"""
+        self._events = hv.streams.Buffer(
+            pd.DataFrame({column: [] for column in LIVE_COLUMNS}),
+            length=self.max_rows,
+            index=False,
+        )
+        # A user is active from its first start to its last stop. The curve is recomputed at
+        # each update from the span of each user seen so far, at the starts and stops of spans
+        self._user_spans = pd.DataFrame(
+            {"user": pd.Series(dtype=str), "start_seconds": [], "stop_seconds": []}
+        )
+        self._active_users = hv.streams.Pipe(analysis.active_users(self._user_spans))
+        segments = hv.DynamicMap(self._live_segments, streams=[self._events])
+        durations = hv.DynamicMap(self._live_durations, streams=[self._events])
+        active_users = hv.DynamicMap(self._live_active_users, streams=[self._active_users])
+        controls = [
+            pn.Param(self, parameters=["max_load_duration", "max_interaction_duration"]),
+            pn.widgets.IntInput.from_param(self.param.refresh_rate),
+        ]
+        if self.runner is not None:
+            abort = pn.widgets.Button(name="Abort test", button_type="danger")
+            abort.on_click(lambda _: self.runner.stop())
+            controls.append(abort)
+        return pn.Column(
+            *controls,
+            segments.opts(responsive=True, height=400),
+            durations.opts(responsive=True, height=400),
+            active_users.opts(responsive=True, height=300),
+        )
+
+    @param.depends("refresh_rate", watch=True)
+    def _update_refresh_rate(self):
+        if self._callback is not None:
+            self._callback.period = self.refresh_rate
+
+    def update(self):
+        """Appends the events logged since the last update to the live plots"""
+        if self.logger is None:
+            return
+        data = self.logger.tail(self._position)
+        if data.empty:
+            return
+        # The position of the next event. Events spilled by the logger are skipped
+        self._position = data.index[-1] + 1
+        data = data[["event", "user", "start_seconds", "stop_seconds", "duration"]].astype(
+            {"event": str, "user": str}
+        )
+        data["color"] = self._colors(data)
+        self._events.send(data.reset_index(drop=True))
+        events = analysis.user_events(data)[["user", "start_seconds", "stop_seconds"]]
+        if not events.empty:
+            self._user_spans = (
+                pd.concat([self._user_spans, events])
+                .groupby("user", as_index=False)
+                .agg(start_seconds=("start_seconds", "min"), stop_seconds=("stop_seconds", "max"))
+            )
+            self._active_users.send(analysis.active_users(self._user_spans))
+
+    @staticmethod
+    def _live_segments(data: pd.DataFrame):
+        return hv.Segments(
+            data,
+            [
+                hv.Dimension("start_seconds", label="Time in seconds"),
+                hv.Dimension("user", label="User"),
+                "stop_seconds",
+                "user",
+            ],
+            ["event", "duration", "color"],
+        ).opts(color="color", line_width=20, tools=["hover"])
+
+    @staticmethod
+    def _live_durations(data: pd.DataFrame):
+        return hv.Points(
+            data,
+            [
+                hv.Dimension("start_seconds", label="Time in seconds"),
+                hv.Dimension("duration", label="Duration in seconds"),
+            ],
+            ["event", "user", "color"],
+        ).opts(color="color", size=6, tools=["hover"])
+
+    @staticmethod
+    def _live_active_users(data: pd.DataFrame):
+        return hv.Curve(
+            data,
+            hv.Dimension(analysis.TIME_COLUMN, label="Time in seconds"),
+            hv.Dimension("active_users", label="Active users"),
+        ).opts(color=EVENT_COLORS["load"])
+
+    def _large_data_mode(self) -> str:
+        """Returns "off", "rasterize" or "decimate" given the large_data setting and the size of
+        the data"""
+        if self.large_data == "off":
+            return "off"
+        if self.large_data == "auto":
+            if len(self._traced_event_data) <= self.large_data_threshold:
+                return "off"
+            try:
+                import_datashader()
+            except ImportError:
+                return "decimate"
+            return "rasterize"
+        return self.large_data
+
+    def _cached(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Returns the value of compute() computed once per `data`
+
+        The cache is keyed on the identity of the data. Replace the data, don't mutate it.
+        """
+        if self._cache_data is not self.data:
+            self._cache = {}
+            self._cache_data = self.data
+        if key not in self._cache:
+            self._cache[key] = compute()
+        return self._cache[key]
+
+    @property
+    def _event_data(self) -> pd.DataFrame:
+        """Returns the events of the users, i.e. the data without the resource and generator
+        samples and the websocket traces"""
+        return self._cached("events", lambda: analysis.user_events(self.data))
+
+    @property
+    def _traced_event_data(self) -> pd.DataFrame:
+        """Returns the events of the users and the websocket traces"""
+        return self._cached(
+            "traced_events",
+            lambda: self.data[~self.data["event"].isin(SAMPLE_EVENTS)],
+        )
+
+    def _colors(self, data: pd.DataFrame) -> pd.Series:
+        slow = ((data["event"] == "load") & (data["duration"] >= self.max_load_duration)) | (
+            (data["event"] == "interact") & (data["duration"] >= self.max_interaction_duration)
+        )
+        return pd.Series(np.where(slow, "red", "green"), index=data.index)
+
+    def _segment_frame(self) -> pd.DataFrame:
+        """Returns the events sorted by the first start of their user and then their start"""
+
+        def compute():
+            data: pd.DataFrame = self._event_data[
+                ["user", "event", "start_seconds", "stop_seconds", "duration"]
+            ].copy()
+            # sort indirectly by user, start_seconds
+            min_start_by_user = data.groupby("user")["start_seconds"].min()
+            data = data.join(min_start_by_user, on="user", rsuffix="_min")
+            return data.sort_values(by=["start_seconds_min", "start_seconds"])
+
+        return self._cached("segments", compute)
+
+    def _duration_frame(self) -> pd.DataFrame:
+        """Returns the events and the websocket traces sorted by start with their event color"""
+
+        def compute():
+            data = self._traced_event_data.sort_values("start_seconds", kind="stable")
+            data["color"] = data["event"].map(EVENT_COLORS)
+            return data
+
+        return self._cached("durations", compute)
+
+    @pn.depends(
+        "max_load_duration",
+        "max_interaction_duration",
+        "data",
+        "large_data",
+        "large_data_threshold",
+        "max_samples",
+    )
     def segment_plot(self):
         """Returns a HoloViews segment plot"""
-        data: pd.DataFrame = self.data[
-            ["user", "event", "start_seconds", "stop_seconds", "duration"]
-        ].copy()
-        # sort indirectly by user, start_seconds
-        min_start_by_user = data.groupby("user")["start_seconds"].min()
-        data = data.join(min_start_by_user, on="user", rsuffix="_min")
-        data = data.sort_values(by=["start_seconds_min", "start_seconds"])
-
-        data["color"] = "green"
-        data.loc[
-            (data["event"] == "load") & (data["duration"] >= self.max_load_duration), "color"
-        ] = "red"
-        data.loc[
-            (data["event"] == "interact") & (data["duration"] >= self.max_interaction_duration),
-            "color",
-        ] = "red"
+        data = self._segment_frame()
+        # Changing a threshold only recolors the cached frame
+        data["color"] = self._colors(data)
+
+        mode = self._large_data_mode()
+        if mode == "rasterize":
+            return self._rasterized_segments(data)
+        if mode == "decimate" and len(data) > self.max_samples:
+            data = data.sample(self.max_samples, random_state=0).sort_index()
         plot = hv.Segments(
             data,
             [
@@ -84,68 +356,173 @@ class LoadTestViewer(pn.viewable.Viewer):
         plot.opts(color="color", line_width=20, tools=[hover], xlim=self._xlim)
         return plot
 
-    @pn.depends("max_load_duration", "max_interaction_duration", "aggregation", "data")
+    def _rasterized_segments(self, data: pd.DataFrame):
+        """Returns the segments aggregated to an image on the server, colored by SLA"""
+        datashader = import_datashader()
+        data = data.assign(
+            user_index=pd.factorize(data["user"])[0],
+            color=pd.Categorical(data["color"], categories=list(SLA_COLORS)),
+        )
+        plot = hv.Segments(
+            data,
+            [
+                hv.Dimension("start_seconds", label="Time in seconds"),
+                hv.Dimension("user_index", label="User"),
+                "stop_seconds",
+                "user_index",
+            ],
+            ["color"],
+        )
+        plot = hv.operation.datashader.datashade(
+            plot,
+            aggregator=datashader.count_cat("color"),
+            color_key=SLA_COLORS,
+            dynamic=True,
+        )
+        plot = hv.operation.datashader.dynspread(plot, max_px=10)
+        return plot.opts(xlim=self._xlim, responsive=True, height=400)  # pylint: disable=no-member
+
+    @pn.depends(
+        "max_load_duration",
+        "max_interaction_duration",
+        "aggregation",
+        "window",
+        "data",
+        "large_data",
+        "large_data_threshold",
+        "max_samples",
+    )
     def duration_plot(self):
         """Returns a HoloViews plot of time vs event duration"""
-        data = self.data.copy()
-        data = data.sort_values("start_seconds")
-        tmp = data.groupby(["event"]).expanding().duration
-        if self.aggregation == "Median":
-            data["value"] = tmp.median().reset_index().set_index("level_1")["duration"]
-        elif self.aggregation == "Mean":
-            data["value"] = tmp.mean().reset_index().set_index("level_1")["duration"]
-        elif self.aggregation == "Min":
-            data["value"] = tmp.min().reset_index().set_index("level_1")["duration"]
-        elif self.aggregation == "Max":
-            data["value"] = tmp.max().reset_index().set_index("level_1")["duration"]
-        else:
-            data["value"] = data.duration
-        data["color"] = data["event"].map({"load": "#0072B5", "interact": "#DF9F1F"})
-        data = data.sort_values("start_seconds")
+        data = self._duration_frame()
+        data["value"] = self._cached(("value", self.aggregation, self.window), self._values)
 
-        plot = data.hvplot(
-            x="start_seconds",
-            y="value",
-            by="event",
-            xlabel="Time in seconds",
-            ylabel="Duration in seconds",
-            hover=False,
-            color="color",
-            ylim=(0, None),
-            xlim=self._xlim,
-            height=400,
-        ).opts(legend_position="bottom") * data.hvplot(
-            x="start_seconds",
-            y="value",
-            by="event",
-            xlabel="Time in seconds",
-            ylabel="Duration in seconds",
-            kind="scatter",
-            hover=True,
-            color="color",
-        )
+        mode = self._large_data_mode()
+        if mode == "off":
+            plot = data.hvplot(
+                x="start_seconds",
+                y="value",
+                by="event",
+                xlabel="Time in seconds",
+                ylabel="Duration in seconds",
+                hover=False,
+                color="color",
+                ylim=(0, None),
+                xlim=self._xlim,
+                height=400,
+            ).opts(legend_position="bottom") * data.hvplot(
+                x="start_seconds",
+                y="value",
+                by="event",
+                xlabel="Time in seconds",
+                ylabel="Duration in seconds",
+                kind="scatter",
+                hover=True,
+                color="color",
+            )
+        else:
+            plot = self._large_duration_plot(data, mode)
 
         plot = plot * hv.HLine(self.max_load_duration).opts(color="red", line_width=1)
         plot = plot * hv.HLine(self.max_interaction_duration).opts(color="red", line_width=1)
         return plot
 
+    def _values(self):
+        data = self._duration_frame()
+        if self.aggregation == "None":
+            return data["duration"].to_numpy()
+        how = AGGREGATIONS.get(self.aggregation, self.aggregation.lower())
+        return quantiles.running_aggregate(data, how, window=self.window)
+
+    def _large_duration_plot(self, data: pd.DataFrame, mode: str):
+        """Returns the durations rasterized on the server or decimated to max_samples points.
+        Both are recomputed when zooming"""
+        data = data.assign(color=data["color"].fillna("#7F7F7F"))
+        points = hv.Points(
+            data,
+            [
+                hv.Dimension("start_seconds", label="Time in seconds"),
+                hv.Dimension("value", label="Duration in seconds"),
+            ],
+            ["event", "user", "duration", "color"],
+        )
+        if mode == "rasterize":
+            datashader = import_datashader()
+            events = data["event"].astype("category")
+            color_key = {
+                str(event): EVENT_COLORS.get(str(event), "#7F7F7F")
+                for event in events.cat.categories
+            }
+            points = points.clone(data.assign(event=events))
+            plot = hv.operation.datashader.datashade(
+                points,
+                aggregator=datashader.count_cat("event"),
+                color_key=color_key,
+                dynamic=True,
+            )
+            plot = hv.operation.datashader.dynspread(plot, max_px=4)
+            return plot.opts(  # pylint: disable=no-member
+                xlim=self._xlim, responsive=True, height=400
+            )
+        plot = hv.operation.decimate(points, max_samples=self.max_samples, dynamic=True)
+        return plot.opts(  # pylint: disable=no-member
+            color="color", tools=["hover"], xlim=self._xlim, responsive=True, height=400
+        )
+
+    @pn.depends("data")
+    def summary_table(self):
+        """Returns a table of the count, mean, min, p50, p90, p95, p99 and max duration per
+        event"""
+        table = self._cached("summary", lambda: quantiles.summary(self._event_data).round(3))
+        return pn.pane.DataFrame(table, sizing_mode="fixed")
+
+    def _comparison(self) -> pd.DataFrame:
+        return self._cached(
+            ("comparison", id(self.baseline)),
+            lambda: compare_runs(self.baseline, self.data, q=COMPARISON_PERCENTILE, seed=0),
+        )
+
+    @pn.depends("data", "baseline")
+    def comparison_table(self):
+        """Returns a table comparing the p95 durations per event to the baseline run, with the
+        bootstrap confidence interval of the difference"""
+        if self.baseline is None:
+            return pn.Column(sizing_mode="stretch_width")
+        return pn.pane.DataFrame(self._comparison().round(3), sizing_mode="fixed")
+
+    @pn.depends("data", "baseline")
+    def comparison_plot(self):
+        """Returns bars of the p95 durations per event of the baseline and the current run side
+        by side"""
+        if self.baseline is None:
+            return pn.Column(sizing_mode="stretch_width")
+        data = (
+            self._comparison()[["baseline", "current"]]
+            .rename_axis("event")
+            .reset_index()
+            .melt(id_vars="event", var_name="run", value_name="duration")
+        )
+        return hv.Bars(
+            data,
+            ["event", "run"],
+            hv.Dimension("duration", label=f"p{COMPARISON_PERCENTILE * 100:g} duration in seconds"),
+        ).opts(tools=["hover"], responsive=True, height=300)
+
     @property
     def _xlim(self):
-        return (self.data["start_seconds"].min(), self.data["stop_seconds"].max())
+        return self._cached(
+            "xlim", lambda: (self.data["start_seconds"].min(), self.data["stop_seconds"].max())
+        )
 
-    @pn.depends("data")
+    @pn.depends("data", "resample")
     def active_users_plot(self):
         """Returns a plot of time vs the number of active users"""
-        data = self.data.copy()
-        timestamps = sorted(set(data.start_seconds.unique()).union(set(data.stop_seconds.unique())))
-        user_start = data.groupby("user")["start_seconds"].min()
-        user_stop = data.groupby("user")["stop_seconds"].max()
-        results = []
-        for timestamp in timestamps:
-            active_users = sum((user_start <= timestamp) & (user_stop >= timestamp))
-            results.append({"start_seconds": timestamp, "active_users": active_users})
-        data = pd.DataFrame(results)
-        max_users = data["active_users"].max()
+        data = self._cached(
+            ("active_users", self.resample),
+            lambda: analysis.active_users(self._event_data, resample=self.resample),
+        )
+        max_users = int(data["active_users"].max()) if len(data) else 0
+        yticks = list(range(0, max_users + 1)) if max_users <= MAX_YTICKS else None
         return data.hvplot(
             x="start_seconds",
             y="active_users",
@@ -153,7 +530,7 @@ class LoadTestViewer(pn.viewable.Viewer):
             ylabel="Active users",
             color="#0072B5",
             hover=False,
-            yticks=list(range(0, max_users + 1)),
+            yticks=yticks,
         ) * data.hvplot(
             x="start_seconds",
             y="active_users",
@@ -162,5 +539,51 @@ class LoadTestViewer(pn.viewable.Viewer):
             color="#0072B5",
             kind="scatter",
             ylim=(0, None),
-            yticks=list(range(0, max_users + 1)),
+            yticks=yticks,
+        )
+
+    @pn.depends("data")
+    def resources_plot(self):
+        """Returns timelines of the resources used by the server and the load generator, aligned
+        with the other plots"""
+        curves = []
+        for event, labels, color in [
+            (RESOURCE_EVENT, RESOURCE_COLUMNS, "#0072B5"),
+            (GENERATOR_EVENT, GENERATOR_COLUMNS, "#E18727"),
+        ]:
+            data = self._cached(event, lambda event=event: self.data[self.data["event"] == event])
+            curves += [
+                hv.Curve(
+                    data,
+                    hv.Dimension("start_seconds", label="Time in seconds"),
+                    hv.Dimension(column, label=label),
+                ).opts(color=color, xlim=self._xlim, height=200, responsive=True)
+                for column, label in labels.items()
+                if column in data.columns and data[column].notna().any()
+            ]
+        if not curves:
+            return pn.Column(sizing_mode="stretch_width")
+        return hv.Layout(curves).cols(1)
+
+    @pn.depends("data", "resample")
+    def concurrency_plot(self):
+        """Returns a plot of time vs the number of events of each type in flight"""
+        data = self._cached(
+            ("concurrency", self.resample),
+            lambda: analysis.concurrency(
+                self._traced_event_data, by="event", resample=self.resample
+            ),
+        )
+        events = [column for column in data.columns if column != "start_seconds"]
+        return data.hvplot.step(
+            x="start_seconds",
+            y=events,
+            where="post",
+            xlabel="Time in seconds",
+            ylabel="Events in flight",
+            color=[EVENT_COLORS.get(event, "#7F7F7F") for event in events],
+            ylim=(0, None),
+            xlim=self._xlim,
+            height=300,
+            legend="bottom",
         )
@@ -0,0 +1,2 @@
+"""Benchmarks of the overhead of Loadwright itself. Run them via
+`pytest tests/benchmarks --benchmarks`"""
@@ -0,0 +1,47 @@
+"""Synthetic results in the schema of tests/loadwright_fixture.csv"""
+import numpy as np
+import pandas as pd
+
+
+def synthetic_results(rows: int, users: int = 100, seed: int = 0) -> pd.DataFrame:
+    """Returns the results of a run with the given number of events
+
+    Every user loads the page once and then interacts with it. The users start 0.5 seconds
+    apart and wait 0.5 seconds between events.
+    """
+    generator = np.random.default_rng(seed)
+    user = np.arange(rows) % users
+    index = np.arange(rows) // users
+    durations = np.where(
+        index == 0, generator.lognormal(0.5, 0.3, rows), generator.lognormal(-0.7, 0.5, rows)
+    )
+    # The events of a user are sequential
+    step = np.maximum(durations, 3.0) + 0.5
+    start_seconds = user * 0.5 + index * step.mean()
+    return results_frame(
+        event=pd.Categorical(np.where(index == 0, "load", "interact")),
+        user=user.astype(str),
+        start_seconds=start_seconds,
+        durations=durations,
+    )
+
+
+def results_frame(
+    event, user, start_seconds: np.ndarray, durations: np.ndarray, start="2023-01-01 12:00:00"
+) -> pd.DataFrame:
+    """Returns results with the given events, users, start times and durations in seconds
+
+    The `start` is the time the start_seconds are relative to.
+    """
+    origin = pd.Timestamp(start)
+    return pd.DataFrame(
+        {
+            "event": event,
+            "user": user,
+            "start": origin + pd.to_timedelta(start_seconds, unit="s"),
+            "stop": origin + pd.to_timedelta(start_seconds + durations, unit="s"),
+            "start_seconds": start_seconds,
+            "stop_seconds": start_seconds + durations,
+            "duration": durations,
+        }
+    )
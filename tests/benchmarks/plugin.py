@@ -0,0 +1,107 @@
+"""A small pytest plugin benchmarking the time and peak memory of the hot paths
+
+The benchmarks are skipped unless pytest is run with `--benchmarks`. For example
+
+```bash
+pytest tests/benchmarks --benchmarks --benchmarks-max-rows=1e6
+```
+
+The results are printed at the end of the session and saved to
+test_results/benchmarks.json.
+"""
+from __future__ import annotations
+
+import gc
+import json
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pytest
+
+ROWS = [1_000, 10_000, 100_000, 1_000_000, 10_000_000]
+RESULTS_FILE = Path("test_results") / "benchmarks.json"
+RESULTS: List[Dict] = []
+
+
+def pytest_addoption(parser):
+    """Adds the options of the benchmarks"""
+    group = parser.getgroup("benchmark", "Benchmarks of Loadwright")
+    group.addoption("--benchmarks", action="store_true", help="Run the benchmarks")
+    group.addoption(
+        "--benchmarks-max-rows",
+        type=float,
+        default=1e5,
+        help="The maximum number of rows of the synthetic results. Defaults to 1e5",
+    )
+    group.addoption(
+        "--benchmarks-repeat",
+        type=int,
+        default=3,
+        help="The number of times to repeat each benchmark. The best time is reported",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skips the benchmarks unless --benchmarks is given and the sizes above the maximum"""
+    max_rows = config.getoption("benchmarks_max_rows")
+    run = config.getoption("benchmarks")
+    for item in items:
+        if "tests/benchmarks/" not in item.nodeid:
+            continue
+        if not run:
+            item.add_marker(pytest.mark.skip(reason="Run the benchmarks via --benchmarks"))
+        elif getattr(item, "callspec", None) and item.callspec.params.get("rows", 0) > max_rows:
+            item.add_marker(pytest.mark.skip(reason="More rows than --benchmarks-max-rows"))
+
+
+def pytest_terminal_summary(terminalreporter):
+    """Reports the results and saves them to test_results/benchmarks.json"""
+    if not RESULTS:
+        return
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(
+        f"{'benchmark':<45} {'rows':>10} {'seconds':>10} {'us/item':>10} {'peak MB':>10}"
+    )
+    for result in RESULTS:
+        per_row = result["seconds"] / result["rows"] * 1e6 if result["rows"] else float("nan")
+        terminalreporter.write_line(
+            f"{result['name']:<45} {result['rows']:>10} {result['seconds']:>10.4f} "
+            f"{per_row:>10.3f} {result['peak_mb']:>10.1f}"
+        )
+    RESULTS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    RESULTS_FILE.write_text(json.dumps(RESULTS, indent=2), encoding="utf8")
+
+
+@pytest.fixture
+def measure(request):
+    """Returns a function measuring the best time of `--benchmarks-repeat` calls of a function
+    and its peak memory allocated in Python, including NumPy and Pandas, via tracemalloc
+
+    The optional `setup` function is called before every call and is not measured. Its return
+    value is given to the function.
+    """
+    repeat = request.config.getoption("benchmarks_repeat")
+
+    def _measure(name: str, rows: int, function: Callable, setup: Callable | None = None):
+        seconds = float("inf")
+        for _ in range(repeat):
+            argument = setup() if setup else None
+            gc.collect()
+            start = time.perf_counter()
+            function(argument) if setup else function()  # pylint: disable=expression-not-assigned
+            seconds = min(seconds, time.perf_counter() - start)
+
+        argument = setup() if setup else None
+        gc.collect()
+        tracemalloc.start()
+        try:
+            function(argument) if setup else function()  # pylint: disable=expression-not-assigned
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        RESULTS.append({"name": name, "rows": rows, "seconds": seconds, "peak_mb": peak / 1e6})
+        return seconds
+
+    return _measure
@@ -0,0 +1,28 @@
+"""Benchmarks of reading Loadwright files"""
+import pytest
+
+from loadwright.io import read_loadwright_file, write_loadwright_file
+
+from .data import synthetic_results
+from .plugin import ROWS
+
+
+@pytest.mark.parametrize("extension", ["csv", "jsonl", "parquet", "arrow"])
+@pytest.mark.parametrize("rows", ROWS)
+def test_read(measure, rows, extension, tmp_path):
+    """Reading a file with all columns"""
+    file = tmp_path / f"loadwright.{extension}"
+    write_loadwright_file(synthetic_results(rows), file)
+    measure(f"read_loadwright_file ({extension})", rows, lambda: read_loadwright_file(file))
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_read_filtered(measure, rows, tmp_path):
+    """Reading the durations of the first minute of a Parquet file"""
+    file = tmp_path / "loadwright.parquet"
+    write_loadwright_file(synthetic_results(rows), file)
+    measure(
+        "read_loadwright_file (parquet, filtered)",
+        rows,
+        lambda: read_loadwright_file(file, columns=["duration"], time_window=(0, 60)),
+    )
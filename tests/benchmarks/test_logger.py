@@ -0,0 +1,48 @@
+"""Benchmarks of logging, saving and archiving the results"""
+import time
+
+import pytest
+
+from loadwright.logger import Logger
+
+from .data import synthetic_results
+from .plugin import ROWS
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_event(measure, rows, tmp_path):
+    """Logging events via Logger.event while streaming them to the file"""
+
+    def log(logger: Logger):
+        for index in range(rows):
+            with logger.event("interact", str(index % 100)):
+                pass
+        logger.close()
+
+    measure("Logger.event", rows, log, setup=lambda: Logger(path=str(tmp_path), auto_archive=False))
+
+
+def _logger(path, rows: int) -> Logger:
+    logger = Logger(path=str(path), auto_save=False, auto_archive=False)
+    logger.reset(origin=time.time())
+    logger.extend(synthetic_results(rows))
+    return logger
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_save(measure, rows, tmp_path):
+    """Saving the results of a run that was not streamed"""
+    measure(
+        "Logger.save", rows, lambda logger: logger.save(), setup=lambda: _logger(tmp_path, rows)
+    )
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_archive(measure, rows, tmp_path):
+    """Archiving the results, including recording them in the catalog"""
+    measure(
+        "Logger.archive",
+        rows,
+        lambda logger: logger.archive(),
+        setup=lambda: _logger(tmp_path, rows),
+    )
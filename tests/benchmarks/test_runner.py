@@ -0,0 +1,58 @@
+"""Benchmarks of the overhead per user of the LoadTestRunner"""
+import asyncio
+import time
+
+import panel as pn
+import pytest
+
+from loadwright import LoadTestRunner, User
+from loadwright.logger import Logger
+
+from ..app import App
+from ..test_protocol import ProtocolLoadAndClickUser
+
+
+class NoopUser(User):
+    """A user logging one event without doing anything"""
+
+    requires_page = False
+
+    async def run(self):
+        with self.event(name="load", user=self.name):
+            pass
+
+
+def _run(runner: LoadTestRunner):
+    asyncio.run(runner.run())
+
+
+@pytest.mark.parametrize("users", [100, 1_000, 10_000])
+def test_overhead(measure, users):
+    """Running users that do nothing, i.e. the overhead of the runner itself. The overhead per
+    user is the us/item of the benchmarks summary"""
+    runner = LoadTestRunner(
+        user=NoopUser(sleep_time=0),
+        n_users=users,
+        user_delay=0,
+        logger=Logger(auto_save=False, auto_archive=False),
+    )
+    measure("LoadTestRunner (no-op users)", users, lambda: _run(runner))
+
+
+@pytest.mark.parametrize("users", [10, 20])
+def test_protocol_users(measure, users, port=6020):
+    """Running protocol users loading tests/app.py. The app runs its callbacks one at a time,
+    so the users do not click"""
+    server = pn.serve(App, port=port, threaded=True, show=False)
+    time.sleep(1)
+    try:
+        runner = LoadTestRunner(
+            host=f"http://localhost:{port}",
+            user=ProtocolLoadAndClickUser(n_clicks=0, sleep_time=0),
+            n_users=users,
+            user_delay=0,
+            logger=Logger(auto_save=False, auto_archive=False),
+        )
+        measure("LoadTestRunner (protocol users)", users, lambda: _run(runner))
+    finally:
+        server.stop()
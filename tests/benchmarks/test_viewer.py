@@ -0,0 +1,53 @@
+"""Benchmarks of the plot methods of the LoadTestViewer"""
+import functools
+
+import pytest
+
+from loadwright import LoadTestViewer
+
+from .data import synthetic_results
+from .plugin import ROWS
+
+METHODS = [
+    "segment_plot",
+    "duration_plot",
+    "summary_table",
+    "active_users_plot",
+    "resources_plot",
+    "concurrency_plot",
+    "comparison_table",
+]
+
+
+@functools.lru_cache(maxsize=1)
+def _data(rows: int):
+    return synthetic_results(rows)
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("rows", ROWS)
+def test_plot(measure, rows, method):
+    """Calling a plot method of a new viewer, i.e. without cached frames"""
+    data = _data(rows)
+    measure(
+        f"LoadTestViewer.{method}",
+        rows,
+        lambda viewer: getattr(viewer, method)(),
+        setup=lambda: LoadTestViewer(data=data, baseline=data),
+    )
+
+
+@pytest.mark.parametrize("rows", ROWS)
+def test_aggregation(measure, rows):
+    """Changing the aggregation of the durations to a running p95"""
+
+    def setup():
+        viewer = LoadTestViewer(data=_data(rows))
+        viewer.duration_plot()
+        return viewer
+
+    def aggregate(viewer):
+        viewer.aggregation = "P95"
+        viewer.duration_plot()
+
+    measure("LoadTestViewer.aggregation", rows, aggregate, setup=setup)
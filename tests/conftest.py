@@ -3,6 +3,8 @@
 import panel as pn
 import pytest
 
+pytest_plugins = ["pytester", "loadwright.pytest_plugin", "tests.benchmarks.plugin"]
+
 PORT = [6000]
 
 
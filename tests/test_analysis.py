@@ -0,0 +1,81 @@
+"""We can analyse the results of a load test fast"""
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loadwright.analysis import active_users, concurrency, sweep, user_events
+from loadwright.events import INTERNAL_EVENTS
+
+from .test_io import FIXTURE
+
+
+def _active_users_loop(data: pd.DataFrame) -> list:
+    """The O(T*U) reference implementation"""
+    timestamps = sorted(set(data.start_seconds.unique()).union(set(data.stop_seconds.unique())))
+    user_start = data.groupby("user")["start_seconds"].min()
+    user_stop = data.groupby("user")["stop_seconds"].max()
+    return [int(sum((user_start <= t) & (user_stop >= t))) for t in timestamps]
+
+
+def _data(n_events: int = 1000, n_users: int = 50, seed: int = 1) -> pd.DataFrame:
+    generator = np.random.default_rng(seed)
+    start = np.round(generator.uniform(0, 100, n_events), 1)
+    duration = np.round(generator.exponential(1, n_events), 1)
+    return pd.DataFrame(
+        {
+            "event": generator.choice(["load", "interact"], n_events),
+            "user": generator.integers(0, n_users, n_events).astype(str),
+            "start_seconds": start,
+            "stop_seconds": start + duration,
+        }
+    )
+
+
+@pytest.mark.parametrize("data", [pd.read_csv(FIXTURE), _data()])
+def test_active_users(data):
+    """The sweep line gives the same result as comparing every time with every user"""
+    result = active_users(data)
+    assert result.active_users.tolist() == _active_users_loop(data)
+
+
+def test_sweep():
+    """We can count the intervals containing each time"""
+    times = np.array([0.0, 1.0, 2.0, 3.0])
+    assert sweep([0, 1], [2, 3], times).tolist() == [1, 2, 1, 0]
+    assert sweep([0, 1], [2, 3], times, inclusive=True).tolist() == [1, 2, 2, 1]
+
+
+def test_user_events():
+    """The resource and generator samples and the websocket traces are not user events"""
+    data = pd.DataFrame({"event": ["load", *INTERNAL_EVENTS, "interact"]})
+    assert user_events(data).event.tolist() == ["load", "interact"]
+
+
+def test_concurrency():
+    """We can count the events in flight per event type"""
+    data = pd.DataFrame(
+        {
+            "event": ["load", "load", "interact"],
+            "start_seconds": [0.0, 1.0, 2.0],
+            "stop_seconds": [2.0, 3.0, 4.0],
+        }
+    )
+    result = concurrency(data)
+    assert result.start_seconds.tolist() == [0.0, 1.0, 2.0, 3.0, 4.0]
+    assert result.load.tolist() == [1, 2, 1, 0, 0]
+    assert result.interact.tolist() == [0, 0, 1, 1, 0]
+
+    result = concurrency(data, resample=1.5)
+    assert result.start_seconds.tolist() == [0.0, 1.5, 3.0]
+    assert result.load.tolist() == [1, 2, 0]
+
+
+def test_active_users_large():
+    """We can compute the active users of large runs fast"""
+    data = _data(n_events=100_000, n_users=1_000)
+    start = time.perf_counter()
+    result = active_users(data, resample=0.5)
+    assert time.perf_counter() - start < 1
+    assert result.active_users.max() <= 1_000
@@ -0,0 +1,95 @@
+"""We can store events in a compact, columnar buffer"""
+import numpy as np
+
+from loadwright.buffer import COLUMNS, ResultBuffer
+
+
+def test_append_and_to_frame():
+    """We can append events and read them as a DataFrame"""
+    buffer = ResultBuffer(capacity=2)
+    for index in range(5):
+        buffer.append("load", str(index % 2), 100.0 + index, 101.5 + index)
+
+    data = buffer.to_frame(origin=99.0)
+    assert len(buffer) == 5
+    assert list(data.columns) == COLUMNS
+    assert data.start.dtype == "<M8[ns]"
+    assert data.user.dtype == object and data.event.dtype == object
+    assert list(data.user) == ["0", "1", "0", "1", "0"]
+    assert data.start_seconds.tolist() == [1.0, 2.0, 3.0, 4.0, 5.0]
+    np.testing.assert_allclose(data.duration, 1.5)
+
+
+def test_extra_columns():
+    """Extra columns are added on first use and filled with missing values"""
+    buffer = ResultBuffer()
+    buffer.append("load", "0", 0.0, 1.0)
+    buffer.append("load", "0", 1.0, 2.0, size=10)
+    buffer.append("load", "0", 2.0, 3.0, size="large", status="ok")
+
+    data = buffer.to_frame()
+    assert data["size"].tolist() == [None, 10, "large"]
+    assert data["status"].tolist() == [None, None, "ok"]
+
+
+def test_integer_columns():
+    """Integers are kept as int64. Missing values and floats widen the column to float64"""
+    buffer = ResultBuffer(capacity=2)
+    for index in range(3):
+        buffer.append("load", "0", float(index), index + 1.0, count=index, status=200)
+    buffer.append("load", "0", 3.0, 4.0, status=200.5)
+    buffer.append("load", "0", 4.0, 5.0, flag=True)
+
+    data = buffer.to_frame()
+    assert data["count"].dtype == "float64"
+    assert data["count"].tolist()[:3] == [0, 1, 2] and np.isnan(data["count"].iloc[4])
+    assert data["status"].tolist()[:4] == [200.0, 200.0, 200.0, 200.5]
+    assert data["flag"].tolist() == [None, None, None, None, True]
+
+    buffer.discard(3)
+    assert buffer.to_frame()["status"].tolist()[0] == 200.5
+    first = ResultBuffer()
+    first.append("load", "0", 0.0, 1.0, count=2**40)
+    assert first.to_frame()["count"].dtype == "int64"
+
+
+def test_clear():
+    """We can clear the buffer"""
+    buffer = ResultBuffer()
+    buffer.append("load", "0", 0.0, 1.0, size=1)
+    buffer.clear()
+
+    assert not buffer
+    assert list(buffer.to_frame().columns) == COLUMNS
+
+
+def test_discard():
+    """We can discard the oldest events. The positions keep counting from the first event"""
+    buffer = ResultBuffer(capacity=2)
+    for index in range(5):
+        buffer.append("load", str(index), float(index), index + 1.0, size=str(index))
+    buffer.discard(3)
+
+    data = buffer.to_frame(origin=0.0)
+    assert len(buffer) == 2
+    assert buffer.discarded == 3
+    assert data.index.tolist() == [3, 4]
+    assert data.user.tolist() == ["3", "4"]
+    assert data["size"].tolist() == ["3", "4"]
+    assert buffer.to_frame(since=1).index.tolist() == [3, 4]
+    assert buffer.to_frame(since=4).index.tolist() == [4]
+
+
+def test_discard_resets_the_freed_slots():
+    """The events appended after a discard do not inherit the values of discarded events"""
+    buffer = ResultBuffer(capacity=4)
+    buffer.append("load", "0", 0.0, 1.0, corrected_duration=5.0, count=1, status="ok")
+    buffer.append("load", "1", 1.0, 2.0, corrected_duration=6.0, count=2, status="ok")
+    buffer.discard(2)
+    buffer.append("interact", "0", 2.0, 3.0)
+    buffer.append("interact", "1", 3.0, 4.0, count=3)
+
+    data = buffer.to_frame()
+    assert data["corrected_duration"].isna().all()
+    assert np.isnan(data["count"].iloc[0]) and data["count"].iloc[1] == 3
+    assert data["status"].tolist() == [None, None]
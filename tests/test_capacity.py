@@ -0,0 +1,81 @@
+"""We can search the capacity of an app"""
+import asyncio
+
+import pytest
+
+from loadwright import CapacitySearch, LoadTestRunner
+
+from .app import App
+from .test_protocol import ProtocolLoadAndClickUser
+
+
+class FakeSearch(CapacitySearch):
+    """A search where the durations grow with the load and no test is run"""
+
+    async def trial(self, value):
+        durations = {"load": value / 10, "interact": value / 20}
+        return {
+            "value": value,
+            "passed": self.meets_sla(durations),
+            "generator_bound": False,
+            **durations,
+        }
+
+
+@pytest.mark.asyncio
+async def test_search():
+    """The search grows the load exponentially and then bisects"""
+    search = FakeSearch(runner=LoadTestRunner(), max_load_duration=2.5, max_interaction_duration=5)
+    curve = await search.run()
+
+    assert search.capacity == 25
+    assert search.breaking_point == 26
+    assert curve.n_users.tolist()[:6] == [1, 2, 4, 8, 16, 24]
+    assert curve.passed.tolist() == (curve.n_users <= 25).tolist()
+
+
+@pytest.mark.asyncio
+async def test_search_rate():
+    """We can search an arrival rate with a given resolution"""
+    search = FakeSearch(
+        runner=LoadTestRunner(),
+        mode="rate",
+        start=0.5,
+        resolution=0.5,
+        max_interaction_duration=0.6,
+    )
+    await search.run()
+
+    assert search.capacity <= 12 < search.breaking_point
+    assert search.breaking_point - search.capacity <= 0.5
+
+
+@pytest.mark.asyncio
+async def test_search_max_value():
+    """The search stops at max_value"""
+    search = FakeSearch(runner=LoadTestRunner(), max_value=10, max_load_duration=5)
+    curve = await search.run()
+
+    assert curve.n_users.tolist() == [1, 2, 4, 8, 10]
+    assert search.capacity == 10
+    assert search.breaking_point is None
+
+
+@pytest.mark.asyncio
+async def test_runner(port=6010):
+    """The trials are run by the LoadTestRunner"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        await asyncio.sleep(1)
+        runner = LoadTestRunner(
+            host=host, user=ProtocolLoadAndClickUser(n_clicks=1, sleep_time=0.1), user_delay=0.1
+        )
+        search = CapacitySearch(
+            runner=runner, max_value=2, max_load_duration=5, max_interaction_duration=5
+        )
+        curve = await search.run()
+
+    assert curve.n_users.tolist() == [1, 2]
+    assert curve.passed.all()
+    assert (curve.interact >= App.param.run_delay.default).all()
+    assert runner.n_users == 10
+    assert search.plot()
@@ -0,0 +1,86 @@
+"""We can index the archived runs in a catalog"""
+import time
+
+import pytest
+
+from loadwright.catalog import RunCatalog
+from loadwright.io import read_loadwright_file, write_loadwright_file
+from loadwright.logger import Logger
+
+from .test_compare import _run
+
+
+def test_record(tmp_path):
+    """We can record runs with their metadata and summary statistics"""
+    catalog = RunCatalog(file=str(tmp_path / "catalog.sqlite"))
+    first = catalog.record(
+        "first.csv", _run(1.0, 0.5, start="2023-01-01"), host="localhost", n_users=10, seed=1
+    )
+    catalog.record("second.csv", _run(2.0, 0.5, start="2023-01-02"), user="LoadUser")
+
+    runs = catalog.runs()
+    assert runs.file.tolist() == ["first.csv", "second.csv"]
+    assert runs.host.tolist() == ["localhost", None]
+    assert runs.n_users[0] == 10
+    assert runs.peak_users[0] == 10
+    assert runs.n_events.tolist() == [400, 400]
+    assert catalog.metadata(first) == {"seed": 1}
+
+    events = catalog.events("load")
+    assert events["count"].tolist() == [200, 200]
+    assert events.p95[1] == pytest.approx(2 * events.p95[0], rel=0.02)
+    assert (events.peak_concurrency > 0).all()
+
+    trend = catalog.trend("p50")
+    assert trend.columns.tolist() == ["interact", "load"]
+    assert len(trend) == 2
+    with pytest.raises(ValueError):
+        catalog.trend("p42")
+
+    catalog.record("first.csv", _run(3.0, 0.5, start="2023-01-01"))
+    assert len(catalog.runs()) == 2
+    assert len(catalog.events()) == 4
+
+
+def test_sync(tmp_path):
+    """We can index the files archived before the catalog existed"""
+    (tmp_path / "archive").mkdir()
+    write_loadwright_file(_run(1.0, 0.5), tmp_path / "archive" / "loadwright_20230101_120000.csv")
+    write_loadwright_file(_run(1.0, 0.5), tmp_path / "archive" / "loadwright_20230102_120000.jsonl")
+    write_loadwright_file(
+        _run(1.0, 0.5), tmp_path / "archive" / "loadwright_20230103_120000.parquet"
+    )
+    write_loadwright_file(_run(1.0, 0.5), tmp_path / "archive" / "loadwright_20230104_120000.arrow")
+    (tmp_path / "archive" / "notes.txt").write_text("Not a run", encoding="utf8")
+    catalog = RunCatalog(file=str(tmp_path / "catalog.sqlite"))
+
+    assert len(catalog.sync(pattern="*.csv")) == 1
+    assert len(catalog.sync()) == 3
+    assert not catalog.sync()
+    assert catalog.runs().duration[0] == pytest.approx(40.4, abs=0.1)
+
+
+def test_logger(tmp_path):
+    """The Logger records the archived runs in the catalog"""
+    logger = Logger(path=str(tmp_path), auto_save=False)
+    now = time.time()
+    logger.log("load", "0", now, now + 1)
+    logger.close(metadata={"host": "localhost"})
+
+    runs = logger.catalog.runs()
+    assert runs.host.tolist() == ["localhost"]
+    assert (tmp_path / "archive" / runs.file[0].split("/")[-1]).exists()
+
+
+@pytest.mark.parametrize("file", ["loadwright.csv", "loadwright.parquet", "loadwright.arrow"])
+def test_logger_records_readable_files(tmp_path, file):
+    """The files recorded by a Logger streaming its results can be read back"""
+    logger = Logger(path=str(tmp_path), file=file)
+    now = time.time()
+    for index in range(3):
+        logger.log("load", str(index), now + index, now + index + 1)
+    logger.close()
+
+    runs = logger.catalog.runs()
+    assert runs.n_events.tolist() == [3]
+    assert len(read_loadwright_file(runs.file[0])) == 3
@@ -0,0 +1,120 @@
+"""We can compare runs to catch performance regressions"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from loadwright import LoadTestViewer, RegressionGate, compare_runs
+from loadwright.compare import (
+    PerformanceRegression,
+    archived_runs,
+    bootstrap_delta,
+    latest_run,
+)
+from loadwright.io import write_loadwright_file
+
+from .benchmarks.data import results_frame
+
+
+def _run(load: float, interact: float, start: str = "2023-01-01 12:00:00", n_events=200):
+    generator = np.random.default_rng(42)
+    durations = np.concatenate(
+        [
+            load * generator.uniform(0.9, 1.1, n_events),
+            interact * generator.uniform(0.9, 1.1, n_events),
+        ]
+    )
+    return results_frame(
+        event=["load"] * n_events + ["interact"] * n_events,
+        user=[str(index % 10) for index in range(2 * n_events)],
+        start_seconds=np.arange(2 * n_events) * 0.1,
+        durations=durations,
+        start=start,
+    )
+
+
+def test_bootstrap_delta():
+    """The confidence interval contains the difference of the quantiles"""
+    generator = np.random.default_rng(0)
+    baseline = generator.normal(1.0, 0.1, 500)
+    current = generator.normal(1.5, 0.1, 500)
+    low, high = bootstrap_delta(baseline, current, q=0.95, seed=0)
+    assert 0.4 < low < 0.5 < high < 0.6
+    assert np.isnan(bootstrap_delta([], current, q=0.95)[0])
+
+
+def test_compare_runs():
+    """We get the quantiles and their difference per event"""
+    comparison = compare_runs(_run(1.0, 0.5), _run(1.0, 1.0), seed=0)
+    assert sorted(comparison.index) == ["interact", "load"]
+    assert comparison.loc["load", "delta_low"] <= 0 <= comparison.loc["load", "delta_high"]
+    assert comparison.loc["interact", "relative"] == pytest.approx(1.0)
+    assert comparison.loc["interact", "delta_low"] > 0.4
+
+
+def test_latest_run(tmp_path):
+    """We can find the latest run archived before the current run"""
+    for timestamp in ["20230101_120000", "20230102_120000", "20230103_120000"]:
+        (tmp_path / "archive").mkdir(exist_ok=True)
+        (tmp_path / "archive" / f"loadwright_{timestamp}.csv").touch()
+    (tmp_path / "archive" / "loadwright_latest.csv").touch()
+
+    assert len(archived_runs(tmp_path)) == 3
+    assert latest_run(tmp_path).name == "loadwright_20230103_120000.csv"
+    before = pd.Timestamp("2023-01-03 12:00:00.5")
+    assert latest_run(tmp_path, before=before).name == "loadwright_20230102_120000.csv"
+    assert latest_run(tmp_path / "missing") is None
+
+
+def test_gate(tmp_path):
+    """The gate fails on broken budgets and significant regressions"""
+    (tmp_path / "archive").mkdir()
+    write_loadwright_file(
+        _run(1.0, 0.5, start="2023-01-01 12:00:00"),
+        tmp_path / "archive" / "loadwright_20230101_120000.csv",
+    )
+    gate = RegressionGate(path=str(tmp_path), seed=0, n_resamples=200)
+
+    gate.check(_run(1.0, 0.52, start="2023-01-02 12:00:00"))
+    with pytest.raises(PerformanceRegression, match="'interact' regressed"):
+        gate.check(_run(1.0, 1.0, start="2023-01-02 12:00:00"))
+
+    gate.budgets = {"load": 0.5}
+    failures = gate.failures(_run(1.0, 0.5, start="2023-01-02 12:00:00"))
+    assert len(failures) == 1
+    assert "budget" in failures[0]
+
+    # The baseline is the latest run archived before the current run
+    assert gate.compare(_run(1.0, 0.5, start="2023-01-01 12:00:00")) is None
+
+
+def test_plugin(pytester, tmp_path):
+    """The pytest plugin provides a loadwright_gate fixture configured via options"""
+    baseline = tmp_path / "baseline.csv"
+    write_loadwright_file(_run(1.0, 0.5), baseline)
+    pytester.makepyfile(
+        """
+        import pandas as pd
+
+        def test_gate(loadwright_gate):
+            assert loadwright_gate.max_regression == 0.5
+            data = pd.read_csv(loadwright_gate.baseline, index_col=0, parse_dates=["start"])
+            data["duration"] *= 2
+            loadwright_gate.check(data)
+        """
+    )
+    result = pytester.runpytest(
+        "-p",
+        "loadwright.pytest_plugin",
+        f"--loadwright-baseline={baseline}",
+        "--loadwright-max-regression=0.5",
+    )
+    result.assert_outcomes(failed=1)
+    result.stdout.fnmatch_lines(["*PerformanceRegression*regressed*"])
+
+
+def test_viewer():
+    """The viewer compares the data to a baseline run side by side"""
+    viewer = LoadTestViewer(data=_run(1.0, 1.0), baseline=_run(1.0, 0.5))
+    assert viewer.comparison_table().object.loc["interact", "relative"] == pytest.approx(1.0)
+    assert len(viewer.comparison_plot().data) == 4
+    assert not LoadTestViewer(data=_run(1.0, 1.0)).comparison_table().objects
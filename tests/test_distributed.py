@@ -0,0 +1,162 @@
+"""We can run a load test on several Worker nodes coordinated by a Coordinator"""
+# pylint: disable=protected-access
+import asyncio
+import json
+import time
+
+import pytest
+
+from loadwright import Coordinator, LoadTestRunner, User, Worker
+from loadwright.distributed import _load_profile, _profile_message, clock_offset
+from loadwright.logger import Logger
+from loadwright.scheduler import Steps
+
+SKEW = 100.0
+
+
+class _FastUser(User):
+    """A User that does not use the page"""
+
+    requires_page = False
+
+    async def run(self):
+        with self.event(name="load", user=self.name):
+            await asyncio.sleep(0.01)
+
+
+class _TwoBatchUser(User):
+    """A User logging events with different extra columns, flushed in two batches"""
+
+    requires_page = False
+
+    async def run(self):
+        with self.event(name="load", user=self.name, size=10):
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.3)
+        with self.event(name="interact", user=self.name, status="ok"):
+            await asyncio.sleep(0.01)
+
+
+def test_clock_offset():
+    """The clock offset is estimated from the fastest round trip"""
+    samples = [(0.0, 10.3, 0.4), (1.0, 11.05, 1.1), (2.0, 12.5, 2.6)]
+    offset, round_trip = clock_offset(samples)
+    assert offset == pytest.approx(10.0)
+    assert round_trip == pytest.approx(0.1)
+
+
+def test_profile_message():
+    """A load profile is recreated from its JSON message"""
+    profile = Steps(steps=[(1.0, 2.0), (3.0, 4.0)])
+    message = json.loads(json.dumps(_profile_message(profile)))
+
+    recreated = _load_profile(message)
+
+    assert isinstance(recreated, Steps)
+    assert recreated.arrivals(0, 0) == profile.arrivals(0, 0)
+
+
+@pytest.mark.asyncio
+async def test_coordinator_and_workers():
+    """The users are dealt out to the nodes and their events are merged"""
+    async with Coordinator(
+        user=_FastUser(),
+        n_users=6,
+        user_delay=0.05,
+        n_nodes=2,
+        port=0,
+        logger=Logger(auto_save=False, auto_archive=False),
+    ) as coordinator:
+        workers = [
+            Worker(runner=LoadTestRunner(user=_FastUser()), port=coordinator.port, node=node)
+            for node in ["a", "b"]
+        ]
+        nodes = [asyncio.ensure_future(worker.run()) for worker in workers]
+        await coordinator.run()
+        offsets = coordinator.clock_offsets
+        await coordinator.run()
+    await asyncio.wait_for(asyncio.gather(*nodes), 10)
+
+    assert set(offsets) == {"a", "b"}
+    assert all(abs(offset) < 0.1 for offset in offsets.values())
+    data = coordinator.logger.data
+    assert sorted(data.user) == ["0", "1", "2", "3", "4", "5"]
+    assert set(data[data.user.isin(["0", "2", "4"])].node) == {"a"}
+    assert set(data[data.user.isin(["1", "3", "5"])].node) == {"b"}
+    assert (data.start_seconds >= 0).all() and (data.start_seconds < 1).all()
+
+
+@pytest.mark.asyncio
+async def test_extra_columns_arrive_unchanged():
+    """The extra values of the events flushed by a Worker in several batches are not mixed up"""
+    async with Coordinator(
+        user=_TwoBatchUser(),
+        n_users=2,
+        user_delay=0,
+        port=0,
+        logger=Logger(auto_save=False, auto_archive=False),
+    ) as coordinator:
+        worker = Worker(
+            runner=LoadTestRunner(user=_TwoBatchUser()),
+            port=coordinator.port,
+            node="a",
+            interval=0.1,
+        )
+        node = asyncio.ensure_future(worker.run())
+        await coordinator.run()
+    await asyncio.wait_for(node, 10)
+
+    data = coordinator.logger.data
+    loads = data[data.event == "load"]
+    interactions = data[data.event == "interact"]
+    assert len(loads) == 2 and len(interactions) == 2
+    assert loads["size"].tolist() == [10, 10]
+    assert loads["corrected_duration"].notna().all()
+    assert loads["status"].isna().all()
+    assert interactions["size"].isna().all()
+    assert interactions["corrected_duration"].isna().all()
+    assert interactions["status"].tolist() == ["ok", "ok"]
+
+
+async def _skewed_node(port: int):
+    """A node whose clock is SKEW seconds ahead. It logs one event 0.1 to 0.2 seconds after the
+    start of the test"""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+
+    def send(**message):
+        writer.write((json.dumps(message) + "\n").encode())
+
+    send(type="hello", node="skewed")
+    while True:
+        message = json.loads(await reader.readline())
+        if message["type"] == "ping":
+            send(type="pong", time=time.time() + SKEW)
+        elif message["type"] == "run":
+            send(type="ready")
+        elif message["type"] == "start":
+            origin = message["origin"]
+            lead = origin - (time.time() + SKEW)
+            event = {"event": "load", "user": "0", "start": origin + 0.1, "stop": origin + 0.2}
+            send(type="events", events=[event])
+            send(type="done")
+        elif message["type"] == "close":
+            writer.close()
+            return lead
+
+
+@pytest.mark.asyncio
+async def test_clock_offsets_are_corrected():
+    """The start of the test and the events of a node are corrected for its clock offset"""
+    async with Coordinator(
+        user=_FastUser(), n_users=1, port=0, logger=Logger(auto_save=False, auto_archive=False)
+    ) as coordinator:
+        node = asyncio.ensure_future(_skewed_node(coordinator.port))
+        await coordinator.run()
+        assert coordinator.clock_offsets["skewed"] == pytest.approx(SKEW, abs=0.05)
+    # The test started start_delay seconds after the start message in the clock of the node
+    assert await node == pytest.approx(coordinator.start_delay, abs=0.1)
+
+    data = coordinator.logger.data
+    assert data.start_seconds.iloc[0] == pytest.approx(0.1, abs=0.05)
+    assert data.duration.iloc[0] == pytest.approx(0.1, abs=1e-3)
+    assert data.node.iloc[0] == "skewed"
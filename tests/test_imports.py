@@ -0,0 +1,54 @@
+"""Headless load generators do not pay for the plotting stack"""
+import subprocess
+import sys
+
+import pytest
+
+import loadwright
+
+PLOTTING_STACK = ["panel", "holoviews", "hvplot", "bokeh"]
+
+
+def _import(code: str):
+    """Returns the modules imported and the import time in seconds of the code in a fresh
+    interpreter"""
+    result = subprocess.run(
+        [
+            sys.executable,
+            "-X",
+            "importtime",
+            "-c",
+            f"import sys\n{code}\nprint(' '.join(sys.modules))",
+        ],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    seconds = 0.0
+    for line in result.stderr.splitlines():
+        parts = line.split("|")
+        # The top level imports are not indented
+        if len(parts) == 3 and parts[1].strip().isdigit() and not parts[2].startswith("  "):
+            seconds += int(parts[1]) / 1e6
+    return set(result.stdout.split()), seconds
+
+
+def test_lazy_attributes():
+    """The public API is imported on first access"""
+    assert loadwright.User.__name__ == "User"
+    assert "LoadTestViewer" in dir(loadwright)
+    with pytest.raises(AttributeError):
+        loadwright.NotAnAttribute  # pylint: disable=pointless-statement
+
+
+def test_headless_import():
+    """The runner, user and logger do not import Panel, HoloViews or Bokeh"""
+    modules, seconds = _import(
+        "from loadwright import LoadTestRunner, User\nimport loadwright.logger"
+    )
+    assert not [module for module in PLOTTING_STACK if module in modules]
+
+    modules, viewer_seconds = _import("from loadwright import LoadTestViewer")
+    assert "holoviews" in modules
+    # A regression would import the plotting stack again, which dominates the import time
+    assert seconds < 0.5 * viewer_seconds
@@ -2,11 +2,14 @@
 from pathlib import Path
 
 import pandas as pd
+import pytest
 
 from loadwright import read_loadwright_file
+from loadwright.io import write_loadwright_file
 
 ROOT = Path(__file__).parent
 FIXTURE = ROOT / "loadwright_fixture.csv"
+FILES = ["loadwright.csv", "loadwright.jsonl", "loadwright.parquet", "loadwright.arrow"]
 
 
 def test_read_loadwright_file():
@@ -26,3 +29,27 @@ def test_read_loadwright_file():
         "stop_seconds",
         "duration",
     }
+
+
+@pytest.mark.parametrize("file", FILES)
+def test_write_and_read_loadwright_file(tmp_path, file):
+    """We can write and read all Loadwright file formats"""
+    data = read_loadwright_file(FIXTURE)
+    write_loadwright_file(data, tmp_path / file)
+
+    result = read_loadwright_file(tmp_path / file)
+    assert len(result) == len(data)
+    assert result.start.dtype == "<M8[ns]"
+    assert result.user.astype(str).tolist() == data.user.tolist()
+
+
+@pytest.mark.parametrize("file", FILES)
+def test_read_loadwright_file_with_filters(tmp_path, file):
+    """We can read only selected columns, a time window and a set of users"""
+    write_loadwright_file(read_loadwright_file(FIXTURE), tmp_path / file)
+
+    result = read_loadwright_file(
+        tmp_path / file, columns=["event", "duration"], time_window=(0.1, None), users=["1"]
+    )
+    assert list(result.columns) == ["event", "duration"]
+    assert result.event.astype(str).tolist() == ["load", "interact"]
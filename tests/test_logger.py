@@ -0,0 +1,130 @@
+"""We can log the events of a load test"""
+import time
+
+from loadwright.events import INTERNAL_EVENTS
+from loadwright.io import read_loadwright_file
+from loadwright.logger import Logger
+
+
+def test_log_relative_to_origin():
+    """The start_seconds are relative to the origin given when resetting"""
+    logger = Logger(auto_save=False)
+    origin = time.time()
+    logger.reset(origin=origin)
+    logger.log("load", "0", origin + 1, origin + 3)
+
+    data = logger.data
+    assert data.start_seconds.tolist() == [1.0]
+    assert data.stop_seconds.tolist() == [3.0]
+    assert data.duration.tolist() == [2.0]
+
+
+def test_extend():
+    """We can merge the results of another Logger, for example from a worker process"""
+    origin = time.time()
+    worker = Logger(auto_save=False)
+    worker.reset(origin=origin)
+    worker.log("load", "1", origin + 1, origin + 2, status="ok")
+    worker.log("load", "3", origin + 2, origin + 4)
+
+    logger = Logger(auto_save=False)
+    logger.reset(origin=origin)
+    logger.extend(worker.data)
+
+    data = logger.data
+    assert data.user.tolist() == ["1", "3"]
+    assert data.start_seconds.round(6).tolist() == [1.0, 2.0]
+    assert data.status.tolist() == ["ok", None]
+
+
+def test_results():
+    """We can read and assign the results as a list of dictionaries"""
+    logger = Logger(auto_save=False)
+    origin = time.time()
+    logger.results = [
+        {"event": "load", "user": "0", "start": origin, "stop": origin + 2, "status": 200},
+        {"event": "load", "user": "1", "start": origin + 1, "stop": origin + 2, "status": 404},
+    ]
+
+    data = logger.data
+    assert data.user.tolist() == ["0", "1"]
+    assert data.start_seconds.round(6).tolist() == [0.0, 1.0]
+    assert data.status.dtype == "int64"
+    assert [result["status"] for result in logger.results] == [200, 404]
+
+    logger.results = logger.results[1:]
+    assert logger.data.user.tolist() == ["1"]
+    logger.results = []
+    assert logger.data.empty
+
+
+def test_tail():
+    """We can read the events incrementally while a test is running"""
+    logger = Logger(auto_save=False)
+    origin = time.time()
+    logger.reset(origin=origin)
+    logger.log("load", "0", origin + 1, origin + 2)
+    logger.log("load", "1", origin + 2, origin + 3)
+    logger.log("interact", "0", origin + 3, origin + 4)
+
+    data = logger.tail(2)
+    assert data.index.tolist() == [2]
+    assert data.event.tolist() == ["interact"]
+    assert data.start_seconds.round(6).tolist() == [3.0]
+    assert logger.tail(3).empty
+
+
+def test_event_record():
+    """We can stop an event early and log extra values with it"""
+    logger = Logger(auto_save=False)
+    with logger.event("load", "0") as record:
+        record.stop()
+        time.sleep(0.05)
+        record.update(heap=1.0)
+
+    data = logger.data
+    assert data.duration.tolist()[0] < 0.05
+    assert data.heap.tolist() == [1.0]
+
+
+def test_event_record_replaces_values():
+    """The values added via the record replace the ones given when starting the event"""
+    logger = Logger(auto_save=False)
+    origin = time.time() - 10
+    with logger.event("load", "0", intended_start=origin, status="pending") as record:
+        record.update(status="ok", corrected_duration=1.0)
+
+    data = logger.data
+    assert data.status.tolist() == ["ok"]
+    assert data.corrected_duration.tolist() == [1.0]
+
+
+def test_summary_excludes_internal_events():
+    """The resource and generator samples and the websocket traces are logged but not summarized"""
+    logger = Logger(auto_save=False)
+    origin = time.time()
+    logger.log("load", "0", origin, origin + 1.0)
+    for index, event in enumerate(INTERNAL_EVENTS):
+        logger.log(event, str(index), origin, origin)
+
+    assert logger.data.event.tolist() == ["load", *INTERNAL_EVENTS]
+    assert logger.summary().index.tolist() == ["load"]
+
+
+def test_max_events_spills_to_the_file(tmp_path):
+    """Only the latest events are kept in memory. All events are kept in the file"""
+    logger = Logger(path=str(tmp_path), max_events=8, auto_save=False)
+    origin = time.time()
+    logger.reset(origin=origin)
+    for index in range(20):
+        logger.log("load", str(index), origin + index, origin + index + 0.5)
+
+    assert len(logger.data) <= 8
+    assert logger.data.user.tolist()[-1] == "19"
+    assert logger.spilled + len(logger.data) == 20
+    assert len(logger.read()) == 20
+    assert logger.summary().loc["load", "count"] == 20
+
+    logger.close()
+    assert len(read_loadwright_file(tmp_path / "loadwright.csv")) == 20
+    assert logger.catalog.runs()["n_events"].tolist() == [20]
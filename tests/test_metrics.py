@@ -0,0 +1,79 @@
+"""We can collect browser side performance metrics per event"""
+import time
+
+import pytest
+from playwright.async_api import Page
+
+from loadwright import User
+from loadwright.logger import Logger
+from loadwright.metrics import MetricsCollector
+
+BEFORE = {
+    "script_duration": 1.0,
+    "layout_duration": 0.5,
+    "js_heap_used_size": 1e6,
+    "time_origin": 1000.0,
+    "ttfb": 0.1,
+    "resource_count": 10,
+    "long_task_count": 1,
+    "long_task_duration": 0.06,
+}
+
+
+def test_diff_interaction():
+    """The metrics of an event without navigation are the changes of the counters"""
+    after = dict(BEFORE, script_duration=1.25, js_heap_used_size=2e6, long_task_count=3)
+    metrics = MetricsCollector.diff(BEFORE, after)
+
+    assert metrics["browser_script_duration"] == 0.25
+    assert metrics["browser_layout_duration"] == 0.0
+    assert metrics["browser_js_heap_used_size"] == 2e6
+    assert metrics["browser_long_task_count"] == 2
+    assert "browser_ttfb" not in metrics
+
+
+def test_diff_navigation():
+    """The metrics of an event loading a new document include its navigation timing"""
+    after = dict(BEFORE, time_origin=2000.0, ttfb=0.3, resource_count=4, script_duration=0.2)
+    metrics = MetricsCollector.diff(BEFORE, after)
+
+    assert metrics["browser_ttfb"] == 0.3
+    assert metrics["browser_resource_count"] == 4
+    assert metrics["browser_script_duration"] == 0.2
+
+
+class _FakeCollector(MetricsCollector):
+    """Returns increasing script durations instead of asking a browser"""
+
+    calls = 0
+
+    async def snapshot(self, page):
+        self.calls += 1
+        return {"script_duration": float(self.calls), "time_origin": 1.0}
+
+
+@pytest.mark.asyncio
+async def test_measure():
+    """The metrics are logged as extra columns of the event"""
+    logger = Logger(auto_save=False)
+    logger.reset(origin=time.time())
+    # A stand in for a Playwright page. The fake collector does not use it
+    page = Page.__new__(Page)
+    user = User(event=logger.event, metrics=_FakeCollector(), page=page)
+    async with user.measure("interact"):
+        pass
+
+    data = logger.data
+    assert data.event.tolist() == ["interact"]
+    assert data.browser_script_duration.tolist() == [1.0]
+
+
+@pytest.mark.asyncio
+async def test_measure_without_metrics():
+    """Without a MetricsCollector measure logs a plain event"""
+    logger = Logger(auto_save=False)
+    user = User(event=logger.event)
+    async with user.measure("load") as record:
+        record.update(status="ok")
+
+    assert logger.data.status.tolist() == ["ok"]
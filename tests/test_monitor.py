@@ -0,0 +1,133 @@
+"""We can tell whether the load generator was the bottleneck of a run"""
+import asyncio
+import threading
+import time
+
+import pandas as pd
+import param
+import pytest
+
+from loadwright import GeneratorMonitor, LoadTestRunner
+from loadwright.logger import Logger
+from loadwright.monitor import GENERATOR_EVENT, corrected_durations, start_lags
+
+from .app import App
+from .test_protocol import ProtocolLoadAndClickUser
+
+
+class BlockingUser(ProtocolLoadAndClickUser):
+    """A user blocking the event loop of the load generator"""
+
+    block_time = param.Number(0.3)
+
+    async def run(self):
+        time.sleep(self.block_time)
+        await super().run()
+
+
+@pytest.mark.asyncio
+async def test_run():
+    """The monitor logs the loop lag and CPU of the generator"""
+    samples = []
+    task = asyncio.ensure_future(
+        GeneratorMonitor(interval=0.05).run(lambda *args, **kwargs: samples.append(kwargs))
+    )
+    await asyncio.sleep(0.12)
+    time.sleep(0.2)
+    await asyncio.sleep(0.05)
+    task.cancel()
+
+    assert max(sample["generator_loop_lag"] for sample in samples) >= 0.1
+    assert max(sample["generator_cpu_percent"] for sample in samples) > 0
+    assert min(sample["generator_rss"] for sample in samples) > 0
+
+
+def _spin(seconds: float):
+    stop = time.perf_counter() + seconds
+    while time.perf_counter() < stop:
+        pass
+
+
+@pytest.mark.asyncio
+async def test_run_excludes_other_threads():
+    """The CPU of other threads, for example of a served app, is not the generator's"""
+    samples = []
+    task = asyncio.ensure_future(
+        GeneratorMonitor(interval=0.1).run(lambda *args, **kwargs: samples.append(kwargs))
+    )
+    thread = threading.Thread(target=_spin, args=(0.35,))
+    thread.start()
+    await asyncio.sleep(0.35)
+    thread.join()
+    task.cancel()
+
+    assert samples
+    assert max(sample["generator_cpu_percent"] for sample in samples) < 50
+
+
+def test_check():
+    """The monitor flags the runs where the generator was the bottleneck"""
+    data = pd.DataFrame(
+        {
+            "event": [GENERATOR_EVENT, GENERATOR_EVENT, "load", "load"],
+            "user": ["generator", "generator", "0", "1"],
+            "session": [None, None, 0, 0],
+            "scheduled_start_seconds": [None, None, 0.0, 1.0],
+            "actual_start_seconds": [None, None, 0.0, 3.0],
+            "generator_loop_lag": [0.0, 0.5, None, None],
+            "generator_cpu_percent": [50.0, 60.0, None, None],
+        }
+    )
+    assert start_lags(data).tolist() == [0.0, 2.0]
+    reasons = GeneratorMonitor().check(data)
+    assert len(reasons) == 2
+    assert "loop lag" in reasons[0]
+    assert "start lag" in reasons[1]
+    assert not GeneratorMonitor(max_loop_lag=1, max_start_lag=5).check(data)
+
+
+def test_corrected_duration():
+    """Events with an intended start are corrected for coordinated omission"""
+    logger = Logger(auto_save=False)
+    intended_start = time.time() - 1
+    with logger.event("load", "0", intended_start=intended_start):
+        pass
+    with logger.event("interact", "0"):
+        pass
+
+    data = logger.data
+    assert data.corrected_duration[0] == pytest.approx(data.duration[0] + 1, abs=0.01)
+    assert corrected_durations(data).tolist() == [data.corrected_duration[0], data.duration[1]]
+
+
+@pytest.mark.asyncio
+async def test_runner(port=6009):
+    """The LoadTestRunner flags the runs where the generator was the bottleneck"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        await asyncio.sleep(1)
+        runner = LoadTestRunner(
+            host=host,
+            user=ProtocolLoadAndClickUser(n_clicks=1, sleep_time=0.1),
+            n_users=2,
+            user_delay=0.1,
+            monitor=GeneratorMonitor(interval=0.1),
+        )
+        await runner.run()
+        assert not runner.generator_bound
+
+        data = runner.logger.data
+        assert (data.event == GENERATOR_EVENT).sum() > 0
+        loads = data[data.event == "load"]
+        assert (loads.corrected_duration >= loads.duration).all()
+        assert data[data.event == "interact"].corrected_duration.isna().all()
+
+        runner = LoadTestRunner(
+            host=host,
+            user=BlockingUser(n_clicks=1, sleep_time=0.1),
+            n_users=4,
+            user_delay=0.1,
+            monitor=GeneratorMonitor(interval=0.1),
+        )
+        await runner.run()
+        assert runner.generator_bound
+        assert runner.saturation
@@ -0,0 +1,134 @@
+"""We can pool browsers and browser contexts"""
+import asyncio
+
+import pytest
+
+from loadwright.pool import BrowserPool
+
+
+@pytest.mark.parametrize(
+    ["params", "n_users", "expected"],
+    [
+        ({}, 100, 1),
+        ({"n_browsers": 3}, 100, 3),
+        ({"users_per_browser": 10}, 95, 10),
+        ({"users_per_browser": 10}, 0, 1),
+    ],
+)
+def test_n_browsers(params, n_users, expected):
+    """The number of browsers is given by n_browsers or users_per_browser"""
+    pool = BrowserPool(**params)
+    assert pool._get_n_browsers(n_users) == expected  # pylint: disable=protected-access
+
+
+@pytest.mark.asyncio
+async def test_page_raises_if_not_started():
+    """We get a helpful error if the pool has not been started"""
+    pool = BrowserPool()
+    with pytest.raises(RuntimeError):
+        async with pool.page():
+            pass
+
+
+class _FakePage:
+    """A Page using heap_size bytes of JS heap"""
+
+    def __init__(self, heap_size: float):
+        self.heap_size = heap_size
+        self.closed = False
+
+    async def evaluate(self, _script):
+        """Returns the heap size"""
+        return self.heap_size
+
+    def is_closed(self):
+        """Returns True if the page is closed"""
+        return self.closed
+
+    async def close(self):
+        """Closes the page"""
+        self.closed = True
+
+
+class _FakeContext:
+    """A BrowserContext of fake pages"""
+
+    def __init__(self, heap_size: float):
+        self.heap_size = heap_size
+        self.closed = False
+
+    async def new_page(self):
+        """Returns a new page"""
+        return _FakePage(self.heap_size)
+
+    async def close(self):
+        """Closes the context"""
+        self.closed = True
+
+
+class _FakeBrowser:
+    """A Browser of fake contexts"""
+
+    def __init__(self, heap_size: float):
+        self.heap_size = heap_size
+        self.contexts = []
+        self.closed = False
+
+    async def new_context(self):
+        """Returns a new context"""
+        self.contexts.append(_FakeContext(self.heap_size))
+        return self.contexts[-1]
+
+    async def close(self):
+        """Closes the browser"""
+        self.closed = True
+
+
+class _FakePlaywright:  # pylint: disable=too-few-public-methods
+    """A Playwright launching fake browsers"""
+
+    def __init__(self, heap_size: float = 1e6):
+        self.heap_size = heap_size
+        self.browsers = []
+        self.chromium = self
+
+    async def launch(self, headless=True):  # pylint: disable=unused-argument
+        """Returns a new browser"""
+        self.browsers.append(_FakeBrowser(self.heap_size))
+        return self.browsers[-1]
+
+
+async def _sessions(pool: BrowserPool, n_sessions: int):
+    for _ in range(n_sessions):
+        async with pool.page():
+            await asyncio.sleep(0)
+        await asyncio.sleep(0)
+
+
+@pytest.mark.asyncio
+async def test_replaces_browsers():
+    """A browser is replaced after max_sessions_per_browser pages and closed when idle"""
+    playwright = _FakePlaywright()
+    pool = BrowserPool(max_sessions_per_browser=2)
+    await pool.start(playwright)
+
+    await _sessions(pool, 5)
+
+    assert len(playwright.browsers) == 3
+    assert [browser.closed for browser in playwright.browsers] == [True, True, False]
+    await pool.stop()
+    assert all(browser.closed for browser in playwright.browsers)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(["heap_size", "n_contexts"], [(1e6, 1), (300e6, 3)])
+async def test_max_context_heap(heap_size, n_contexts):
+    """A context is not reused if its page used more than max_context_heap MB of JS heap"""
+    playwright = _FakePlaywright(heap_size=heap_size)
+    pool = BrowserPool(max_pages_per_context=10, max_context_heap=256)
+    await pool.start(playwright)
+
+    await _sessions(pool, 3)
+
+    assert len(playwright.browsers[0].contexts) == n_contexts
+    await pool.stop()
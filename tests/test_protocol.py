@@ -0,0 +1,159 @@
+"""We can load test Panel apps without a browser"""
+import asyncio
+import json
+
+import param
+import pytest
+
+from loadwright import LoadTestRunner, ProtocolUser
+from loadwright.logger import Logger
+from loadwright.protocol import (
+    MessageAssembler,
+    button_click_event,
+    find_models,
+    websocket_url,
+)
+from loadwright.runner import _free_ports
+
+from .app import App
+
+
+class ProtocolLoadAndClickUser(ProtocolUser):
+    """A ProtocolUser that loads the app and clicks the button n_clicks times"""
+
+    n_clicks = param.Integer(
+        default=1, bounds=(0, None), doc="The number of times to click the button"
+    )
+
+    async def run(self):
+        with self.event(name="load", user=self.name):
+            await self.connect()
+        await self.sleep()
+
+        button = self.find_models("Button", label="Run")[0]
+        for click_index in range(self.n_clicks):
+            with self.event(name="interact", user=self.name):
+                await self.click(button["id"], wait_for=f"Finished run {click_index+1}")
+            await self.sleep()
+        self.close()
+
+
+class _NoDocumentUser(ProtocolUser):
+    """A ProtocolUser that fails to pull the document and records when it closes the
+    websocket"""
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self.closed = []
+
+    async def receive(self, *args, **kwargs):
+        raise asyncio.TimeoutError()
+
+    def close(self):
+        self.closed.append(self._connection is not None)
+        super().close()
+
+
+@pytest.mark.parametrize(
+    ["url", "expected"],
+    [
+        ("http://localhost:5006", "ws://localhost:5006/ws"),
+        ("https://example.com/app/", "wss://example.com/app/ws"),
+        ("http://localhost:5006/app?a=1", "ws://localhost:5006/app/ws"),
+    ],
+)
+def test_websocket_url(url, expected):
+    """We can find the websocket url of an app"""
+    assert websocket_url(url) == expected
+
+
+def test_find_models():
+    """We can find models in the json representation of a document"""
+    document = {
+        "roots": {
+            "references": [
+                {"type": "Button", "id": "1", "attributes": {"label": "Run"}},
+                {"type": "Button", "id": "2", "attributes": {"label": "Stop"}},
+                {"type": "Markdown", "id": "3", "attributes": {"text": "Run"}},
+            ]
+        }
+    }
+    assert [model["id"] for model in find_models(document, "Button")] == ["1", "2"]
+    assert [model["id"] for model in find_models(document, label="Run")] == ["1"]
+    assert button_click_event("1")["msg_type"] == "bokeh_event"
+
+
+def test_message_assembler():
+    """We can group websocket frames into Bokeh messages"""
+    assembler = MessageAssembler()
+    assert assembler.add(json.dumps({"msgtype": "PATCH-DOC", "num_buffers": 1})) is None
+    assert assembler.add("{}") is None
+    assert assembler.add("{}") is None
+    assert assembler.add(json.dumps({"id": "1"})) is None
+    message = assembler.add(b"\x00\x01")
+    assert message.msgtype == "PATCH-DOC"
+    assert len(message.frames) == 5
+    assert message.frames[-1] == b"\x00\x01"
+    assert message.size == len(message.frames[0]) + 4 + len(message.frames[3]) + 2
+
+
+@pytest.mark.asyncio
+async def test_protocol_user(port=6004):
+    """We can run the LoadTestRunner with a ProtocolUser and no browser"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        # Without a browser to launch the first user arrives before the server is ready
+        await asyncio.sleep(1)
+        runner = LoadTestRunner(
+            host=host,
+            user=ProtocolLoadAndClickUser(n_clicks=2, sleep_time=0.1),
+            n_users=3,
+            user_delay=0.1,
+        )
+        await runner.run()
+
+    data = runner.logger.data
+    assert sorted(data.user.unique()) == ["0", "1", "2"]
+    assert (data.event == "interact").sum() == 6
+    assert data[data.event == "interact"].duration.min() >= App.param.run_delay.default
+
+
+@pytest.mark.asyncio
+async def test_stop(port=6006):
+    """We can abort a running test early"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        await asyncio.sleep(1)
+        runner = LoadTestRunner(
+            host=host,
+            user=ProtocolLoadAndClickUser(n_clicks=20, sleep_time=0.1),
+            n_users=2,
+            user_delay=0.1,
+        )
+        asyncio.get_running_loop().call_later(2, runner.stop)
+        await asyncio.wait_for(runner.run(), timeout=10)
+
+    assert runner.stopped
+    assert 0 < (runner.logger.data.event == "interact").sum() < 40
+
+
+@pytest.mark.asyncio
+async def test_unreachable_host():
+    """We get the error of an unreachable host"""
+    user = ProtocolUser(
+        host=f"http://localhost:{_free_ports(1)[0]}", event=Logger(auto_save=False).event
+    )
+    with pytest.raises(OSError):
+        await user.run()
+    assert user._connection is None  # pylint: disable=protected-access
+
+
+@pytest.mark.asyncio
+async def test_websocket_closed_on_failure(port=6012):
+    """The websocket is closed if the document cannot be pulled"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        user = _NoDocumentUser(host=host, event=Logger(auto_save=False).event)
+        with pytest.raises(asyncio.TimeoutError):
+            await user.run()
+
+    assert user.closed[0]
+    assert user._connection is None  # pylint: disable=protected-access
@@ -0,0 +1,102 @@
+"""We can compute quantiles of event durations incrementally"""
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from loadwright.logger import Logger
+from loadwright.quantiles import (
+    LogHistogram,
+    QuantileTracker,
+    running_aggregate,
+    running_quantile,
+    summary,
+)
+
+
+@pytest.mark.parametrize("q", [0.01, 0.5, 0.9, 0.95, 0.99, 1.0])
+def test_log_histogram(q):
+    """The quantiles are accurate to within the precision"""
+    values = np.random.default_rng(1).lognormal(0, 1, 10_000)
+    histogram = LogHistogram(precision=0.01)
+    for value in values:
+        histogram.add(value)
+
+    expected = np.quantile(values, q, method="inverted_cdf")
+    assert histogram.quantile(q) == pytest.approx(expected, rel=0.01)
+    assert histogram.count == len(values)
+
+
+def test_log_histogram_remove():
+    """We can remove values, for example when they leave a time window"""
+    histogram = LogHistogram()
+    for value in [1.0, 2.0, 100.0]:
+        histogram.add(value)
+    histogram.remove(100.0)
+
+    assert histogram.quantile(1.0) == pytest.approx(2.0, rel=0.01)
+    assert histogram.mean == pytest.approx(1.5)
+    histogram.clear()
+    assert np.isnan(histogram.quantile(0.5))
+
+
+def test_quantile_tracker_window():
+    """The tracker only includes the values of the last window seconds"""
+    tracker = QuantileTracker(window=10)
+    tracker.add("load", 5.0, time=0)
+    tracker.add("load", 1.0, time=5)
+    tracker.add("interact", 0.5, time=12)
+
+    table = tracker.summary()
+    assert table.loc["load", "count"] == 1
+    assert table.loc["load", "p99"] == pytest.approx(1.0, rel=0.01)
+    assert table.loc["interact", "p50"] == pytest.approx(0.5, rel=0.01)
+
+
+def _data():
+    return pd.DataFrame(
+        {
+            "event": ["load", "interact", "load", "load", "interact"],
+            "start_seconds": [0.0, 1.0, 2.0, 30.0, 31.0],
+            "duration": [1.0, 0.2, 3.0, 2.0, 0.4],
+        }
+    )
+
+
+def test_running_aggregate():
+    """We can compute running and windowed aggregates per event in one pass"""
+    data = _data()
+    assert running_aggregate(data, "max").tolist() == [1.0, 0.2, 3.0, 3.0, 0.4]
+    assert running_aggregate(data, "mean").round(3).tolist() == [1.0, 0.2, 2.0, 2.0, 0.3]
+    assert running_aggregate(data, "max", window=10).tolist() == [1.0, 0.2, 3.0, 2.0, 0.4]
+    assert running_quantile(data, 0.5) == pytest.approx([1.0, 0.2, 1.0, 2.0, 0.2], rel=0.01)
+    assert running_aggregate(data, "p99", window=10) == pytest.approx(
+        [1.0, 0.2, 3.0, 2.0, 0.4], rel=0.01
+    )
+    with pytest.raises(ValueError):
+        running_aggregate(data, "p42")
+
+
+def test_summary():
+    """We can summarize the durations per event"""
+    table = summary(_data())
+    assert table.loc["load", "count"] == 3
+    assert table.loc["load", "p50"] == 2.0
+    assert table.loc["interact", "max"] == 0.4
+    assert list(table.columns) == ["count", "mean", "min", "p50", "p90", "p95", "p99", "max"]
+
+
+def test_logger_summary():
+    """The Logger tracks the quantiles while the test is running"""
+    logger = Logger(auto_save=False)
+    origin = time.time()
+    logger.reset(origin=origin)
+    for index in range(100):
+        logger.log("load", str(index), origin, origin + 1 + index / 100)
+
+    table = logger.summary()
+    assert table.loc["load", "count"] == 100
+    assert table.loc["load", "p90"] == pytest.approx(1.89, rel=0.01)
+    logger.reset()
+    assert logger.summary().empty
@@ -0,0 +1,155 @@
+"""We can record a User session once and replay it without a browser"""
+import asyncio
+import json
+
+import pytest
+from bokeh.util.token import get_session_id
+
+from loadwright import LoadTestRunner, ProtocolUser
+from loadwright.logger import Logger
+from loadwright.protocol import button_click_event
+from loadwright.recorder import (
+    Recording,
+    ReplayUser,
+    _map_ids,
+    _rewrite_ids,
+)
+
+from .app import App
+
+
+def _recording(host, session_id, document, button_id):
+    """Returns a recording of a user loading the app and clicking the button like a browser"""
+    click = [
+        json.dumps({"msgtype": "PATCH-DOC", "msgid": "1"}),
+        "{}",
+        json.dumps({"events": [button_click_event(button_id)], "references": []}),
+    ]
+    return Recording(
+        records=[
+            {"kind": "meta", "t": 0.0, "version": 1, "url": host + "/"},
+            {"kind": "event_start", "t": 0.0, "event": "load"},
+            {"kind": "request", "t": 0.0, "method": "GET", "url": host + "/",
+             "resource_type": "document", "post_data": None},
+            {"kind": "session", "t": 0.1, "session_id": session_id},
+            {"kind": "ws_open", "t": 0.2, "url": host + "/ws"},
+            {"kind": "ws_received", "t": 0.3, "msgtype": "PULL-DOC-REPLY", "reqid": "0",
+             "size": 1000, "content": {"doc": document}},
+            {"kind": "event_stop", "t": 0.3, "event": "load"},
+            {"kind": "event_start", "t": 0.5, "event": "interact"},
+            {"kind": "ws_sent", "t": 0.5, "frames": click},
+            {"kind": "ws_received", "t": 1.0, "msgtype": "PATCH-DOC", "reqid": None, "size": 100},
+            {"kind": "ws_received", "t": 1.0, "msgtype": "OK", "reqid": "1", "size": 10},
+            {"kind": "event_stop", "t": 1.0, "event": "interact"},
+        ]
+    )  # fmt: skip
+
+
+class _FailingReplayUser(ReplayUser):
+    """A ReplayUser failing to replay an event and recording whether its websocket was open when
+    closing"""
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self.closed = []
+
+    async def _replay(self, event):
+        raise RuntimeError("The replay failed")
+
+    def close(self):
+        self.closed.append(self._connection is not None)
+        super().close()
+
+
+def test_map_and_rewrite_ids():
+    """We can map the model ids of a recorded document to the ids of a new document"""
+    recorded = {
+        "roots": {
+            "references": [
+                {"type": "Row", "id": "1", "attributes": {"children": [{"id": "2"}]}},
+                {"type": "Button", "id": "2", "attributes": {}},
+            ],
+            "root_ids": ["1"],
+        }
+    }
+    # The order of the references is not stable between sessions
+    replayed = {
+        "roots": {
+            "references": [
+                {"type": "Button", "id": "12", "attributes": {}},
+                {"type": "Row", "id": "11", "attributes": {"children": [{"id": "12"}]}},
+            ],
+            "root_ids": ["11"],
+        }
+    }
+    ids = _map_ids(recorded, replayed)
+    assert ids == {"1": "11", "2": "12"}
+    assert _rewrite_ids({"events": [{"model": {"id": "2"}, "new": "1"}]}, ids) == {
+        "events": [{"model": {"id": "12"}, "new": "1"}]
+    }
+
+
+def test_recording_events(tmp_path):
+    """We can save, load and group a Recording by event"""
+    recording = _recording("http://localhost:5006", "session", {"roots": {}}, "1")
+    recording.save(tmp_path / "recording.jsonl")
+    recording = Recording.load(tmp_path / "recording.jsonl")
+
+    assert recording.url == "http://localhost:5006/"
+    assert recording.session_id == "session"
+    events = recording.events()
+    assert [event.event for event in events] == ["load", "interact"]
+    assert len(events[0].requests) == 1
+    assert len(events[1].messages) == 1
+    assert events[1].replies == 1
+
+
+@pytest.mark.asyncio
+async def test_replay(port=6005):
+    """We can replay a recording with concurrent users and rewritten model and session ids"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        # Without a browser to launch the first user arrives before the server is ready
+        await asyncio.sleep(1)
+        recorder = ProtocolUser(host=host)
+        await recorder.connect()
+        recorder.close()
+        button = recorder.find_models("Button", label="Run")[0]
+        recording = _recording(
+            host, get_session_id(recorder.token), recorder.document, button["id"]
+        )
+
+        runner = LoadTestRunner(
+            host=host,
+            user=ReplayUser(recording=recording, think_time_scale=0.5),
+            n_users=3,
+            user_delay=0.1,
+        )
+        await runner.run()
+
+    data = runner.logger.data
+    assert data.groupby("user").size().to_dict() == {"0": 2, "1": 2, "2": 2}
+    assert (data.event == "load").sum() == 3
+    assert (data.event == "interact").sum() == 3
+    assert data[data.event == "interact"].duration.min() >= App.param.run_delay.default
+
+
+@pytest.mark.asyncio
+async def test_replay_closes_websocket_on_failure(port=6013):
+    """The websocket is closed if replaying an event fails"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        recorder = ProtocolUser(host=host)
+        await recorder.connect()
+        recorder.close()
+        button = recorder.find_models("Button", label="Run")[0]
+        recording = _recording(
+            host, get_session_id(recorder.token), recorder.document, button["id"]
+        )
+        user = _FailingReplayUser(
+            host=host, recording=recording, event=Logger(auto_save=False).event
+        )
+        with pytest.raises(RuntimeError):
+            await user.run()
+
+    assert user.closed == [True]
+    assert user._connection is None  # pylint: disable=protected-access
@@ -0,0 +1,111 @@
+"""We can sample the resources used by the server under test"""
+import asyncio
+
+import pandas as pd
+import pytest
+
+from loadwright import LoadTestRunner, LoadTestViewer, User
+from loadwright.logger import Logger
+from loadwright.resources import RESOURCE_EVENT, ResourceSampler
+
+from .app import App
+from .test_protocol import ProtocolLoadAndClickUser
+
+
+class _RecordingSampler(ResourceSampler):
+    """A ResourceSampler that records the start times of the samples it logs"""
+
+    def __init__(self, **params):
+        super().__init__(**params)
+
+        self.logged = []
+
+    async def run(self, log):
+        def record(*args, **kwargs):
+            self.logged.append(args[2])
+            log(*args, **kwargs)
+
+        await super().run(record)
+
+
+class _SlowStartRunner(LoadTestRunner):
+    """A LoadTestRunner that takes some time to set the origin, like when launching browsers"""
+
+    async def _start_logger(self) -> float:
+        await asyncio.sleep(0.3)
+        return await super()._start_logger()
+
+
+class _SleepingUser(User):
+    """A User that does not use the page"""
+
+    requires_page = False
+
+    async def run(self):
+        with self.event(name="load", user=self.name):
+            await asyncio.sleep(0.3)
+
+
+@pytest.mark.asyncio
+async def test_sample():
+    """We can sample the current process"""
+    sample = await ResourceSampler().sample()
+    assert sample["server_rss"] > 0
+    assert sample["server_threads"] >= 1
+
+
+@pytest.mark.asyncio
+async def test_runner(port=6008):
+    """The LoadTestRunner logs the resources of the served app while the test runs"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        runner = LoadTestRunner(
+            host=host,
+            user=ProtocolLoadAndClickUser(n_clicks=2, sleep_time=0.1),
+            n_users=2,
+            user_delay=0.1,
+            sampler=ResourceSampler(interval=0.2),
+        )
+        await runner.run()
+
+    data = runner.logger.data
+    samples = data[data.event == RESOURCE_EVENT]
+    assert len(samples) >= 3
+    assert samples.server_sessions.max() >= 1
+    assert samples.server_loop_lag.notna().all()
+
+    viewer = LoadTestViewer(data=data)
+    assert len(viewer.resources_plot()) == 5
+    assert RESOURCE_EVENT not in viewer.summary_table().object.index
+
+
+@pytest.mark.asyncio
+async def test_samples_kept():
+    """The samples are taken once the origin is set, so they are not reset with the logger"""
+    sampler = _RecordingSampler(interval=0.05)
+    runner = _SlowStartRunner(
+        user=_SleepingUser(),
+        n_users=1,
+        sampler=sampler,
+        logger=Logger(auto_save=False, auto_archive=False),
+    )
+    await runner.run()
+
+    samples = runner.logger.data
+    samples = samples[samples.event == RESOURCE_EVENT]
+    assert sampler.logged
+    assert len(samples) == len(sampler.logged)
+    assert (samples.start_seconds >= 0).all()
+
+
+def test_viewer_without_samples():
+    """The viewer shows no resources when none were sampled"""
+    data = pd.DataFrame(
+        {
+            "event": ["load"],
+            "user": ["0"],
+            "start_seconds": [0.0],
+            "stop_seconds": [1.0],
+            "duration": [1.0],
+        }
+    )
+    assert not LoadTestViewer(data=data).resources_plot().objects
@@ -2,9 +2,17 @@
 import param
 import pytest
 
-from loadwright import LoadTestRunner, User
+from loadwright import GeneratorMonitor, LoadTestRunner, User
+from loadwright.logger import Logger
+from loadwright.runner import (
+    SOAK_CONTEXT_HEAP,
+    SOAK_MAX_EVENTS,
+    _free_ports,
+    wait_until_ready,
+)
 
 from .app import App
+from .test_protocol import ProtocolLoadAndClickUser
 
 
 class LoadAndClickUser(User):
@@ -44,3 +52,100 @@ async def test_component_2(port=6001):
     """We can run the LoadTestRunner with 2 users"""
     async with LoadTestRunner.serve(App, port=port) as host:
         await LoadTestRunner(host=host, headless=False, user=LoadAndClickUser(), n_users=2).run()
+
+
+@pytest.mark.asyncio
+async def test_workers(port=6002):
+    """We can run the users of the LoadTestRunner in 2 worker processes"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        runner = LoadTestRunner(
+            host=host, headless=True, user=LoadAndClickUser(), n_users=4, n_workers=2
+        )
+        await runner.run()
+
+    data = runner.logger.data
+    assert sorted(data.user.unique()) == ["0", "1", "2", "3"]
+
+
+@pytest.mark.asyncio
+async def test_browser_pool(port=6003):
+    """We can run the users in several browsers reusing the browser contexts"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        runner = LoadTestRunner(
+            host=host,
+            headless=True,
+            user=LoadAndClickUser(),
+            n_users=4,
+            users_per_browser=2,
+            max_pages_per_context=2,
+        )
+        await runner.run()
+
+    assert len(runner.logger.data.user.unique()) == 4
+
+
+@pytest.mark.asyncio
+async def test_trace_websockets(port=6007):
+    """We can log the round trips of the websocket messages of the users"""
+    async with LoadTestRunner.serve(App, port=port) as host:
+        runner = LoadTestRunner(
+            host=host, headless=True, user=LoadAndClickUser(), n_users=1, trace_websockets=True
+        )
+        await runner.run()
+
+    data = runner.logger.data
+    round_trips = data[(data.event == "websocket") & (data.msgtype == "PATCH-DOC")]
+    assert round_trips.patches.max() >= 1
+    assert round_trips.duration.max() >= App.param.run_delay.default
+
+
+def test_soak():
+    """The soak mode sets the limits bounding the memory of the generator that are not set"""
+    runner = LoadTestRunner(soak=True, max_sessions_per_browser=10)
+
+    assert runner.logger.max_events == SOAK_MAX_EVENTS
+    assert runner.max_sessions_per_browser == 10
+    assert runner.max_context_heap == SOAK_CONTEXT_HEAP
+    assert isinstance(runner.monitor, GeneratorMonitor)
+    assert LoadTestRunner().monitor is None
+    pool = runner._create_pool()  # pylint: disable=protected-access
+    assert pool.max_sessions_per_browser == 10
+    assert "soak" not in runner._worker_params()  # pylint: disable=protected-access
+
+
+@pytest.mark.asyncio
+async def test_serve_many_raises_without_processes():
+    """We get a helpful error when asking for no server processes"""
+    with pytest.raises(ValueError):
+        async with LoadTestRunner.serve_many(App, n_processes=0):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_serve_processes(port=6011):
+    """We can serve the app in several processes. The users are dealt out to the servers and
+    their events are tagged with their server"""
+    async with LoadTestRunner.serve_many(App, n_processes=2, port=port) as hosts:
+        assert hosts == [f"http://localhost:{port}", f"http://localhost:{port + 1}"]
+        runner = LoadTestRunner(
+            hosts=hosts,
+            user=ProtocolLoadAndClickUser(n_clicks=0, sleep_time=0),
+            n_users=4,
+            user_delay=0,
+            logger=Logger(auto_save=False, auto_archive=False),
+        )
+        await runner.run()
+
+    data = runner.logger.data
+    data = data[data.event == "load"]
+    assert data.groupby("server").user.apply(sorted).to_dict() == {
+        hosts[0]: ["0", "2"],
+        hosts[1]: ["1", "3"],
+    }
+
+
+@pytest.mark.asyncio
+async def test_wait_until_ready():
+    """We get a TimeoutError if the server is not ready in time"""
+    with pytest.raises(TimeoutError):
+        await wait_until_ready(f"http://localhost:{_free_ports(1)[0]}", timeout=0.2)
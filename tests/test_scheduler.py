@@ -0,0 +1,86 @@
+"""We can schedule user sessions with load profiles"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+import pytest
+
+from loadwright import LoadTestRunner, User
+from loadwright.logger import Logger
+from loadwright.scheduler import ConstantRate, Hold, Poisson, Ramp, Spike, Steps
+
+
+def test_ramp():
+    """The Ramp starts n_users users user_delay seconds apart"""
+    assert Ramp().arrivals(n_users=3, user_delay=0.5) == [0.0, 0.5, 1.0]
+
+
+def test_constant_rate():
+    """The ConstantRate starts users at fixed intervals"""
+    assert ConstantRate(rate=2, duration=2).arrivals(n_users=0, user_delay=0) == [
+        0.0,
+        0.5,
+        1.0,
+        1.5,
+    ]
+    # The floating point error in the number of arrivals is rounded away
+    arrivals = ConstantRate(rate=25, duration=2.2).arrivals(n_users=0, user_delay=0)
+    assert len(arrivals) == 55
+    assert arrivals[-1] < 2.2
+
+
+def test_poisson():
+    """The Poisson profile starts users at random intervals with the given average rate"""
+    arrivals = Poisson(rate=100, duration=10, seed=42).arrivals(n_users=0, user_delay=0)
+    assert arrivals == sorted(arrivals)
+    assert 0 <= arrivals[0] and arrivals[-1] < 10
+    assert 900 < len(arrivals) < 1100
+    assert arrivals == Poisson(rate=100, duration=10, seed=42).arrivals(n_users=0, user_delay=0)
+
+
+def test_steps_and_spike():
+    """We can change the rate in steps, for example to create a spike"""
+    assert Steps(steps=[(1, 2), (2, 1)]).arrivals(n_users=0, user_delay=0) == [0, 1, 2, 2.5]
+    spike = Spike(rate=1, spike_rate=4, spike_start=1, spike_duration=0.5, duration=3)
+    assert spike.arrivals(n_users=0, user_delay=0) == [0, 1, 1.25, 1.5, 2.5]
+
+
+class _Pool:  # pylint: disable=too-few-public-methods
+    """A BrowserPool replacement that does not launch any browsers"""
+
+    @asynccontextmanager
+    async def page(self):
+        """Yields no page"""
+        yield None
+
+
+class _FastUser(User):
+    """A User that does not use the page"""
+
+    async def run(self):
+        with self.event(name="load", user=self.name):
+            pass
+
+
+@pytest.mark.asyncio
+async def test_hold_recycles_users():
+    """The users of a Hold profile run sessions until the duration has passed and the scheduled
+    and actual start of every session is recorded"""
+    runner = LoadTestRunner(
+        user=_FastUser(sleep_time=0.05),
+        n_users=2,
+        user_delay=0.1,
+        profile=Hold(duration=0.3),
+        logger=Logger(auto_save=False),
+    )
+    origin = time.time()
+    runner.logger.reset(origin=origin)
+    tasks = runner._create_tasks(  # pylint: disable=protected-access
+        pool=_Pool(), arrivals=runner._arrivals(), origin=origin  # pylint: disable=protected-access
+    )
+    await asyncio.gather(*tasks)
+
+    data = runner.logger.data
+    assert set(data.user) == {"0", "1"}
+    assert data.session.max() >= 2
+    assert (data.actual_start_seconds >= data.scheduled_start_seconds).all()
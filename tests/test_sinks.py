@@ -0,0 +1,115 @@
+"""We can stream results to a file while the test is running"""
+import pandas as pd
+import pytest
+
+from loadwright.io import read_loadwright_file
+from loadwright.logger import Logger
+from loadwright.sinks import ArrowSink, CSVSink, JSONLinesSink, ParquetSink, create_sink
+
+
+def _log_events(logger: Logger, n_events: int, **kwargs):
+    for index in range(n_events):
+        with logger.event(name="load", user=str(index % 2), **kwargs):
+            pass
+
+
+@pytest.mark.parametrize(
+    ["file", "sink_class"],
+    [
+        ("a.csv", CSVSink),
+        ("a.jsonl", JSONLinesSink),
+        ("a.parquet", ParquetSink),
+        ("a.arrow", ArrowSink),
+    ],
+)
+def test_create_sink(file, sink_class):
+    """We can create a sink from the file extension"""
+    assert isinstance(create_sink(file), sink_class)
+
+
+def test_create_sink_raises_for_unknown_extension():
+    """We get a helpful error for unknown file extensions"""
+    with pytest.raises(ValueError):
+        create_sink("loadwright.xyz")
+
+
+@pytest.mark.parametrize(
+    "file", ["loadwright.csv", "loadwright.jsonl", "loadwright.parquet", "loadwright.arrow"]
+)
+def test_logger_streams_to_file(tmp_path, file):
+    """The Logger writes the results to the file in batches"""
+    logger = Logger(path=str(tmp_path), file=file)
+    logger.sink.param.update(batch_size=3, flush_interval=60)
+
+    _log_events(logger, 4)
+    assert logger.sink.count == 3
+    if file.endswith((".csv", ".jsonl")):
+        assert len(read_loadwright_file(tmp_path / file)) == 3
+
+    logger.close()
+    data = read_loadwright_file(tmp_path / file)
+    assert len(data) == 4
+    assert data.user.astype(str).tolist() == ["0", "1", "0", "1"]
+    assert data.start.dtype == "<M8[ns]"
+    archives = list((tmp_path / "archive").iterdir())
+    assert len(archives) == 1
+    archived = read_loadwright_file(archives[0])
+    assert archived.user.astype(str).tolist() == ["0", "1", "0", "1"]
+    assert archived.start.dtype == "<M8[ns]"
+    assert (archived.start - data.start).abs().max() < pd.Timedelta(milliseconds=1)
+
+
+@pytest.mark.parametrize(
+    "file", ["loadwright.csv", "loadwright.jsonl", "loadwright.parquet", "loadwright.arrow"]
+)
+def test_logger_archives_spilled_events(tmp_path, file):
+    """The archive of a Logger keeping only the latest events in memory is readable"""
+    logger = Logger(path=str(tmp_path), file=file, max_events=4)
+    logger.sink.param.update(batch_size=3, flush_interval=60)
+
+    _log_events(logger, 10)
+    logger.close()
+
+    archive = next((tmp_path / "archive").iterdir())
+    assert len(read_loadwright_file(archive)) == 10
+    assert logger.catalog.runs()["n_events"].tolist() == [10]
+
+
+def test_csv_sink_adds_new_columns(tmp_path):
+    """The CSVSink rewrites the header once when a new column shows up"""
+    logger = Logger(path=str(tmp_path), auto_archive=False)
+    logger.sink.param.update(batch_size=1)
+
+    _log_events(logger, 2)
+    _log_events(logger, 1, status="ok")
+    logger.close()
+
+    data = read_loadwright_file(tmp_path / "loadwright.csv")
+    assert list(data.index) == [0, 1, 2]
+    assert data["status"].isna().sum() == 2
+    assert data["status"].iloc[-1] == "ok"
+    pd.testing.assert_frame_equal(
+        data[["start_seconds", "duration"]], logger.data[["start_seconds", "duration"]]
+    )
+
+
+@pytest.mark.parametrize("file", ["loadwright.parquet", "loadwright.arrow"])
+def test_columnar_sink_widens_the_schema(tmp_path, file):
+    """The Parquet and Arrow sinks keep the columns and values not fitting the first batch"""
+    logger = Logger(path=str(tmp_path), file=file, auto_archive=False)
+    logger.sink.param.update(batch_size=2, flush_interval=60)
+    now = 1_700_000_000.0
+    logger.log("load", "0", now, now + 1, size=1, count=1)
+    logger.log("load", "1", now + 1, now + 2, size=2, count=2)
+    logger.log("interact", "0", now + 2, now + 3, size=2.5, count=2.5, corrected_duration=5.0)
+    logger.log("interact", "1", now + 3, now + 4, size="large")
+    logger.log("resources", "server", now + 4, now + 4, server_rss=10.0)
+    logger.close()
+
+    data = read_loadwright_file(tmp_path / file)
+    assert data.event.astype(str).tolist() == ["load"] * 2 + ["interact"] * 2 + ["resources"]
+    assert data["size"].tolist() == ["1", "2", "2.5", "large", None]
+    assert data["count"].dtype == "float64"
+    assert data["count"].tolist()[:3] == [1.0, 2.0, 2.5]
+    assert data["corrected_duration"].notna().tolist() == [False, False, True, False, False]
+    assert data["server_rss"].iloc[-1] == 10.0
@@ -0,0 +1,59 @@
+"""We can trace the round trips of the Bokeh websocket messages of a page"""
+import json
+
+from loadwright.logger import Logger
+from loadwright.tracing import WebSocketTracer
+
+
+class _WebSocket:
+    """A stand in for a Playwright WebSocket"""
+
+    def __init__(self, url="ws://localhost:5006/ws"):
+        self.url = url
+        self.handlers = {}
+
+    def on(self, event, handler):
+        """Registers the handler of the event"""
+        self.handlers[event] = handler
+
+    def send(self, header, content="{}"):
+        """Sends a message from the page"""
+        for frame in [json.dumps(header), "{}", content]:
+            self.handlers["framesent"](frame)
+
+    def receive(self, header, content="{}"):
+        """Receives a message from the server"""
+        for frame in [json.dumps(header), "{}", content]:
+            self.handlers["framereceived"](frame)
+
+
+def test_trace():
+    """A round trip is logged with its replies and pushed patches are logged separately"""
+    logger = Logger(auto_save=False)
+    websocket = _WebSocket()
+    WebSocketTracer(log=logger.log, user="1").trace(websocket)
+
+    websocket.send({"msgid": "1", "msgtype": "PATCH-DOC"}, '{"events": []}')
+    websocket.receive({"msgid": "2", "msgtype": "PATCH-DOC"}, "x" * 100)
+    websocket.receive({"msgid": "3", "msgtype": "PATCH-DOC"}, "x" * 1000)
+    websocket.receive({"msgid": "4", "msgtype": "OK", "reqid": "1"})
+    websocket.receive({"msgid": "5", "msgtype": "PATCH-DOC"}, "x" * 10)
+
+    data = logger.data
+    assert data.event.tolist() == ["websocket", "websocket_push"]
+    assert data.user.tolist() == ["1", "1"]
+    assert data.msgtype.tolist() == ["PATCH-DOC", "PATCH-DOC"]
+    assert data.patches.tolist() == [2, 1]
+    assert data.max_patch_bytes.tolist()[0] > 1000
+    assert data.received_bytes.tolist()[0] > 1100
+    assert data.sent_bytes.tolist() == [
+        len('{"msgid": "1", "msgtype": "PATCH-DOC"}{}{"events": []}'),
+        0,
+    ]
+
+
+def test_trace_other_websockets():
+    """Websockets that are not Bokeh websockets are not traced"""
+    websocket = _WebSocket(url="wss://example.com/socket")
+    WebSocketTracer(log=print).trace(websocket)
+    assert not websocket.handlers
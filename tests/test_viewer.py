@@ -1,7 +1,13 @@
 """We can view the results of a Loadwright load test"""
+import time
+
+import holoviews as hv
+import numpy as np
+import pandas as pd
 import pytest
 
-from loadwright import LoadTestRunner, LoadTestViewer
+from loadwright import LoadTestRunner, LoadTestViewer, analysis
+from loadwright.logger import Logger
 
 from .test_io import FIXTURE
 
@@ -20,3 +26,114 @@ async def test_component_2(port=6001):
     """A User can load the LoadTestViewer"""
     async with LoadTestRunner.serve(_viewer, port=port) as host:
         await LoadTestRunner(host=host, headless=False, n_users=1).run()
+
+
+def test_live():
+    """We can stream the events of a running test to the LoadTestViewer with bounded memory"""
+    logger = Logger(auto_save=False)
+    origin = time.time()
+    logger.reset(origin=origin)
+    viewer = LoadTestViewer(logger=logger, max_rows=3)
+    logger.log("load", "0", origin, origin + 3)
+    logger.log("load", "1", origin + 1, origin + 2)
+    viewer.update()
+    logger.log("interact", "0", origin + 3, origin + 3.5)
+    logger.log("interact", "1", origin + 3, origin + 4.5)
+    viewer.update()
+
+    data = viewer._events.data  # pylint: disable=protected-access
+    assert data.user.tolist() == ["1", "0", "1"]
+    assert data.color.tolist() == ["green", "green", "red"]
+    active_users = viewer._active_users.data  # pylint: disable=protected-access
+    assert active_users.active_users.tolist() == [1, 2, 2, 1]
+
+
+def test_live_active_users():
+    """The live number of active users matches the one computed from all the events"""
+    logger = Logger(auto_save=False)
+    origin = time.time()
+    logger.reset(origin=origin)
+    viewer = LoadTestViewer(logger=logger)
+    events = [("0", 0, 1), ("1", 0.5, 1.5), ("0", 2, 3), ("2", 2.5, 4), ("1", 3.5, 5)]
+    for user, start, stop in events:
+        logger.log("load", user, origin + start, origin + stop)
+        viewer.update()
+
+    live = viewer._active_users.data.round(6)  # pylint: disable=protected-access
+    expected = analysis.active_users(logger.data).round(6)
+    assert set(live.start_seconds) <= set(expected.start_seconds)
+    merged = live.merge(expected, on="start_seconds", suffixes=("_live", ""))
+    assert merged.active_users_live.tolist() == merged.active_users.tolist()
+    assert live.active_users.max() == 3
+
+
+def test_live_abort():
+    """We can abort a running test from the live LoadTestViewer"""
+    runner = LoadTestRunner()
+    viewer = LoadTestViewer(runner=runner)
+    assert viewer.logger is runner.logger
+    viewer.runner.stop()
+    assert runner.stopped
+
+
+def _large_data(n_events=200):
+    generator = np.random.default_rng(1)
+    start = generator.uniform(0, 100, n_events)
+    duration = generator.exponential(1, n_events)
+    return pd.DataFrame(
+        {
+            "event": generator.choice(["load", "interact"], n_events),
+            "user": generator.integers(0, 20, n_events).astype(str),
+            "start_seconds": start,
+            "stop_seconds": start + duration,
+            "duration": duration,
+        }
+    )
+
+
+def test_large_data_decimate():
+    """We can show a sample of the events of large runs"""
+    viewer = LoadTestViewer(
+        data=_large_data(), large_data="decimate", large_data_threshold=100, max_samples=50
+    )
+    assert len(viewer.segment_plot().data) == 50
+    assert isinstance(viewer.duration_plot(), hv.DynamicMap)
+    hv.render(viewer.duration_plot())
+
+
+def test_large_data_auto():
+    """Small runs are shown in full and large runs are rasterized or decimated"""
+    viewer = LoadTestViewer(data=_large_data(), large_data_threshold=1_000)
+    assert viewer._large_data_mode() == "off"  # pylint: disable=protected-access
+    viewer.large_data_threshold = 100
+    mode = viewer._large_data_mode()  # pylint: disable=protected-access
+    assert mode in ["rasterize", "decimate"]
+
+
+def test_large_data_rasterize():
+    """We can rasterize the events of large runs on the server"""
+    pytest.importorskip("datashader")
+    viewer = LoadTestViewer(data=_large_data(), large_data="rasterize")
+    hv.render(viewer.segment_plot())
+    hv.render(viewer.duration_plot())
+
+
+def test_cache():
+    """The derived frames are computed once per data and thresholds only recolor"""
+    viewer = LoadTestViewer(data=_large_data())
+    viewer.segment_plot()
+    frame = viewer._segment_frame()  # pylint: disable=protected-access
+    n_red = (frame.color == "red").sum()
+    viewer.max_load_duration = 0.1
+    viewer.segment_plot()
+    assert viewer._segment_frame() is frame  # pylint: disable=protected-access
+    assert (frame.color == "red").sum() > n_red
+
+    viewer.aggregation = "P99"
+    plot = viewer.duration_plot()
+    assert ("value", "P99", None) in viewer._cache  # pylint: disable=protected-access
+
+    viewer.data = _large_data(n_events=10)
+    assert viewer._segment_frame() is not frame  # pylint: disable=protected-access
+    assert len(viewer._segment_frame()) == 10  # pylint: disable=protected-access
+    assert plot is not None